@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -141,4 +142,92 @@ LOGIN_REDIRECT_URL = '/dashboard/upload/'
 LOGOUT_REDIRECT_URL = '/'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Caché compartido entre procesos (versiones por usuario para ETag, contadores).
+# En producción puede reemplazarse por Redis o Memcached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "generador_reportes_cache"),
+    }
+}
+
+
+# Caché de narrativas del LLM (myapp.services.narrative_cache)
+NARRATIVA_CACHE_MAX_ENTRADAS = 500
+NARRATIVA_CACHE_MAX_DIAS = 30
+# Segundos entre dos pasadas de expulsión (0 = en cada guardado)
+NARRATIVA_CACHE_EXPULSION_CADA = 300
+
+# Backend del modelo (myapp.services.llm_backends): "ollama", "openai" (API de
+# OpenAI: vLLM, llama.cpp...) o "stub" (respuestas deterministas sin red, para
+# pruebas; ver también el comando servidor_llm_simulado). Los tiempos de espera,
+# la salud y el circuit breaker de abajo valen para todos los backends.
+LLM_BACKEND = "ollama"
+LLM_OPENAI_URL = "http://localhost:8000/v1"
+LLM_OPENAI_MODEL = ""  # obligatorio con LLM_BACKEND = "openai"
+LLM_OPENAI_API_KEY = None
+# Stub: segundos de prefill, tokens por segundo (None = sin espera) y largo
+LLM_STUB_LATENCIA = 0.0
+LLM_STUB_TOKENS_POR_SEGUNDO = None
+LLM_STUB_TOKENS = 400
+
+# Servidor y modelo de Ollama (myapp.services.llm_client)
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_MODEL = "gemma3:12b"
+# Segundos para conectar y para recibir la respuesta completa (modelos grandes)
+OLLAMA_TIMEOUT_CONEXION = 5
+OLLAMA_TIMEOUT = 1800
+# Segundos que vale una verificación de salud correcta
+OLLAMA_SALUD_TTL = 30
+# Circuit breaker: fallos seguidos que lo abren y segundos antes de reintentar
+OLLAMA_FALLOS_PARA_ABRIR = 3
+OLLAMA_ESPERA_REINTENTO = 30
+
+# Prompts (myapp.utils.prompt_compacto). Presupuesto en tokens de los datos
+# más las instrucciones; el num_ctx del modelo debe cubrirlo junto con la
+# respuesta. PROMPT_TOKENIZADOR: ruta a una función texto -> int (None usa
+# una aproximación).
+PROMPT_MAX_TOKENS = 3000
+PROMPT_TOKENIZADOR = None
+
+# Diagnóstico de la aplicación (loggers "myapp.*"): prompts y tiempos del
+# modelo, circuit breaker, cachés, cola de reportes, pool de procesos y copias
+# columnares. Se puede cambiar el nivel o el destino por módulo.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"myapp": {"handlers": ["console"], "level": "INFO"}},
+}
+
+# Narrativas que se piden a Ollama a la vez al generar los reportes de una
+# clase (LoteReportes). Debe coincidir con OLLAMA_NUM_PARALLEL del servidor
+# de Ollama: más peticiones solo esperan en su cola.
+OLLAMA_NUM_PARALLEL = 4
+# Máximo de estudiantes (narrativas) que un solo lote puede encolar
+LOTE_MAX_ESTUDIANTES = 200
+
+# Cola de reportes (comando procesar_trabajos): segundos sin actualizarse tras
+# los que un trabajo o lote en proceso se da por abandonado (worker caído) y
+# se vuelve a reclamar. Debe superar OLLAMA_TIMEOUT.
+TRABAJOS_TIEMPO_MAXIMO = 3600
+
+# Lector de Excel para las subidas (myapp.utils.excel_readers):
+# "auto", "openpyxl", "openpyxl_stream" o "calamine"
+EXCEL_READER_ENGINE = "auto"
+
+# Pool de procesos para parsear y procesar los libros subidos
+# (myapp.utils.process_pool). None = un proceso por núcleo; 0 = sin pool.
+UPLOAD_PROCESS_POOL_WORKERS = None
+
+# Envío de los PDF descargados (myapp.utils.descargas). None = los envía Django;
+# "nginx" = X-Accel-Redirect a DESCARGAS_ACCEL_PREFIJO (location internal que
+# apunte a MEDIA_ROOT); "apache" = X-Sendfile con la ruta en disco.
+DESCARGAS_SERVIDOR = None
+DESCARGAS_ACCEL_PREFIJO = "/media-protegida/"
+
+# Caché de métricas del dashboard (myapp.services.metrics_service), en segundos.
+# Se invalida por eventos; el tiempo solo limita entradas huérfanas.
+METRICAS_CACHE_TIMEOUT = 3600
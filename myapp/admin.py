@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ArchivoNotas, Estudiante, ReporteGenerado
+from .models import ArchivoNotas, Estudiante, DashboardSummary, ReporteGenerado, TrabajoReporte, LoteReportes, NarrativaCache
 
 @admin.register(ArchivoNotas)
 class ArchivoNotasAdmin(admin.ModelAdmin):
@@ -19,3 +19,26 @@ class ReporteGeneradoAdmin(admin.ModelAdmin):
     list_filter = ('tipo', 'fecha_generacion', 'usuario')
     search_fields = ('descripcion', 'estudiante')
     readonly_fields = ('fecha_generacion',)
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estudiante', 'usuario', 'estado', 'fecha_creacion')
+    list_filter = ('estado', 'tipo')
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+
+@admin.register(LoteReportes)
+class LoteReportesAdmin(admin.ModelAdmin):
+    list_display = ('id', 'archivo', 'usuario', 'estado', 'fecha_creacion')
+    list_filter = ('estado',)
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+
+@admin.register(NarrativaCache)
+class NarrativaCacheAdmin(admin.ModelAdmin):
+    list_display = ('clave', 'modelo', 'aciertos', 'fecha_creacion', 'ultimo_acceso')
+    list_filter = ('modelo',)
+    readonly_fields = ('fecha_creacion', 'ultimo_acceso')
+
+@admin.register(DashboardSummary)
+class DashboardSummaryAdmin(admin.ModelAdmin):
+    list_display = ('archivo', 'promedio_general', 'aprobados', 'reprobados', 'fecha_actualizacion')
+    readonly_fields = ('fecha_actualizacion',)
@@ -0,0 +1,130 @@
+"""
+Benchmark de los lectores de Excel: memoria pico y tiempo de parseo.
+
+Cada lector se ejecuta en un proceso nuevo para que la memoria de uno no
+afecte la medición del siguiente.
+
+Uso:
+    python manage.py bench_lectores_excel --estudiantes 5000 --hojas 12
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.management.commands.bench_reporte_grupal import generar_hojas_sinteticas
+from myapp.utils.excel_readers import LECTORES, calamine_disponible, leer_libro
+from myapp.utils.report_generator import generar_reporte_grupal_completo, reportes_individuales_batch
+
+# Columnas que tienen los libros reales pero que los reportes no usan
+COLUMNAS_EXTRA = ["CÉDULA", "Observaciones", "Representante", "Teléfono"]
+
+
+def escribir_libro_sintetico(ruta, estudiantes, hojas):
+    """
+    Escribe un .xlsx sintético con openpyxl en modo write_only.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    for nombre, df in generar_hojas_sinteticas(estudiantes, hojas).items():
+        hoja = libro.create_sheet(nombre)
+        hoja.append(list(df.columns) + COLUMNAS_EXTRA)
+        for i, fila in enumerate(df.itertuples(index=False)):
+            valores = [None if pd.isna(v) else (v.item() if hasattr(v, "item") else v) for v in fila]
+            hoja.append(valores + [f"{i:010d}", "Sin observaciones", f"Representante {i}", "0999999999"])
+    libro.save(ruta)
+
+
+def leer_anterior(ruta):
+    """
+    Lectura previa a los lectores: todas las columnas con el motor por defecto.
+    """
+    xls = pd.ExcelFile(ruta)
+    return {sheet: pd.read_excel(xls, sheet) for sheet in xls.sheet_names}
+
+
+def medir_lector(ruta, motor):
+    """
+    Se ejecuta en un proceso hijo. Devuelve tiempo, memoria y un hash de la
+    salida de los reportes para comparar los lectores entre sí.
+    """
+    def leer():
+        return leer_anterior(ruta) if motor == "anterior" else leer_libro(ruta, motor)
+
+    # Tiempo sin tracemalloc (lo hace varias veces más lento); la memoria pico
+    # se mide en una segunda lectura. tracemalloc no ve la memoria nativa de
+    # calamine, pero sí la de los DataFrames y los objetos de Python.
+    inicio = time.perf_counter()
+    hojas = leer()
+    segundos = time.perf_counter() - inicio
+
+    del hojas
+    tracemalloc.start()
+    hojas = leer()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    memoria_df = sum(df.memory_usage(deep=True).sum() for df in hojas.values())
+    salida = json.dumps(
+        [generar_reporte_grupal_completo(hojas), reportes_individuales_batch(hojas)],
+        ensure_ascii=False, default=str
+    )
+    return {
+        "segundos": segundos,
+        "pico_tracemalloc": pico,
+        "memoria_df": int(memoria_df),
+        "hash": hashlib.sha256(salida.encode("utf-8")).hexdigest(),
+    }
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):8.1f} MB"
+
+
+class Command(BaseCommand):
+    help = "Compara memoria pico y tiempo de parseo de los lectores de Excel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--estudiantes", type=int, default=5000)
+        parser.add_argument("--hojas", type=int, default=12)
+        parser.add_argument("--archivo", help="Usar un .xlsx existente en lugar de uno sintético")
+
+    def handle(self, *args, **options):
+        motores = ["anterior"] + [m for m in LECTORES if m != "calamine" or calamine_disponible()]
+
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = options["archivo"]
+            if not ruta:
+                ruta = os.path.join(carpeta, "libro.xlsx")
+                escribir_libro_sintetico(ruta, options["estudiantes"], options["hojas"])
+                self.stdout.write(
+                    f"Libro sintético: {options['estudiantes']} estudiantes x {options['hojas']} hojas "
+                    f"({os.path.getsize(ruta) / (1024 * 1024):.1f} MB)"
+                )
+
+            resultados = {}
+            contexto = multiprocessing.get_context("spawn")
+            for motor in motores:
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                    resultados[motor] = pool.submit(medir_lector, ruta, motor).result()
+
+        referencia = resultados["anterior"]["hash"]
+        distintos = [m for m, r in resultados.items() if r["hash"] != referencia]
+        if distintos:
+            raise CommandError(f"Los lectores {distintos} no producen los mismos reportes.")
+
+        self.stdout.write(f"{'lector':<16} {'tiempo':>10} {'memoria pico':>14} {'DataFrames':>11}")
+        for motor, r in resultados.items():
+            self.stdout.write(
+                f"{motor:<16} {r['segundos'] * 1000:7.0f} ms    {_mb(r['pico_tracemalloc'])} {_mb(r['memoria_df'])}"
+            )
+        self.stdout.write("Reportes idénticos con todos los lectores.")
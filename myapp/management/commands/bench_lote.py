@@ -0,0 +1,118 @@
+"""
+Benchmark de los reportes individuales de una clase completa (LoteReportes):
+tiempo total con las narrativas una tras otra (como desde el navegador) y con
+settings.OLLAMA_NUM_PARALLEL peticiones a la vez.
+
+Ollama se reemplaza por un cliente simulado que tarda --latencia segundos por
+narrativa y atiende a lo sumo --paralelo-servidor peticiones a la vez (las
+demás esperan, como en la cola de Ollama). Los PDF se renderizan de verdad en
+un MEDIA_ROOT temporal y la base de datos se restaura al terminar.
+
+Uso:
+    python manage.py bench_lote --estudiantes 40 --latencia 2
+"""
+
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from myapp.models import ArchivoNotas, Estudiante, LoteReportes, TrabajoReporte
+from myapp.services import ReportService
+from myapp.utils.report_generator import reportes_individuales_batch
+
+from .bench_pdf import NARRATIVA
+from .bench_reporte_grupal import generar_hojas_sinteticas
+
+
+class ClienteSimulado:
+    """
+    Imita ollama.Client.chat: espera la latencia indicada con un número
+    acotado de peticiones atendidas a la vez.
+    """
+
+    modelo = "simulado"
+
+    def __init__(self, latencia, paralelo):
+        self.latencia = latencia
+        self.semaforo = threading.BoundedSemaphore(paralelo)
+
+    def chat(self, model, messages, options=None):
+        with self.semaforo:
+            time.sleep(self.latencia)
+        return {"message": {"content": NARRATIVA}}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compara el tiempo de generar los reportes de una clase en serie y con narrativas en paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--estudiantes", type=int, default=40)
+        parser.add_argument("--latencia", type=float, default=2.0, help="Segundos por narrativa del modelo simulado")
+        parser.add_argument(
+            "--paralelo-servidor", type=int, default=None,
+            help="Peticiones que atiende el servidor simulado a la vez (por defecto, OLLAMA_NUM_PARALLEL)"
+        )
+
+    def handle(self, *args, **options):
+        paralelo = getattr(settings, "OLLAMA_NUM_PARALLEL", 1)
+        servidor = options["paralelo_servidor"] or paralelo
+        hojas = generar_hojas_sinteticas(options["estudiantes"], 3)
+        reportes_json = reportes_individuales_batch(hojas)
+
+        self.stdout.write(
+            f"{options['estudiantes']} estudiantes, {options['latencia']:.1f} s por narrativa, "
+            f"servidor con {servidor} peticiones a la vez"
+        )
+        resultados = {}
+        for nombre, limite in [("en serie", 1), (f"{paralelo} en paralelo", paralelo)]:
+            resultados[nombre] = self.medir(reportes_json, limite, ClienteSimulado(options["latencia"], servidor))
+            segundos, completados = resultados[nombre]
+            if completados != options["estudiantes"]:
+                raise CommandError(f"{nombre}: solo se completaron {completados} reportes.")
+            self.stdout.write(f"{nombre:<16} {segundos:7.1f} s ({completados / segundos:.1f} reportes/s)")
+
+        serie, paralelo_s = resultados["en serie"][0], resultados[f"{paralelo} en paralelo"][0]
+        self.stdout.write(f"Aceleración: {serie / paralelo_s:.1f}x")
+
+    def medir(self, reportes_json, limite, cliente):
+        """
+        Crea un lote sintético, lo ejecuta y deshace los cambios en la base
+        de datos.
+
+        Returns:
+            tuple: (segundos, trabajos completados)
+        """
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media, OLLAMA_NUM_PARALLEL=limite):
+            try:
+                with transaction.atomic():
+                    usuario = User.objects.create_user(f"bench_lote_{time.time_ns()}")
+                    archivo = ArchivoNotas.objects.create(usuario=usuario, nombre="bench.xlsx", archivo="uploads/bench.xlsx")
+                    Estudiante.objects.bulk_create([
+                        Estudiante(archivo=archivo, nombre=nombre, reporte_json=reporte)
+                        for nombre, reporte in reportes_json.items()
+                    ])
+                    # forzar: que ninguna narrativa salga de la caché
+                    lote = LoteReportes.objects.create(usuario=usuario, archivo=archivo, forzar_regeneracion=True)
+                    TrabajoReporte.objects.bulk_create([
+                        TrabajoReporte(usuario=usuario, archivo=archivo, lote=lote, tipo="individual", estudiante=nombre)
+                        for nombre in reportes_json
+                    ])
+
+                    inicio = time.perf_counter()
+                    ReportService.ejecutar_lote(lote, cliente=cliente)
+                    segundos = time.perf_counter() - inicio
+                    completados = lote.trabajos.filter(estado=TrabajoReporte.ESTADO_COMPLETADO).count()
+                    raise Rollback
+            except Rollback:
+                pass
+        return segundos, completados
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark de generar_pdf: latencia por PDF cargando las fuentes en cada
+documento (como antes) o copiándolas de la plantilla del proceso, con el juego
+de fuentes completo y con el latino.
+
+Con el juego completo el PDF es idéntico byte a byte al de add_font. Con el
+latino solo cambian los archivos de fuente incrustados: se comparan los PDF
+sin comprimir quitando esos streams y la tabla xref.
+
+Uso:
+    python manage.py bench_pdf --repeticiones 50
+"""
+
+import os
+import re
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from fpdf import FPDF
+
+from myapp.utils.narrativa_ast import parsear_narrativa
+from myapp.utils.pdf_plantilla import FAMILIA, FUENTES, FUENTES_DIR, MARGEN_INFERIOR, obtener_plantilla
+from myapp.utils.report_generator import renderizar_pdf
+
+TITULO = "Reporte grupal - Trimestre 1"
+
+NARRATIVA = """## Resumen general
+El grupo obtuvo un promedio de **8.4** con una mejora sostenida respecto al trimestre anterior.
+
+### Rendimiento académico
+- **Aprobados:** 27 estudiantes (90 %)
+- **Reprobados:** 3 estudiantes, principalmente en el componente de examen
+- Evolución: estable en aportes individuales y grupales
+
+## Asistencia
+Se registraron 14 faltas justificadas y 6 injustificadas. Conviene dar seguimiento
+a los estudiantes con más de dos inasistencias sin justificar.
+
+### Recomendaciones
+- Reforzar la preparación de exámenes con ejercicios de repaso.
+- Mantener los proyectos en equipo, que muestran los mejores resultados.
+"""
+
+# Fecha fija para comparar los PDF byte a byte
+FECHA = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def documento_sin_cache():
+    """
+    Documento como se creaba antes de la plantilla: add_font en cada PDF.
+    """
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=MARGEN_INFERIOR)
+    for estilo, archivo in FUENTES.items():
+        pdf.add_font(FAMILIA, estilo, os.path.join(FUENTES_DIR, archivo))
+    return pdf, FAMILIA
+
+
+def renderizar(crear_documento, narrativa, comprimir=True):
+    pdf, familia = crear_documento()
+    pdf.set_creation_date(FECHA)
+    pdf.set_compression(comprimir)
+    return renderizar_pdf(pdf, familia, parsear_narrativa(TITULO, narrativa)).getvalue()
+
+
+def sin_fuentes_incrustadas(contenido):
+    """
+    PDF sin comprimir sin los streams de las fuentes (los que tienen /Length1)
+    ni la tabla xref, cuyos desplazamientos dependen del tamaño de esos streams.
+    """
+    contenido = re.sub(rb"/Length1 \d+.*?endstream", b"", contenido, flags=re.S)
+    return contenido.split(b"\nxref\n")[0]
+
+
+class Command(BaseCommand):
+    help = "Compara la latencia por PDF con y sin la plantilla de fuentes del proceso."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=50)
+        parser.add_argument("--parrafos", type=int, default=3, help="Veces que se repite la narrativa de ejemplo")
+
+    def handle(self, *args, **options):
+        narrativa = NARRATIVA * options["parrafos"]
+        plantilla = obtener_plantilla()
+        if plantilla.familia != FAMILIA:
+            raise CommandError("No se pudieron cargar las fuentes DejaVu.")
+
+        if plantilla.elegir_juego(TITULO + narrativa) != "latino":
+            raise CommandError("La narrativa de ejemplo debería usar el juego latino.")
+
+        casos = {
+            "add_font por PDF": documento_sin_cache,
+            "plantilla completa": lambda: plantilla.nuevo_documento(juego="completo"),
+            "plantilla latina": lambda: plantilla.nuevo_documento(juego="latino"),
+        }
+
+        referencia = renderizar(documento_sin_cache, narrativa)
+        if renderizar(casos["plantilla completa"], narrativa) != referencia:
+            raise CommandError("La plantilla completa no produce el mismo PDF que add_font.")
+        sin_comprimir = [renderizar(casos[nombre], narrativa, comprimir=False) for nombre in casos]
+        if len({sin_fuentes_incrustadas(contenido) for contenido in sin_comprimir}) != 1:
+            raise CommandError("El juego latino no produce las mismas páginas que la fuente completa.")
+
+        self.stdout.write(f"{'variante':<20} {'mediana':>10} {'p95':>10} {'tamaño':>9}")
+        for nombre, crear in casos.items():
+            tiempos = []
+            for _ in range(options["repeticiones"]):
+                inicio = time.perf_counter()
+                contenido = renderizar(crear, narrativa)
+                tiempos.append(time.perf_counter() - inicio)
+            tiempos.sort()
+            p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+            self.stdout.write(
+                f"{nombre:<20} {statistics.median(tiempos) * 1000:7.1f} ms {p95 * 1000:7.1f} ms "
+                f"{len(contenido) / 1024:6.1f} KB"
+            )
+
+        self.stdout.write("Mismas páginas con todas las variantes.")
@@ -0,0 +1,85 @@
+"""
+Tamaño de los prompts de reporte con el JSON indentado de antes, con la
+serialización compacta y con el presupuesto de tokens, para distintos tamaños
+de clase. Con --ollama además mide el prefill en el servidor configurado
+(prompt_eval_duration de la respuesta, con num_predict=1).
+
+Uso:
+    python manage.py bench_prompts --estudiantes 20 40 200
+    python manage.py bench_prompts --estudiantes 40 --ollama
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.prompts import get_prompt_reporte_grupal, get_prompt_reporte_individual
+from myapp.services.llm_client import obtener_cliente_llm
+from myapp.utils.prompt_compacto import (
+    LEYENDA,
+    ajustar_a_presupuesto,
+    compactar_grupal,
+    contar_tokens,
+)
+from myapp.utils.report_generator import generar_reporte_grupal_completo, reporte_individual
+
+from .bench_reporte_grupal import generar_hojas_sinteticas
+
+
+def prompt_anterior(prompt_nuevo, json_data):
+    """
+    El mismo prompt con los datos como antes (json.dumps con indent=2).
+    """
+    instrucciones = prompt_nuevo.split(LEYENDA)[0]
+    encabezado = prompt_nuevo.split(LEYENDA)[1].lstrip("\n").split("\n")[0]
+    return f"{instrucciones}{encabezado}\n{json.dumps(json_data, ensure_ascii=False, indent=2)}"
+
+
+class Command(BaseCommand):
+    help = "Compara el tamaño (y opcionalmente el prefill en Ollama) de los prompts antes y después de compactarlos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--estudiantes", type=int, nargs="+", default=[20, 40, 200])
+        parser.add_argument("--hojas", type=int, default=3)
+        parser.add_argument("--ollama", action="store_true", help="Medir el prefill en el servidor de Ollama")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'prompt':<16} {'anterior':>16} {'compacto':>16} {'presupuesto':>16}")
+        for estudiantes in options["estudiantes"]:
+            hojas = generar_hojas_sinteticas(estudiantes, options["hojas"])
+            # Como llega desde resumen_json (tipos de JSON, sin numpy)
+            grupal = json.loads(json.dumps(generar_reporte_grupal_completo(hojas)))
+            individual = json.loads(json.dumps(reporte_individual("Estudiante 00000", hojas)))
+
+            nuevo = get_prompt_reporte_grupal(grupal)
+            sin_recortes, _, _ = ajustar_a_presupuesto(
+                lambda datos: nuevo.split("Datos del grupo:\n")[0] + "Datos del grupo:\n" + datos,
+                compactar_grupal(grupal), max_tokens=0
+            )
+            casos = [
+                (f"grupal ({estudiantes})", prompt_anterior(nuevo, grupal), sin_recortes, nuevo),
+            ]
+            nuevo = get_prompt_reporte_individual(individual, "Estudiante 00000")
+            casos.append((f"individual ({estudiantes})", prompt_anterior(nuevo, individual), nuevo, nuevo))
+
+            for nombre, *prompts in casos:
+                columnas = " ".join(f"{len(p):>7} c {contar_tokens(p):>5} t" for p in prompts)
+                self.stdout.write(f"{nombre:<16} {columnas}")
+                if options["ollama"]:
+                    tiempos = [self.prefill(p) for p in (prompts[0], prompts[-1])]
+                    self.stdout.write(f"{'':<16} prefill anterior {tiempos[0]:.2f} s, actual {tiempos[1]:.2f} s")
+
+    def prefill(self, prompt):
+        """
+        Segundos de prefill del prompt en Ollama (genera un solo token).
+        """
+        cliente = obtener_cliente_llm()
+        try:
+            respuesta = cliente.chat(
+                model=cliente.modelo,
+                messages=[{"role": "user", "content": prompt}],
+                options={"num_predict": 1, "num_ctx": 32768},
+            )
+        except Exception as e:
+            raise CommandError(f"No se pudo medir en Ollama: {type(e).__name__}: {e}")
+        return (respuesta.get("prompt_eval_duration") or 0) / 1e9
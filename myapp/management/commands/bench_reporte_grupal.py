@@ -0,0 +1,123 @@
+"""
+Benchmark del resumen grupal: motor long-form vs. implementación por hojas.
+
+Uso:
+    python manage.py bench_reporte_grupal --estudiantes 5000 --hojas 12
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.utils.report_generator import (
+    COMPONENTES_GRUPALES,
+    _ensamblar_reporte_grupal,
+    _estatus_academico_acumulado,
+    generar_reporte_grupal_completo,
+)
+
+
+def generar_hojas_sinteticas(estudiantes, hojas, semilla=0):
+    """
+    Crea un libro sintético con el mismo esquema que los archivos de notas.
+    """
+    rng = np.random.default_rng(semilla)
+    nombres = [f"Estudiante {i:05d}" for i in range(estudiantes)]
+    resultado = {}
+    for h in range(hojas):
+        df = pd.DataFrame({"APELLIDOS/NOMBRES": nombres})
+        for comp in ["Aporte Individual", "Aporte Grupal", "Examen"]:
+            df[comp] = np.round(rng.uniform(3, 10, estudiantes), 2)
+        df["Proyecto"] = rng.integers(3, 11, estudiantes)
+        df["Nota Trimemestre"] = np.round(rng.uniform(3, 10, estudiantes), 2)
+        df["Cualitativa"] = np.where(df["Nota Trimemestre"] >= 7, "A", "B")
+        df["Comportamiento"] = rng.choice(["A", "B", "C", "F"], estudiantes)
+        faltas = rng.integers(0, 4, estudiantes).astype(float)
+        faltas[rng.random(estudiantes) < 0.05] = np.nan
+        df["Falta Injustificada"] = faltas
+        df["Falta Justificada"] = rng.integers(0, 3, estudiantes)
+        resultado[f"TRIMESTRE{h + 1}"] = df
+    return resultado
+
+
+def generar_reporte_grupal_por_hojas(hojas):
+    """
+    Implementación original del resumen grupal (una pasada de pandas por
+    hoja): referencia del benchmark y de las pruebas de equivalencia del
+    motor long-form.
+    """
+    estatus = _estatus_academico_acumulado(hojas)
+    reportes = {}
+
+    # Iteramos cada trimestre para el reporte individual
+    for nombre, df in hojas.items():
+        resumen = {}
+
+        resumen["promedio_general"] = round(df["Nota Trimemestre"].mean(), 2)
+
+        top3 = df.nlargest(3, "Nota Trimemestre")[["APELLIDOS/NOMBRES", "Nota Trimemestre"]]
+        resumen["Buen rendimiento"] = top3.to_dict(orient="records")
+
+        bottom3 = df.nsmallest(3, "Nota Trimemestre")[["APELLIDOS/NOMBRES", "Nota Trimemestre"]]
+        resumen["Bajo rendimiento"] = bottom3.to_dict(orient="records")
+
+        resumen["total_faltas_injustificadas"] = int(df["Falta Injustificada"].fillna(0).sum())
+        resumen["total_faltas_justificadas"] = int(df["Falta Justificada"].fillna(0).sum())
+
+        faltas_detalle = df[["APELLIDOS/NOMBRES", "Falta Injustificada", "Falta Justificada"]].fillna(0)
+        faltas_detalle = faltas_detalle[
+            (faltas_detalle["Falta Injustificada"] > 0) |
+            (faltas_detalle["Falta Justificada"] > 0)
+        ]
+        resumen["faltas_por_estudiante"] = faltas_detalle.to_dict(orient="records")
+
+        mal_comportamiento = df[df["Comportamiento"] == "F"]["APELLIDOS/NOMBRES"].tolist()
+        resumen["estudiantes_mal_comportamiento"] = mal_comportamiento
+        resumen["total_mal_comportamiento"] = len(mal_comportamiento)
+
+        resumen["componentes_promedio"] = df[COMPONENTES_GRUPALES].mean().round(2).to_dict()
+
+        reportes[nombre] = resumen
+
+    return _ensamblar_reporte_grupal(list(hojas.keys()), reportes, estatus)
+
+
+class Command(BaseCommand):
+    help = "Compara el tiempo del motor long-form del reporte grupal con la implementación por hojas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--estudiantes", type=int, default=5000)
+        parser.add_argument("--hojas", type=int, default=12)
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        hojas = generar_hojas_sinteticas(options["estudiantes"], options["hojas"])
+        repeticiones = options["repeticiones"]
+
+        anterior = json.dumps(generar_reporte_grupal_por_hojas(hojas), ensure_ascii=False)
+        nuevo = json.dumps(generar_reporte_grupal_completo(hojas), ensure_ascii=False)
+        if anterior != nuevo:
+            raise CommandError("El motor long-form no produce la misma salida que la implementación por hojas.")
+
+        tiempos = {}
+        for nombre, funcion in [
+            ("por hojas", generar_reporte_grupal_por_hojas),
+            ("long-form", generar_reporte_grupal_completo),
+        ]:
+            muestras = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                funcion(hojas)
+                muestras.append(time.perf_counter() - inicio)
+            tiempos[nombre] = min(muestras)
+
+        self.stdout.write(
+            f"{options['estudiantes']} estudiantes x {options['hojas']} hojas "
+            f"(mejor de {repeticiones}); salida idéntica ({len(nuevo)} bytes)"
+        )
+        for nombre, segundos in tiempos.items():
+            self.stdout.write(f"  {nombre:<10} {segundos * 1000:9.1f} ms")
+        self.stdout.write(f"  aceleración {tiempos['por hojas'] / tiempos['long-form']:.2f}x")
@@ -0,0 +1,47 @@
+"""
+Genera el DashboardSummary de los archivos que todavía no lo tienen
+(archivos subidos antes de existir la tabla).
+
+Uso:
+    python manage.py generar_resumenes_dashboard [--todos]
+"""
+
+from django.core.management.base import BaseCommand
+
+from myapp.models import ArchivoNotas
+from myapp.services import MetricsService
+from myapp.utils.report_generator import generar_reporte_grupal_completo
+from myapp.utils.workbook_store import cargar_hojas
+
+
+class Command(BaseCommand):
+    help = "Rellena la tabla DashboardSummary a partir del resumen_json de cada archivo."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todos",
+            action="store_true",
+            help="Recalcular también los archivos que ya tienen resumen",
+        )
+
+    def handle(self, *args, **options):
+        archivos = ArchivoNotas.objects.order_by("id")
+        if not options["todos"]:
+            archivos = archivos.filter(dashboard_summary__isnull=True)
+
+        creados, errores = 0, 0
+        for archivo in archivos.iterator(chunk_size=100):
+            try:
+                resumen = archivo.resumen_json
+                if not resumen:
+                    # Archivos antiguos sin resumen: se calcula desde las hojas
+                    resumen = generar_reporte_grupal_completo(cargar_hojas(archivo))
+                    ArchivoNotas.objects.filter(pk=archivo.pk).update(resumen_json=resumen)
+
+                MetricsService.save_summary(archivo, resumen)
+                creados += 1
+            except Exception as e:
+                errores += 1
+                self.stderr.write(f"Archivo {archivo.pk} ({archivo.nombre}): {type(e).__name__}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes generados: {creados}. Errores: {errores}."))
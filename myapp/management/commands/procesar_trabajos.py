@@ -0,0 +1,135 @@
+"""
+Worker local de la cola de reportes. Atiende primero los lotes (reportes de
+toda una clase) y después los trabajos sueltos.
+
+Uso:
+    python manage.py procesar_trabajos            # queda escuchando la cola
+    python manage.py procesar_trabajos --una-vez  # procesa lo pendiente y termina
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from myapp.models import LoteReportes, TrabajoReporte
+from myapp.services import ReportService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Procesa los TrabajoReporte en cola usando la base de datos como broker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2.0,
+            help="Segundos de espera entre consultas cuando la cola está vacía.",
+        )
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Procesar los trabajos pendientes y terminar.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker de reportes iniciado.")
+        while True:
+            lote = self.reclamar_lote()
+            if lote is not None:
+                self.stdout.write(f"Procesando lote {lote.pk}...")
+                lote = ReportService.ejecutar_lote(lote)
+                self.stdout.write(f"Lote {lote.pk}: {lote.get_estado_display()}")
+                continue
+
+            trabajo = self.reclamar_siguiente()
+            if trabajo is None:
+                if options["una_vez"]:
+                    break
+                time.sleep(options["intervalo"])
+                continue
+
+            self.stdout.write(f"Procesando trabajo {trabajo.pk}...")
+            trabajo = ReportService.ejecutar_trabajo(trabajo)
+            self.stdout.write(f"Trabajo {trabajo.pk}: {trabajo.get_estado_display()}")
+
+    @staticmethod
+    def reclamar_siguiente():
+        """
+        Toma el trabajo más antiguo en cola (o abandonado por un worker caído).
+        El UPDATE condicional garantiza que solo un worker lo reclame aunque
+        haya varios procesos en paralelo.
+        """
+        while True:
+            candidato = _candidato(
+                TrabajoReporte.objects.filter(lote__isnull=True),
+                TrabajoReporte.ESTADO_EN_COLA,
+                [TrabajoReporte.ESTADO_GENERANDO_NARRATIVA, TrabajoReporte.ESTADO_RENDERIZANDO_PDF],
+            )
+            if candidato is None:
+                return None
+
+            if _reclamar(TrabajoReporte, candidato, TrabajoReporte.ESTADO_GENERANDO_NARRATIVA):
+                return TrabajoReporte.objects.select_related("archivo", "usuario").get(pk=candidato[0])
+
+    @staticmethod
+    def reclamar_lote():
+        """
+        Toma el lote más antiguo en cola (o abandonado), con el mismo UPDATE
+        condicional que reclamar_siguiente. Los trabajos que el worker caído
+        dejó a medias vuelven a la cola del lote.
+        """
+        while True:
+            candidato = _candidato(
+                LoteReportes.objects.all(), LoteReportes.ESTADO_EN_COLA, [LoteReportes.ESTADO_PROCESANDO]
+            )
+            if candidato is None:
+                return None
+
+            if _reclamar(LoteReportes, candidato, LoteReportes.ESTADO_PROCESANDO):
+                TrabajoReporte.objects.filter(
+                    lote_id=candidato[0],
+                    estado__in=[TrabajoReporte.ESTADO_GENERANDO_NARRATIVA, TrabajoReporte.ESTADO_RENDERIZANDO_PDF],
+                ).update(estado=TrabajoReporte.ESTADO_EN_COLA, fecha_actualizacion=timezone.now())
+                return LoteReportes.objects.select_related("archivo", "usuario").get(pk=candidato[0])
+
+
+def _candidato(queryset, en_cola, en_proceso):
+    """
+    (id, estado, fecha_actualizacion) del más antiguo en cola o en proceso sin
+    actualizarse desde hace settings.TRABAJOS_TIEMPO_MAXIMO segundos.
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, "TRABAJOS_TIEMPO_MAXIMO", 3600))
+    return (
+        queryset
+        .filter(Q(estado=en_cola) | Q(estado__in=en_proceso, fecha_actualizacion__lt=limite))
+        .order_by("fecha_creacion", "id")
+        .values_list("id", "estado", "fecha_actualizacion")
+        .first()
+    )
+
+
+def _reclamar(modelo, candidato, estado):
+    """
+    Pasa el candidato a `estado` solo si nadie lo cambió desde que se leyó
+    (mismo estado y misma fecha_actualizacion).
+
+    Returns:
+        bool: True si este worker lo reclamó
+    """
+    pk, estado_anterior, fecha = candidato
+    reclamado = modelo.objects.filter(pk=pk, estado=estado_anterior, fecha_actualizacion=fecha).update(
+        estado=estado, fecha_actualizacion=timezone.now()
+    )
+    if reclamado and estado_anterior != modelo.ESTADO_EN_COLA:
+        logger.warning(
+            "%s %s abandonado en '%s' desde %s; se vuelve a procesar",
+            modelo.__name__, pk, estado_anterior, f"{fecha:%Y-%m-%d %H:%M}"
+        )
+    return bool(reclamado)
@@ -0,0 +1,76 @@
+"""
+Vuelve a generar los PDF de los reportes ya guardados (p. ej. después de un
+cambio de estilo), en paralelo en el pool de procesos.
+
+Uso:
+    python manage.py rerenderizar_reportes --archivo 12
+    python manage.py rerenderizar_reportes --usuario docente --desde 2026-09-01
+    python manage.py rerenderizar_reportes --todos
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from myapp.models import ReporteGenerado
+from myapp.services import ReportService
+from myapp.utils.process_pool import numero_workers
+
+
+class Command(BaseCommand):
+    help = "Vuelve a renderizar los PDF de los reportes guardados a partir de su narrativa."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", help="Nombre de usuario del docente")
+        parser.add_argument("--archivo", type=int, help="Id del archivo de notas")
+        parser.add_argument("--tipo", choices=[tipo for tipo, _ in ReporteGenerado.TIPO_CHOICES])
+        parser.add_argument("--desde", help="Reportes generados desde esta fecha (AAAA-MM-DD)")
+        parser.add_argument("--hasta", help="Reportes generados hasta esta fecha, inclusive (AAAA-MM-DD)")
+        parser.add_argument("--todos", action="store_true", help="Todos los reportes (sin filtros)")
+
+    def handle(self, *args, **options):
+        reportes = ReporteGenerado.objects.all()
+        filtrado = False
+
+        if options["usuario"]:
+            reportes = reportes.filter(usuario__username=options["usuario"])
+            filtrado = True
+        if options["archivo"]:
+            reportes = reportes.filter(archivo_id=options["archivo"])
+            filtrado = True
+        if options["tipo"]:
+            reportes = reportes.filter(tipo=options["tipo"])
+            filtrado = True
+        for parametro, lookup in [("desde", "gte"), ("hasta", "lt")]:
+            if not options[parametro]:
+                continue
+            fecha = parse_date(options[parametro])
+            if fecha is None:
+                raise CommandError(f"Fecha inválida en --{parametro}: {options[parametro]}")
+            if parametro == "hasta":
+                fecha += timedelta(days=1)
+            inicio_dia = timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+            reportes = reportes.filter(**{f"fecha_generacion__{lookup}": inicio_dia})
+            filtrado = True
+
+        if not filtrado and not options["todos"]:
+            raise CommandError("Indica algún filtro o --todos para renderizar todos los reportes.")
+
+        inicio = time.perf_counter()
+        try:
+            renderizados, errores = ReportService.rerenderizar_reportes(reportes)
+        except NotImplementedError:
+            raise CommandError("El almacenamiento de los PDF no es local: no se pueden renderizar en lote.")
+        segundos = time.perf_counter() - inicio
+
+        for reporte_id, error in errores:
+            self.stderr.write(f"Reporte {reporte_id}: {error}")
+
+        ritmo = renderizados / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"PDF renderizados: {renderizados} en {segundos:.1f} s ({ritmo:.1f}/s, "
+            f"{max(numero_workers(), 1)} procesos). Errores: {len(errores)}."
+        ))
@@ -0,0 +1,175 @@
+"""
+Servidor HTTP local que imita a Ollama (/api/chat, /api/tags) y a la API de
+OpenAI (/v1/chat/completions, /v1/models) con las respuestas deterministas
+del stub (services/llm_backends.py). Sirve para perfilar y probar el flujo
+completo de reportes (cola, PDF, almacenamiento) sin un modelo real.
+
+Uso:
+    python manage.py servidor_llm_simulado --puerto 11435 --latencia 0.5 --tokens-por-segundo 40
+
+y en settings (o con override_settings):
+    LLM_BACKEND = "ollama"
+    OLLAMA_HOST = "http://127.0.0.1:11435"
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from myapp.services.llm_backends import SimuladorLLM
+
+
+class ManejadorLLM(BaseHTTPRequestHandler):
+    """
+    Atiende las rutas de Ollama y de OpenAI. HTTP/1.1 con keep-alive; las
+    respuestas en stream van con Transfer-Encoding: chunked.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+    def do_GET(self):
+        modelo = {"name": self.server.modelo, "model": self.server.modelo}
+        if self.path == "/api/tags":
+            self._json({"models": [modelo]})
+        elif self.path == "/api/version":
+            self._json({"version": "simulado"})
+        elif self.path == "/v1/models":
+            self._json({"object": "list", "data": [{"id": self.server.modelo, "object": "model"}]})
+        else:
+            self._json({"error": "ruta no encontrada"}, estado=404)
+
+    def do_POST(self):
+        try:
+            cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError:
+            self._json({"error": "JSON inválido"}, estado=400)
+            return
+
+        if self.path not in ("/api/chat", "/v1/chat/completions"):
+            self._json({"error": "ruta no encontrada"}, estado=404)
+            return
+
+        modelo = cuerpo.get("model") or self.server.modelo
+        mensajes = cuerpo.get("messages", [])
+        # Como OLLAMA_NUM_PARALLEL: las peticiones de más esperan su turno
+        with self.server.turnos:
+            if self.path == "/api/chat":
+                # En Ollama stream es True por defecto
+                if cuerpo.get("stream", True):
+                    self._ndjson(self.server.simulador.fragmentos(modelo, mensajes))
+                else:
+                    self._json(self.server.simulador.respuesta(modelo, mensajes))
+            elif cuerpo.get("stream"):
+                self._sse(self._openai_fragmentos(modelo, mensajes))
+            else:
+                final = self.server.simulador.respuesta(modelo, mensajes)
+                self._json(self._openai(modelo, final, {"message": final["message"], "finish_reason": "stop"}))
+
+    def _openai_fragmentos(self, modelo, mensajes):
+        for parte in self.server.simulador.fragmentos(modelo, mensajes):
+            if parte["done"]:
+                yield self._openai(modelo, parte, {"delta": {}, "finish_reason": "stop"}, "chat.completion.chunk")
+            else:
+                yield self._openai(modelo, None, {"delta": {"content": parte["message"]["content"]}}, "chat.completion.chunk")
+
+    @staticmethod
+    def _openai(modelo, final, opcion, objeto="chat.completion"):
+        respuesta = {
+            "id": "simulado",
+            "object": objeto,
+            "created": int(time.time()),
+            "model": modelo,
+            "choices": [{"index": 0, **opcion}],
+        }
+        if final is not None:
+            respuesta["usage"] = {
+                "prompt_tokens": final["prompt_eval_count"],
+                "completion_tokens": final["eval_count"],
+                "total_tokens": final["prompt_eval_count"] + final["eval_count"],
+            }
+        return respuesta
+
+    def _json(self, datos, estado=200):
+        contenido = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def _ndjson(self, partes):
+        self._enviar_por_partes("application/x-ndjson", (
+            json.dumps(parte, ensure_ascii=False) + "\n" for parte in partes
+        ))
+
+    def _sse(self, partes):
+        lineas = (f"data: {json.dumps(parte, ensure_ascii=False)}\n\n" for parte in partes)
+        self._enviar_por_partes("text/event-stream", _con_final(lineas, "data: [DONE]\n\n"))
+
+    def _enviar_por_partes(self, tipo, textos):
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for texto in textos:
+            datos = texto.encode("utf-8")
+            self.wfile.write(f"{len(datos):x}\r\n".encode() + datos + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _con_final(iterable, final):
+    yield from iterable
+    yield final
+
+
+def crear_servidor(simulador, host="127.0.0.1", puerto=11435, paralelo=4, modelo="simulado", verboso=False):
+    """
+    Crea el servidor (sin iniciarlo). Con puerto=0 el sistema elige uno libre:
+    se lee en servidor.server_address.
+
+    Returns:
+        ThreadingHTTPServer
+    """
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorLLM)
+    servidor.daemon_threads = True
+    servidor.simulador = simulador
+    servidor.modelo = modelo
+    servidor.turnos = threading.BoundedSemaphore(max(1, paralelo))
+    servidor.verboso = verboso
+    return servidor
+
+
+class Command(BaseCommand):
+    help = "Servidor local que imita a Ollama y a la API de OpenAI con respuestas deterministas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--puerto", type=int, default=11435)
+        parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de prefill por petición")
+        parser.add_argument("--tokens-por-segundo", type=float, default=None, help="Ritmo de generación (sin límite por defecto)")
+        parser.add_argument("--tokens", type=int, default=400, help="Largo aproximado de cada respuesta")
+        parser.add_argument("--paralelo", type=int, default=4, help="Peticiones atendidas a la vez (OLLAMA_NUM_PARALLEL)")
+        parser.add_argument("--modelo", default="simulado")
+
+    def handle(self, *args, **options):
+        simulador = SimuladorLLM(options["latencia"], options["tokens_por_segundo"], options["tokens"])
+        servidor = crear_servidor(
+            simulador, options["host"], options["puerto"], options["paralelo"], options["modelo"],
+            verboso=options["verbosity"] > 1
+        )
+        host, puerto = servidor.server_address[:2]
+        self.stdout.write(f"Servidor LLM simulado en http://{host}:{puerto} (Ctrl+C para terminar)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0004_alter_archivonotas_options_archivonotas_activo"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrabajoReporte",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("grupal", "Grupal"), ("individual", "Individual")],
+                        max_length=20,
+                    ),
+                ),
+                ("estudiante", models.CharField(blank=True, max_length=255, null=True)),
+                ("json_data", models.JSONField(blank=True, null=True)),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("en_cola", "En cola"),
+                            ("generando_narrativa", "Generando narrativa"),
+                            ("renderizando_pdf", "Renderizando PDF"),
+                            ("completado", "Completado"),
+                            ("error", "Error"),
+                        ],
+                        default="en_cola",
+                        max_length=30,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, default="")),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+                ("fecha_actualizacion", models.DateTimeField(auto_now=True)),
+                (
+                    "archivo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trabajos",
+                        to="myapp.archivonotas",
+                    ),
+                ),
+                (
+                    "reporte",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="trabajos",
+                        to="myapp.reportegenerado",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["fecha_creacion"],
+                "indexes": [
+                    models.Index(
+                        fields=["estado", "fecha_creacion"],
+                        name="myapp_traba_estado_1bf647_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0005_trabajoreporte"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trabajoreporte",
+            name="forzar_regeneracion",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="NarrativaCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("clave", models.CharField(max_length=64, unique=True)),
+                ("modelo", models.CharField(max_length=100)),
+                ("narrativa", models.TextField()),
+                ("aciertos", models.PositiveIntegerField(default=0)),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+                ("ultimo_acceso", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["ultimo_acceso"], name="myapp_narra_ultimo__47b093_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0006_narrativacache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="estudiante",
+            name="reporte_json",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="estudiante",
+            index=models.Index(
+                fields=["archivo", "nombre"], name="myapp_estud_archivo_d025ff_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0007_estudiante_reporte_json"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="archivonotas",
+            index=models.Index(
+                fields=["usuario", "-fecha_subida", "-id"],
+                name="myapp_archi_usuario_46f7df_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0008_archivonotas_indice_listado"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reportegenerado",
+            index=models.Index(
+                fields=["usuario", "-fecha_generacion", "-id"],
+                name="myapp_repor_usuario_17a3c7_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportegenerado",
+            index=models.Index(
+                fields=["usuario", "tipo", "-fecha_generacion", "-id"],
+                name="myapp_repor_usuario_26d320_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportegenerado",
+            index=models.Index(
+                fields=["usuario", "estudiante", "-fecha_generacion", "-id"],
+                name="myapp_repor_usuario_9d890a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportegenerado",
+            index=models.Index(
+                fields=["archivo", "-fecha_generacion", "-id"],
+                name="myapp_repor_archivo_8b5f85_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0009_reportegenerado_indices_historial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("promedio_general", models.FloatField(default=0)),
+                ("aprobados", models.IntegerField(default=0)),
+                ("reprobados", models.IntegerField(default=0)),
+                ("trimestres", models.JSONField(default=list)),
+                ("promedios_trimestrales", models.JSONField(default=list)),
+                ("faltas_justificadas", models.JSONField(default=list)),
+                ("faltas_injustificadas", models.JSONField(default=list)),
+                ("fecha_actualizacion", models.DateTimeField(auto_now=True)),
+                (
+                    "archivo",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dashboard_summary",
+                        to="myapp.archivonotas",
+                    ),
+                ),
+            ],
+        ),
+    ]
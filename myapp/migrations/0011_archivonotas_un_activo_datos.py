@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+def un_archivo_activo_por_usuario(apps, schema_editor):
+    """
+    Deja exactamente un archivo activo por usuario antes de crear el índice
+    único parcial: el activo más reciente o, si no hay ninguno, el más reciente.
+    """
+    ArchivoNotas = apps.get_model("myapp", "ArchivoNotas")
+    usuarios = (
+        ArchivoNotas.objects.order_by().values_list("usuario_id", flat=True).distinct()
+    )
+    for usuario_id in usuarios:
+        archivos = ArchivoNotas.objects.filter(usuario_id=usuario_id)
+        elegido = (
+            archivos.order_by("-activo", "-fecha_subida", "-id")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        archivos.filter(activo=True).exclude(pk=elegido).update(activo=False)
+        archivos.filter(pk=elegido, activo=False).update(activo=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0010_dashboardsummary"),
+    ]
+
+    operations = [
+        migrations.RunPython(un_archivo_activo_por_usuario, migrations.RunPython.noop),
+    ]
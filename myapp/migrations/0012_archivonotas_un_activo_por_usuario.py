@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0011_archivonotas_un_activo_datos"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="archivonotas",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("activo", True)),
+                fields=("usuario",),
+                name="un_archivo_activo_por_usuario",
+            ),
+        ),
+    ]
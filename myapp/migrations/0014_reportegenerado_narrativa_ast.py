@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0013_archivonotas_indice_activo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportegenerado",
+            name="narrativa_ast",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
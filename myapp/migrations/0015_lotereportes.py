@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0014_reportegenerado_narrativa_ast"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoteReportes",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("forzar_regeneracion", models.BooleanField(default=False)),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("en_cola", "En cola"),
+                            ("procesando", "Procesando"),
+                            ("completado", "Completado"),
+                            ("error", "Error"),
+                        ],
+                        default="en_cola",
+                        max_length=30,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, default="")),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+                ("fecha_actualizacion", models.DateTimeField(auto_now=True)),
+                (
+                    "archivo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lotes",
+                        to="myapp.archivonotas",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["fecha_creacion"],
+            },
+        ),
+        migrations.AddField(
+            model_name="trabajoreporte",
+            name="lote",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="trabajos",
+                to="myapp.lotereportes",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lotereportes",
+            index=models.Index(
+                fields=["estado", "fecha_creacion"],
+                name="myapp_loter_estado_8f5bda_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 class ArchivoNotas(models.Model):
@@ -11,25 +11,93 @@ class ArchivoNotas(models.Model):
 
     class Meta:
         ordering = ['-fecha_subida']
+        indexes = [
+            # Listado paginado por cursor (listar_archivos)
+            models.Index(fields=['usuario', '-fecha_subida', '-id']),
+            # Archivo activo o, si no hay, el más reciente (dashboard)
+            models.Index(fields=['usuario', '-activo', '-fecha_subida', '-id']),
+        ]
+        constraints = [
+            # Como máximo un archivo activo por usuario (índice único parcial)
+            models.UniqueConstraint(
+                fields=['usuario'], condition=models.Q(activo=True), name='un_archivo_activo_por_usuario'
+            ),
+        ]
 
     def __str__(self):
         return self.nombre
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Valor guardado de 'activo' (None si no se cargó), para save()
+        instancia._activo_en_bd = instancia.__dict__.get('activo')
+        return instancia
     
     def save(self, *args, **kwargs):
-        # Si este archivo se marca como activo, desactivar los demás del usuario
-        if self.activo:
-            ArchivoNotas.objects.filter(usuario=self.usuario).exclude(pk=self.pk).update(activo=False)
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        activar = (
+            'activo' not in self.get_deferred_fields()
+            and self.activo
+            and (self._state.adding or getattr(self, '_activo_en_bd', None) is not True)
+            and (update_fields is None or 'activo' in update_fields)
+        )
+        if not activar:
+            # Guardados que no activan el archivo (p. ej. resumen_json) no tocan los demás
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                # Bloqueo por usuario: dos activaciones o subidas simultáneas se
+                # ejecutan una tras otra (SQLite ya serializa las escrituras).
+                list(User.objects.select_for_update().filter(pk=self.usuario_id).values_list('pk', flat=True))
+                ArchivoNotas.objects.filter(usuario_id=self.usuario_id, activo=True).exclude(pk=self.pk).update(activo=False)
+                super().save(*args, **kwargs)
+        self._activo_en_bd = self.__dict__.get('activo')
+
+    def activar(self):
+        """
+        Marca este archivo como el activo del usuario y desactiva el anterior
+        en una sola transacción.
+        """
+        self.activo = True
+        self.save(update_fields=['activo'])
 
 
 class Estudiante(models.Model):
     archivo = models.ForeignKey(ArchivoNotas, on_delete=models.CASCADE, related_name='estudiantes')
     nombre = models.CharField(max_length=255)
+    # Reporte individual precalculado al subir el archivo
+    reporte_json = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['archivo', 'nombre']),
+        ]
 
     def __str__(self):
         return self.nombre
 
 
+class DashboardSummary(models.Model):
+    """
+    Resumen compacto del dashboard de un archivo, calculado al procesarlo a
+    partir de resumen_json. get_metricas lee solo esta fila.
+    """
+    archivo = models.OneToOneField(ArchivoNotas, on_delete=models.CASCADE, related_name='dashboard_summary')
+    promedio_general = models.FloatField(default=0)
+    aprobados = models.IntegerField(default=0)
+    reprobados = models.IntegerField(default=0)
+    # Un valor por trimestre, en el orden de las hojas
+    trimestres = models.JSONField(default=list)
+    promedios_trimestrales = models.JSONField(default=list)
+    faltas_justificadas = models.JSONField(default=list)
+    faltas_injustificadas = models.JSONField(default=list)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen dashboard - {self.archivo}"
+
+
 class ReporteGenerado(models.Model):
     TIPO_CHOICES = [
         ('grupal', 'Grupal'),
@@ -44,10 +112,120 @@ class ReporteGenerado(models.Model):
     pdf_file = models.FileField(upload_to='reportes/')
     json_data = models.JSONField()
     narrativa = models.TextField()
+    # Narrativa ya analizada (utils/narrativa_ast.py) para volver a renderizar el PDF
+    narrativa_ast = models.JSONField(null=True, blank=True)
     fecha_generacion = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-fecha_generacion']
+        indexes = [
+            # Historial paginado por cursor, sin filtros y con cada filtro
+            models.Index(fields=['usuario', '-fecha_generacion', '-id']),
+            models.Index(fields=['usuario', 'tipo', '-fecha_generacion', '-id']),
+            models.Index(fields=['usuario', 'estudiante', '-fecha_generacion', '-id']),
+            models.Index(fields=['archivo', '-fecha_generacion', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.descripcion} - {self.fecha_generacion.strftime('%d/%m/%Y')}"
+
+
+class LoteReportes(models.Model):
+    """
+    Reportes individuales de toda una clase pedidos de una vez. Cada
+    estudiante es un TrabajoReporte del lote; el comando `procesar_trabajos`
+    genera las narrativas en paralelo (hasta settings.OLLAMA_NUM_PARALLEL)
+    y renderiza cada PDF en cuanto su narrativa está lista.
+    """
+    ESTADO_EN_COLA = 'en_cola'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_COMPLETADO = 'completado'
+    ESTADO_ERROR = 'error'
+
+    ESTADO_CHOICES = [
+        (ESTADO_EN_COLA, 'En cola'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_COMPLETADO, 'Completado'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    archivo = models.ForeignKey(ArchivoNotas, on_delete=models.CASCADE, related_name='lotes')
+    forzar_regeneracion = models.BooleanField(default=False)
+    estado = models.CharField(max_length=30, choices=ESTADO_CHOICES, default=ESTADO_EN_COLA)
+    error = models.TextField(blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"Lote {self.pk} ({self.get_estado_display()})"
+
+
+class TrabajoReporte(models.Model):
+    """
+    Trabajo en cola para generar un reporte (narrativa IA + PDF) fuera del ciclo
+    de la petición HTTP. Lo procesa el comando `procesar_trabajos`.
+    """
+    ESTADO_EN_COLA = 'en_cola'
+    ESTADO_GENERANDO_NARRATIVA = 'generando_narrativa'
+    ESTADO_RENDERIZANDO_PDF = 'renderizando_pdf'
+    ESTADO_COMPLETADO = 'completado'
+    ESTADO_ERROR = 'error'
+
+    ESTADO_CHOICES = [
+        (ESTADO_EN_COLA, 'En cola'),
+        (ESTADO_GENERANDO_NARRATIVA, 'Generando narrativa'),
+        (ESTADO_RENDERIZANDO_PDF, 'Renderizando PDF'),
+        (ESTADO_COMPLETADO, 'Completado'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    archivo = models.ForeignKey(ArchivoNotas, on_delete=models.CASCADE, related_name='trabajos')
+    tipo = models.CharField(max_length=20, choices=ReporteGenerado.TIPO_CHOICES)
+    estudiante = models.CharField(max_length=255, blank=True, null=True)
+    json_data = models.JSONField(null=True, blank=True)
+    forzar_regeneracion = models.BooleanField(default=False)
+    estado = models.CharField(max_length=30, choices=ESTADO_CHOICES, default=ESTADO_EN_COLA)
+    reporte = models.ForeignKey(ReporteGenerado, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos')
+    # Lote al que pertenece (los trabajos de un lote se procesan juntos)
+    lote = models.ForeignKey(LoteReportes, on_delete=models.CASCADE, null=True, blank=True, related_name='trabajos')
+    error = models.TextField(blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"Trabajo {self.pk} ({self.get_estado_display()})"
+
+
+class NarrativaCache(models.Model):
+    """
+    Narrativas ya generadas, indexadas por el hash de (prompt, modelo, opciones).
+    Evita volver a llamar al LLM cuando se pide exactamente el mismo reporte.
+    """
+    clave = models.CharField(max_length=64, unique=True)
+    modelo = models.CharField(max_length=100)
+    narrativa = models.TextField()
+    aciertos = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultimo_acceso = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ultimo_acceso']),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} - {self.clave[:12]}"
@@ -1,4 +1,14 @@
-import json
+import logging
+
+from .utils.prompt_compacto import (
+    LEYENDA,
+    RECORTES_GRUPAL,
+    ajustar_a_presupuesto,
+    compactar_grupal,
+    compactar_individual,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def get_prompt_reporte_grupal(json_data):
@@ -7,7 +17,7 @@ def get_prompt_reporte_grupal(json_data):
     
     Enfoque: Análisis colectivo del grupo con métricas agregadas.
     """
-    prompt = (
+    instrucciones = (
         "Eres un experto en análisis de datos educativos y pedagógicos. "
         "Recibirás información de un grupo de estudiantes en formato JSON con calificaciones y métricas de desempeño académico.\n\n"
         "Tu tarea es generar un reporte narrativo grupal en español, claro, conciso y profesional, dirigido a docentes y directivos académicos. "
@@ -23,8 +33,13 @@ def get_prompt_reporte_grupal(json_data):
         "8. Comparación general entre estudiantes: mejoras, caídas y tendencias grupales.\n"
         "9. Fortalezas y debilidades grupales: aspectos positivos comunes y debilidades colectivas.\n"
         "10. Recomendaciones pedagógicas prácticas y constructivas.\n\n"
-        f"Datos del grupo:\n{json.dumps(json_data, ensure_ascii=False, indent=2)}"
+        f"{LEYENDA}\n\n"
+        "Datos del grupo:\n"
     )
+    prompt, tokens, recortes = ajustar_a_presupuesto(
+        lambda datos: instrucciones + datos, compactar_grupal(json_data), RECORTES_GRUPAL
+    )
+    _registrar_prompt("grupal", prompt, tokens, recortes)
     return prompt
 
 
@@ -34,7 +49,7 @@ def get_prompt_reporte_individual(json_data, nombre_estudiante):
     
     Enfoque: Análisis personalizado del desempeño de un estudiante específico.
     """
-    prompt = (
+    instrucciones = (
         "Eres un experto en análisis de datos educativos y pedagógicos. "
         "Recibirás información de un estudiante en formato JSON, con calificaciones y métricas de desempeño académico.\n\n"
         "Tu tarea es generar un reporte narrativo en español, claro, conciso y profesional, dirigido a docentes y directivos académicos. "
@@ -48,6 +63,20 @@ def get_prompt_reporte_individual(json_data, nombre_estudiante):
         "6. Comportamiento y asistencia: evolución y su influencia en el rendimiento.\n"
         "7. Fortalezas y debilidades del estudiante: principales logros y áreas de mejora.\n"
         "8. Recomendaciones pedagógicas personalizadas y constructivas.\n\n"
-        f"Datos del estudiante {nombre_estudiante}:\n{json.dumps(json_data, ensure_ascii=False, indent=2)}"
+        f"{LEYENDA}\n\n"
+        f"Datos del estudiante {nombre_estudiante}:\n"
+    )
+    prompt, tokens, recortes = ajustar_a_presupuesto(
+        lambda datos: instrucciones + datos, compactar_individual(json_data)
     )
+    _registrar_prompt("individual", prompt, tokens, recortes)
     return prompt
+
+
+def _registrar_prompt(tipo, prompt, tokens, recortes):
+    """
+    Deja en el log el tamaño del prompt (el tiempo de prefill lo registra
+    services/llm_client.py con la respuesta de Ollama).
+    """
+    detalle = f", recortes: {'; '.join(recortes)}" if recortes else ""
+    logger.info("Prompt %s: %d caracteres, ~%d tokens%s", tipo, len(prompt), tokens, detalle)
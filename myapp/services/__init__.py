@@ -3,5 +3,7 @@ Servicios de lógica de negocio.
 """
 
 from .metrics_service import MetricsService
+from .report_service import ReportService
+from .upload_service import UploadService
 
-__all__ = ['MetricsService']
+__all__ = ['MetricsService', 'ReportService', 'UploadService']
@@ -0,0 +1,317 @@
+"""
+Backends del modelo de lenguaje. settings.LLM_BACKEND elige cuál usa
+LLMClient (services/llm_client.py):
+
+- "ollama": servidor de Ollama (OLLAMA_HOST, OLLAMA_MODEL).
+- "openai": cualquier servidor con la API de OpenAI (/v1/chat/completions),
+  p. ej. vLLM o llama.cpp (LLM_OPENAI_URL, LLM_OPENAI_MODEL).
+- "stub": respuestas deterministas generadas en el proceso, sin red, para
+  pruebas y perfiles del resto del flujo (cola, PDF, almacenamiento).
+
+El comando `servidor_llm_simulado` sirve las mismas respuestas del stub por
+HTTP imitando /api/chat de Ollama (y /v1/chat/completions), con latencia,
+tokens por segundo y streaming configurables: el backend "ollama" apuntado a
+ese servidor ejercita también la red y el cliente HTTP.
+
+Todos los backends responden con la forma de Ollama: {"message": {"content"},
+"prompt_eval_count", "prompt_eval_duration", ...}; con stream=True, un
+iterador de fragmentos con esa forma (el último con done=True y los tiempos).
+"""
+
+import hashlib
+import json
+import random
+import time
+
+import httpx
+import ollama
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from ..utils.prompt_compacto import contar_tokens
+
+
+class LLMBackend:
+    """
+    Interfaz de un backend. Los métodos se pueden llamar desde varios hilos.
+    """
+
+    nombre = ""
+    modelo = ""
+
+    def chat(self, model, messages, options=None, stream=False):
+        """
+        Genera la respuesta a los mensajes.
+
+        Returns:
+            dict o iterador de dict con la forma de las respuestas de Ollama
+        """
+        raise NotImplementedError
+
+    def verificar(self):
+        """
+        Comprueba que el servidor responda (lanza la excepción si no).
+        """
+        raise NotImplementedError
+
+    def cerrar(self):
+        """
+        Libera las conexiones abiertas.
+        """
+
+
+class OllamaBackend(LLMBackend):
+    """
+    Servidor de Ollama con un pool de conexiones httpx persistente.
+    """
+
+    nombre = "ollama"
+
+    def __init__(self, host=None, modelo=None, cliente=None, sonda=None):
+        self.host = host or getattr(settings, "OLLAMA_HOST", None)
+        self.modelo = modelo or getattr(settings, "OLLAMA_MODEL", "gemma3:12b")
+        timeout_conexion = getattr(settings, "OLLAMA_TIMEOUT_CONEXION", 5)
+        if cliente is None:
+            paralelo = max(1, getattr(settings, "OLLAMA_NUM_PARALLEL", 1))
+            cliente = ollama.Client(
+                host=self.host,
+                timeout=httpx.Timeout(getattr(settings, "OLLAMA_TIMEOUT", 1800), connect=timeout_conexion),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=paralelo),
+            )
+        # La verificación de salud usa su propia conexión con un tiempo de
+        # espera corto: un servidor colgado no debe retenerla 30 minutos
+        if sonda is None:
+            sonda = ollama.Client(host=self.host, timeout=timeout_conexion)
+        self.cliente = cliente
+        self.sonda = sonda
+
+    def chat(self, model, messages, options=None, stream=False):
+        return self.cliente.chat(model=model, messages=messages, options=options, stream=stream)
+
+    def verificar(self):
+        self.sonda.list()
+
+    def cerrar(self):
+        for cliente in (self.cliente, self.sonda):
+            cerrar = getattr(cliente, "close", None)
+            if cerrar:
+                cerrar()
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Servidor con la API de chat de OpenAI. Las opciones de Ollama que tienen
+    equivalente (temperature, top_p, seed, num_predict) se traducen. El
+    modelo es obligatorio: la API no tiene uno por defecto.
+    """
+
+    nombre = "openai"
+    OPCIONES = {"temperature": "temperature", "top_p": "top_p", "seed": "seed", "num_predict": "max_tokens"}
+
+    def __init__(self, url=None, modelo=None, api_key=None):
+        self.url = (url or getattr(settings, "LLM_OPENAI_URL", "http://localhost:8000/v1")).rstrip("/")
+        self.modelo = modelo or getattr(settings, "LLM_OPENAI_MODEL", "")
+        if not self.modelo:
+            raise ImproperlyConfigured("LLM_BACKEND = 'openai' requiere LLM_OPENAI_MODEL")
+        api_key = api_key or getattr(settings, "LLM_OPENAI_API_KEY", None)
+        timeout_conexion = getattr(settings, "OLLAMA_TIMEOUT_CONEXION", 5)
+        paralelo = max(1, getattr(settings, "OLLAMA_NUM_PARALLEL", 1))
+        self.cliente = httpx.Client(
+            base_url=self.url,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=httpx.Timeout(getattr(settings, "OLLAMA_TIMEOUT", 1800), connect=timeout_conexion),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=paralelo),
+        )
+        self.sonda = httpx.Client(base_url=self.url, headers=self.cliente.headers, timeout=timeout_conexion)
+
+    def chat(self, model, messages, options=None, stream=False):
+        cuerpo = {"model": model, "messages": messages, "stream": stream}
+        for clave, valor in (options or {}).items():
+            if clave in self.OPCIONES:
+                cuerpo[self.OPCIONES[clave]] = valor
+        if stream:
+            cuerpo["stream_options"] = {"include_usage": True}
+            return self._stream(cuerpo)
+
+        inicio = time.perf_counter_ns()
+        respuesta = self.cliente.post("/chat/completions", json=cuerpo)
+        respuesta.raise_for_status()
+        datos = respuesta.json()
+        return _respuesta_ollama(
+            datos["choices"][0]["message"]["content"] or "",
+            datos.get("usage"), time.perf_counter_ns() - inicio
+        )
+
+    def _stream(self, cuerpo):
+        inicio = time.perf_counter_ns()
+        uso = None
+        with self.cliente.stream("POST", "/chat/completions", json=cuerpo) as respuesta:
+            if respuesta.is_error:
+                respuesta.read()
+            respuesta.raise_for_status()
+            for linea in respuesta.iter_lines():
+                if not linea.startswith("data:"):
+                    continue
+                datos = linea[5:].strip()
+                if datos == "[DONE]":
+                    break
+                parte = json.loads(datos)
+                uso = parte.get("usage") or uso
+                for opcion in parte.get("choices", []):
+                    texto = (opcion.get("delta") or {}).get("content")
+                    if texto:
+                        yield {"message": {"role": "assistant", "content": texto}, "done": False}
+        yield _respuesta_ollama("", uso, time.perf_counter_ns() - inicio)
+
+    def verificar(self):
+        self.sonda.get("/models").raise_for_status()
+
+    def cerrar(self):
+        self.cliente.close()
+        self.sonda.close()
+
+
+def _respuesta_ollama(texto, uso, duracion):
+    """
+    Respuesta final con la forma de Ollama a partir del 'usage' de OpenAI
+    (sin tiempo de prefill: la API no lo informa).
+    """
+    uso = uso or {}
+    return {
+        "message": {"role": "assistant", "content": texto},
+        "done": True,
+        "prompt_eval_count": uso.get("prompt_tokens"),
+        "eval_count": uso.get("completion_tokens"),
+        "total_duration": duracion,
+    }
+
+
+# =============================
+# STUB DETERMINISTA
+# =============================
+FRASES = [
+    "El grupo muestra un desempeño **estable** a lo largo del periodo evaluado.",
+    "Los componentes de evaluación presentan diferencias moderadas entre trimestres.",
+    "Se recomienda reforzar la preparación de los exámenes con actividades de repaso.",
+    "La asistencia se mantiene dentro de los valores esperados para el nivel.",
+    "El trabajo en equipo aparece como una **fortaleza** del curso.",
+    "Conviene dar seguimiento a los estudiantes con calificaciones por debajo de siete.",
+    "Las faltas injustificadas se concentran en un número reducido de estudiantes.",
+    "El comportamiento general favorece un ambiente adecuado para el aprendizaje.",
+]
+
+TITULOS = ["Resumen general", "Rendimiento académico", "Asistencia y comportamiento", "Recomendaciones"]
+
+
+class SimuladorLLM:
+    """
+    Genera respuestas deterministas (mismo prompt, misma narrativa) en
+    Markdown simple, con la latencia y el ritmo de un modelo real.
+
+    Args:
+        latencia: Segundos antes del primer token (prefill)
+        tokens_por_segundo: Ritmo de generación (None o 0 = sin espera)
+        tokens: Largo aproximado de la respuesta, en palabras
+    """
+
+    def __init__(self, latencia=0.0, tokens_por_segundo=None, tokens=400):
+        self.latencia = latencia
+        self.tokens_por_segundo = tokens_por_segundo
+        self.tokens = tokens
+
+    def narrativa(self, messages):
+        """
+        Texto de la respuesta para los mensajes.
+        """
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        azar = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        lineas, palabras, seccion = [], 0, 0
+        while not lineas or palabras < self.tokens:
+            ultima = seccion % len(TITULOS) == len(TITULOS) - 1
+            lineas += ["", f"## {TITULOS[seccion % len(TITULOS)]}"]
+            for _ in range(azar.randint(2, 4)):
+                frase = azar.choice(FRASES)
+                lineas.append(f"- {frase}" if ultima else frase)
+                palabras += len(frase.split())
+            seccion += 1
+        return "\n".join(lineas).strip()
+
+    def fragmentos(self, model, messages):
+        """
+        Fragmentos de la respuesta (una palabra cada uno) con las esperas del
+        modelo simulado; el último trae los tiempos como Ollama.
+        """
+        inicio = time.perf_counter_ns()
+        time.sleep(self.latencia)
+        prefill = time.perf_counter_ns() - inicio
+
+        palabras = self.narrativa(messages).split(" ")
+        for i, palabra in enumerate(palabras):
+            if self.tokens_por_segundo:
+                time.sleep(1 / self.tokens_por_segundo)
+            texto = palabra if i == 0 else f" {palabra}"
+            yield {"model": model, "message": {"role": "assistant", "content": texto}, "done": False}
+
+        total = time.perf_counter_ns() - inicio
+        yield {
+            "model": model,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": contar_tokens("\n".join(m.get("content", "") for m in messages)),
+            "prompt_eval_duration": prefill,
+            "eval_count": len(palabras),
+            "eval_duration": total - prefill,
+            "total_duration": total,
+        }
+
+    def respuesta(self, model, messages):
+        """
+        Respuesta completa (stream=False).
+        """
+        partes = list(self.fragmentos(model, messages))
+        final = partes[-1]
+        final["message"]["content"] = "".join(p["message"]["content"] for p in partes)
+        return final
+
+
+class StubBackend(LLMBackend):
+    """
+    Backend sin red con las respuestas de SimuladorLLM
+    (LLM_STUB_LATENCIA, LLM_STUB_TOKENS_POR_SEGUNDO, LLM_STUB_TOKENS).
+    """
+
+    nombre = "stub"
+    modelo = "stub"
+
+    def __init__(self, simulador=None):
+        self.simulador = simulador or SimuladorLLM(
+            latencia=getattr(settings, "LLM_STUB_LATENCIA", 0.0),
+            tokens_por_segundo=getattr(settings, "LLM_STUB_TOKENS_POR_SEGUNDO", None),
+            tokens=getattr(settings, "LLM_STUB_TOKENS", 400),
+        )
+
+    def chat(self, model, messages, options=None, stream=False):
+        if stream:
+            return self.simulador.fragmentos(model, messages)
+        return self.simulador.respuesta(model, messages)
+
+    def verificar(self):
+        pass
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+
+def crear_backend(nombre=None):
+    """
+    Crea el backend indicado (por defecto, settings.LLM_BACKEND).
+    """
+    nombre = nombre or getattr(settings, "LLM_BACKEND", "ollama")
+    if nombre not in BACKENDS:
+        raise ValueError(f"LLM_BACKEND desconocido: {nombre!r} (opciones: {', '.join(BACKENDS)})")
+    return BACKENDS[nombre]()
@@ -0,0 +1,246 @@
+"""
+Cliente del modelo de lenguaje compartido por el proceso.
+
+Antes cada reporte llamaba a ollama.list() para comprobar que el servidor
+estaba vivo (una petición HTTP extra) y creaba un Client nuevo, sin reutilizar
+las conexiones. LLMClient mantiene:
+
+- El backend de settings.LLM_BACKEND (services/llm_backends.py: Ollama,
+  API de OpenAI o stub) con su pool de conexiones abierto entre reportes.
+- El estado de salud: una verificación correcta (o una respuesta del modelo)
+  vale settings.OLLAMA_SALUD_TTL segundos.
+- El registro de los tiempos que informa el backend en cada respuesta (tokens
+  del prompt y tiempo de prefill), para medir el efecto del largo del prompt.
+- Un circuit breaker: tras settings.OLLAMA_FALLOS_PARA_ABRIR fallos seguidos
+  del servidor, las llamadas fallan de inmediato con LLMNoDisponible durante
+  settings.OLLAMA_ESPERA_REINTENTO segundos, en lugar de dejar hilos del
+  worker esperando a un servidor caído. Pasado ese tiempo, una sola llamada
+  vuelve a probar el servidor; si responde, el circuito se cierra.
+
+El backend, el host, el modelo y los tiempos de espera se configuran en
+settings.py; al cambiarlos con override_settings el cliente se vuelve a crear
+(signals.py).
+"""
+
+import logging
+import threading
+import time
+
+import httpx
+import ollama
+from django.conf import settings
+
+from .llm_backends import crear_backend
+
+logger = logging.getLogger(__name__)
+
+_cliente = None
+_lock = threading.Lock()
+
+
+class LLMNoDisponible(ConnectionError):
+    """
+    El circuito está abierto: el servidor falló hace poco y no se intenta.
+    """
+
+
+class LLMClient:
+    """
+    Cliente del modelo con salud en caché y circuit breaker sobre un
+    LLMBackend. Se puede usar desde varios hilos a la vez.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or crear_backend()
+        self.modelo = self.backend.modelo
+        self.salud_ttl = getattr(settings, "OLLAMA_SALUD_TTL", 30)
+        self.fallos_para_abrir = max(1, getattr(settings, "OLLAMA_FALLOS_PARA_ABRIR", 3))
+        self.espera_reintento = getattr(settings, "OLLAMA_ESPERA_REINTENTO", 30)
+
+        self._estado_lock = threading.Lock()
+        self._fallos_seguidos = 0
+        self._abierto_hasta = None
+        self._probando = False
+        self._ultima_salud = None
+
+    def chat(self, model, messages, options=None, stream=False):
+        """
+        Igual que ollama.Client.chat (con stream=True devuelve un iterador).
+
+        Raises:
+            LLMNoDisponible: Si el circuito está abierto
+        """
+        self._antes_de_llamar()
+        try:
+            respuesta = self.backend.chat(model=model, messages=messages, options=options, stream=stream)
+        except Exception as e:
+            self._registrar_error(e)
+            raise
+
+        if stream:
+            # Los errores de conexión aparecen al leer el primer fragmento
+            return self._seguir_stream(respuesta)
+        self._registrar_exito()
+        registrar_tiempos(respuesta, self.backend.nombre)
+        return respuesta
+
+    def verificar_salud(self):
+        """
+        Consulta al backend (p. ej. GET /api/tags en Ollama) y actualiza el estado.
+
+        Raises:
+            Exception: El error del servidor, si no respondió
+        """
+        try:
+            self.backend.verificar()
+        except Exception:
+            self._registrar_fallo()
+            raise
+        self._registrar_exito(solo_salud=True)
+
+    def estado(self):
+        """
+        Estado del circuito para diagnóstico.
+
+        Returns:
+            dict: {'circuito': 'cerrado'|'abierto'|'semiabierto', 'fallos_seguidos': int}
+        """
+        with self._estado_lock:
+            if self._abierto_hasta is None:
+                circuito = "cerrado"
+            elif time.monotonic() < self._abierto_hasta:
+                circuito = "abierto"
+            else:
+                circuito = "semiabierto"
+            return {"circuito": circuito, "fallos_seguidos": self._fallos_seguidos}
+
+    def cerrar(self):
+        """
+        Cierra las conexiones abiertas.
+        """
+        self.backend.cerrar()
+
+    def _antes_de_llamar(self):
+        """
+        Falla de inmediato si el circuito está abierto y verifica la salud si
+        la última verificación venció.
+        """
+        with self._estado_lock:
+            ahora = time.monotonic()
+            if self._abierto_hasta is not None:
+                if ahora < self._abierto_hasta or self._probando:
+                    raise LLMNoDisponible(
+                        f"El modelo ({self.backend.nombre}) no respondió en los últimos intentos ({self._fallos_seguidos} fallos seguidos); "
+                        "se volverá a intentar en unos segundos."
+                    )
+                # Semiabierto: solo esta llamada prueba el servidor
+                self._probando = True
+                verificar = True
+            else:
+                verificar = self._ultima_salud is None or ahora - self._ultima_salud > self.salud_ttl
+
+        if verificar:
+            self.verificar_salud()
+
+    def _seguir_stream(self, partes):
+        ultima = None
+        try:
+            for parte in partes:
+                ultima = parte
+                yield parte
+        except Exception as e:
+            self._registrar_error(e)
+            raise
+        self._registrar_exito()
+        # Ollama envía los tiempos en el último fragmento (done=True)
+        registrar_tiempos(ultima, self.backend.nombre)
+
+    def _registrar_error(self, error):
+        """
+        Solo cuentan como fallo del servidor los errores de red y los 5xx;
+        p. ej. un modelo inexistente (404) no abre el circuito.
+        """
+        if isinstance(error, ollama.ResponseError):
+            estado = error.status_code
+        elif isinstance(error, httpx.HTTPStatusError):
+            estado = error.response.status_code
+        else:
+            estado = None
+        if isinstance(error, (ConnectionError, httpx.TransportError)) or (estado or 0) >= 500:
+            self._registrar_fallo()
+        else:
+            with self._estado_lock:
+                self._probando = False
+
+    def _registrar_exito(self, solo_salud=False):
+        """
+        Un servidor que responde a la verificación pero falla en chat (p. ej.
+        errores 5xx) sigue sumando fallos: la verificación solo cierra el
+        circuito cuando es la prueba del estado semiabierto.
+        """
+        with self._estado_lock:
+            self._ultima_salud = time.monotonic()
+            if solo_salud and not self._probando:
+                return
+            if self._abierto_hasta is not None:
+                logger.info("El modelo (%s) volvió a responder; circuito cerrado", self.backend.nombre)
+            self._fallos_seguidos = 0
+            self._abierto_hasta = None
+            self._probando = False
+
+    def _registrar_fallo(self):
+        with self._estado_lock:
+            self._fallos_seguidos += 1
+            self._ultima_salud = None
+            semiabierto = self._probando
+            self._probando = False
+            if semiabierto or self._fallos_seguidos >= self.fallos_para_abrir:
+                if self._abierto_hasta is None:
+                    logger.warning(
+                        "El modelo (%s) no responde (%d fallos seguidos): circuito abierto por %s s",
+                        self.backend.nombre, self._fallos_seguidos, self.espera_reintento
+                    )
+                self._abierto_hasta = time.monotonic() + self.espera_reintento
+
+
+def registrar_tiempos(respuesta, backend="ollama"):
+    """
+    Deja en el log los tokens y tiempos de una respuesta (las duraciones
+    vienen en nanosegundos, como en Ollama). No hace nada si no los trae.
+    """
+    obtener = getattr(respuesta, "get", None)
+    if obtener is None or (obtener("prompt_eval_count") is None and obtener("total_duration") is None):
+        return
+    prefill = obtener("prompt_eval_duration")
+    prefill = f"{prefill / 1e9:.2f} s" if prefill is not None else "n/d"
+    logger.info(
+        "LLM (%s): prompt %s tokens, prefill %s, respuesta %s tokens en %.1f s, total %.1f s",
+        backend, obtener("prompt_eval_count"), prefill, obtener("eval_count"),
+        (obtener("eval_duration") or 0) / 1e9, (obtener("total_duration") or 0) / 1e9,
+    )
+
+
+def obtener_cliente_llm():
+    """
+    Devuelve el cliente del proceso (lo crea la primera vez).
+    """
+    global _cliente
+
+    if _cliente is None:
+        with _lock:
+            if _cliente is None:
+                _cliente = LLMClient()
+    return _cliente
+
+
+def cerrar_cliente_llm():
+    """
+    Cierra el cliente del proceso; el siguiente uso crea uno nuevo (p. ej.
+    después de cambiar la configuración).
+    """
+    global _cliente
+
+    with _lock:
+        if _cliente is not None:
+            _cliente.cerrar()
+            _cliente = None
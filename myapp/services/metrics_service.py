@@ -1,21 +1,84 @@
 """
 Servicio de cálculo de métricas para el dashboard.
 Extrae la lógica de cálculo de métricas de las vistas para mejorar testabilidad.
+
+Las métricas calculadas se guardan en el caché de Django con una clave que
+incluye la versión de métricas del usuario (utils/versiones.py). Las señales
+de ArchivoNotas y ReporteGenerado incrementan esa versión, de modo que subir,
+activar o eliminar un archivo o generar un reporte invalida el caché.
 """
 
-from ..models import ArchivoNotas, ReporteGenerado
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import ArchivoNotas, DashboardSummary, ReporteGenerado
+from ..utils.versiones import incrementar_contador, obtener_version
+
+logger = logging.getLogger(__name__)
 
 
 class MetricsService:
     """
     Servicio para calcular métricas del dashboard.
     """
+
+    CONTADOR_ACIERTOS = "metricas_cache:aciertos"
+    CONTADOR_FALLOS = "metricas_cache:fallos"
+
+    @staticmethod
+    def get_cached_dashboard_metrics(user, archivo=None):
+        """
+        Devuelve las métricas del dashboard desde el caché o, si no están,
+        las calcula y las guarda. Un acierto no consulta la base de datos.
+
+        Args:
+            user: Usuario de Django
+            archivo: Archivo activo ya consultado (con select_related de
+                dashboard_summary). Si no se indica, se busca.
+
+        Returns:
+            tuple: (dict de métricas, True si vino del caché)
+        """
+        # La versión se lee antes de calcular: si algo cambia mientras tanto,
+        # lo calculado queda bajo una versión vieja y no se vuelve a usar
+        version = obtener_version("metricas", user.id)
+        clave = f"metricas:{user.id}:{version}"
+
+        metricas = cache.get(clave)
+        if metricas is not None:
+            incrementar_contador(MetricsService.CONTADOR_ACIERTOS)
+            return metricas, True
+
+        incrementar_contador(MetricsService.CONTADOR_FALLOS)
+        if archivo is None:
+            archivo = MetricsService.get_active_file(user)
+        metricas = MetricsService.calculate_dashboard_metrics(archivo, user)
+        cache.set(clave, metricas, timeout=getattr(settings, "METRICAS_CACHE_TIMEOUT", 3600))
+        logger.info("Caché de métricas MISS %s", MetricsService.cache_stats())
+        return metricas, False
+
+    @staticmethod
+    def cache_stats():
+        """
+        Devuelve los contadores de aciertos y fallos del caché de métricas.
+
+        Returns:
+            dict: {'aciertos': int, 'fallos': int}
+        """
+        return {
+            "aciertos": cache.get(MetricsService.CONTADOR_ACIERTOS, 0),
+            "fallos": cache.get(MetricsService.CONTADOR_FALLOS, 0),
+        }
     
     @staticmethod
-    def get_or_set_active_file(user):
+    def get_active_file(user):
         """
-        Obtiene el archivo activo del usuario.
-        Si no hay archivo activo, activa el más reciente.
+        Obtiene el archivo activo del usuario (con su DashboardSummary y sin
+        cargar resumen_json) en una consulta.
+        Si no hay archivo activo, devuelve el más reciente sin activarlo: la
+        lectura no escribe en la base de datos.
         
         Args:
             user: Usuario de Django
@@ -23,75 +86,111 @@ class MetricsService:
         Returns:
             ArchivoNotas o None si no hay archivos
         """
-        # Buscar archivo activo
-        archivo = ArchivoNotas.objects.filter(usuario=user, activo=True).first()
-        
-        if not archivo:
-            # Si no hay activo, tomar el más reciente
-            archivo = ArchivoNotas.objects.filter(usuario=user).first()
-            if archivo:
-                archivo.activo = True
-                archivo.save()
-        
-        return archivo
+        return (
+            ArchivoNotas.objects.filter(usuario=user)
+            .select_related("dashboard_summary")
+            .defer("resumen_json")
+            .order_by("-activo", "-fecha_subida", "-id")
+            .first()
+        )
     
     @staticmethod
     def calculate_dashboard_metrics(archivo, user):
         """
-        Calcula todas las métricas del dashboard para un archivo.
+        Calcula todas las métricas del dashboard para un archivo a partir de
+        su DashboardSummary.
         
         Args:
-            archivo: Instancia de ArchivoNotas con resumen_json
+            archivo: Instancia de ArchivoNotas
             user: Usuario de Django (para buscar reportes)
             
         Returns:
             dict: Diccionario con todas las métricas para el dashboard
         """
-        if not archivo or not archivo.resumen_json:
+        summary = MetricsService.get_summary(archivo) if archivo else None
+        if summary is None:
             return {
                 "sin_datos": True,
                 "message": "No hay archivo activo con datos procesados"
             }
         
-        # Extraer datos del resumen_json
-        resumen = archivo.resumen_json
-        reportes_trim = resumen.get("reportes_trimestrales", {})
-        
         # Calcular métricas para las cards
-        cards_data = MetricsService._calculate_card_metrics(reportes_trim, resumen, user)
+        cards_data = MetricsService._calculate_card_metrics(summary, user)
         
         # Preparar datos para gráficas
         metricas = {
             "sin_datos": False,
             "cards": cards_data,
-            "grafica_barras": MetricsService._prepare_bar_chart_data(reportes_trim),
+            "grafica_barras": MetricsService._prepare_bar_chart_data(summary),
             "grafica_dona": MetricsService._prepare_donut_chart_data(cards_data),
-            "grafica_asistencia": MetricsService._prepare_attendance_chart_data(reportes_trim)
+            "grafica_asistencia": MetricsService._prepare_attendance_chart_data(summary)
         }
         
         return metricas
-    
+
     @staticmethod
-    def _calculate_card_metrics(reportes_trim, resumen, user):
+    def get_summary(archivo):
         """
-        Calcula métricas para las tarjetas del dashboard.
+        Devuelve el DashboardSummary del archivo. Si no existe (archivos
+        anteriores a la tabla) se calcula en memoria desde resumen_json, sin
+        guardarlo: la lectura no escribe en la base de datos (el comando
+        generar_resumenes_dashboard los rellena).
         
         Args:
-            reportes_trim: Diccionario de reportes trimestrales
-            resumen: Resumen completo del JSON
-            user: Usuario de Django
+            archivo: Instancia de ArchivoNotas
             
         Returns:
-            dict: Métricas para cards (promedio, aprobados, reprobados, último reporte)
+            DashboardSummary o None si el archivo no tiene datos procesados
         """
-        if reportes_trim:
-            trimestres = list(reportes_trim.keys())
+        try:
+            return archivo.dashboard_summary
+        except DashboardSummary.DoesNotExist:
+            pass
+
+        resumen = ArchivoNotas.objects.filter(pk=archivo.pk).values_list("resumen_json", flat=True).first()
+        if not resumen:
+            return None
+        logger.warning("Archivo %s sin DashboardSummary; ejecute generar_resumenes_dashboard", archivo.pk)
+        return DashboardSummary(archivo=archivo, **MetricsService.build_summary_fields(resumen))
+
+    @staticmethod
+    def save_summary(archivo, resumen):
+        """
+        Crea o actualiza el DashboardSummary de un archivo.
+        
+        Args:
+            archivo: Instancia de ArchivoNotas
+            resumen: resumen_json del archivo
             
-            # 1. Calcular promedio general de todos los trimestres
-            promedios_trimestrales = [reportes_trim[t]["promedio_general"] for t in trimestres]
+        Returns:
+            DashboardSummary
+        """
+        summary, _ = DashboardSummary.objects.update_or_create(
+            archivo=archivo,
+            defaults=MetricsService.build_summary_fields(resumen)
+        )
+        return summary
+
+    @staticmethod
+    def build_summary_fields(resumen):
+        """
+        Extrae del resumen_json los valores que usa el dashboard.
+        
+        Args:
+            resumen: Resumen grupal completo (generar_reporte_grupal_completo)
+            
+        Returns:
+            dict: Campos de DashboardSummary
+        """
+        reportes_trim = resumen.get("reportes_trimestrales", {})
+        trimestres = list(reportes_trim.keys())
+        promedios_trimestrales = [reportes_trim[t]["promedio_general"] for t in trimestres]
+        
+        if reportes_trim:
+            # Promedio general de todos los trimestres
             promedio_general = sum(promedios_trimestrales) / len(promedios_trimestrales) if promedios_trimestrales else 0
             
-            # 2. Obtener aprobados/reprobados del estatus acumulado
+            # Aprobados/reprobados del estatus acumulado
             estatus_acum = resumen.get("estatus_academico_acumulado", {})
             aprobados = estatus_acum.get("total_aprobados", 0)
             reprobados = estatus_acum.get("total_reprobados", 0)
@@ -100,35 +199,55 @@ class MetricsService:
             aprobados = 0
             reprobados = 0
         
+        return {
+            "promedio_general": promedio_general,
+            "aprobados": aprobados,
+            "reprobados": reprobados,
+            "trimestres": trimestres,
+            "promedios_trimestrales": promedios_trimestrales,
+            "faltas_justificadas": [reportes_trim[t].get("total_faltas_justificadas", 0) for t in trimestres],
+            "faltas_injustificadas": [reportes_trim[t].get("total_faltas_injustificadas", 0) for t in trimestres],
+        }
+    
+    @staticmethod
+    def _calculate_card_metrics(summary, user):
+        """
+        Calcula métricas para las tarjetas del dashboard.
+        
+        Args:
+            summary: DashboardSummary del archivo
+            user: Usuario de Django
+            
+        Returns:
+            dict: Métricas para cards (promedio, aprobados, reprobados, último reporte)
+        """
         # Obtener fecha del último reporte grupal generado
-        ultimo_reporte_grupal = ReporteGenerado.objects.filter(
+        fecha_ultimo_reporte = ReporteGenerado.objects.filter(
             usuario=user,
             tipo='grupal'
-        ).order_by('-fecha_generacion').first()
-        
-        fecha_ultimo_reporte = ultimo_reporte_grupal.fecha_generacion.strftime('%d/%m/%Y') if ultimo_reporte_grupal else 'Sin reportes'
+        ).order_by('-fecha_generacion', '-id').values_list('fecha_generacion', flat=True).first()
         
         return {
-            "promedio_general": round(promedio_general, 1),
-            "aprobados": aprobados,
-            "reprobados": reprobados,
-            "ultimo_reporte": fecha_ultimo_reporte
+            "promedio_general": round(summary.promedio_general, 1),
+            "aprobados": summary.aprobados,
+            "reprobados": summary.reprobados,
+            "ultimo_reporte": fecha_ultimo_reporte.strftime('%d/%m/%Y') if fecha_ultimo_reporte else 'Sin reportes'
         }
     
     @staticmethod
-    def _prepare_bar_chart_data(reportes_trim):
+    def _prepare_bar_chart_data(summary):
         """
         Prepara datos para gráfica de barras de promedios por trimestre.
         
         Args:
-            reportes_trim: Diccionario de reportes trimestrales
+            summary: DashboardSummary del archivo
             
         Returns:
             dict: Datos para gráfica de barras
         """
         return {
-            "labels": list(reportes_trim.keys()),
-            "valores": [reportes_trim[t]["promedio_general"] for t in reportes_trim.keys()]
+            "labels": summary.trimestres,
+            "valores": summary.promedios_trimestrales
         }
     
     @staticmethod
@@ -148,37 +267,18 @@ class MetricsService:
         }
     
     @staticmethod
-    def _prepare_attendance_chart_data(reportes_trim):
+    def _prepare_attendance_chart_data(summary):
         """
         Prepara datos para gráfica de asistencia por trimestre.
         
         Args:
-            reportes_trim: Diccionario de reportes trimestrales
+            summary: DashboardSummary del archivo
             
         Returns:
             dict: Datos para gráfica de asistencia
         """
-        trimestres = list(reportes_trim.keys())
-        
-        if not trimestres:
-            return {
-                "labels": [],
-                "faltas_justificadas": [],
-                "faltas_injustificadas": []
-            }
-        
-        labels_trimestres = []
-        faltas_just = []
-        faltas_injust = []
-        
-        for trimestre in trimestres:
-            trim_data = reportes_trim[trimestre]
-            labels_trimestres.append(trimestre)
-            faltas_just.append(trim_data.get("total_faltas_justificadas", 0))
-            faltas_injust.append(trim_data.get("total_faltas_injustificadas", 0))
-        
         return {
-            "labels": labels_trimestres,
-            "faltas_justificadas": faltas_just,
-            "faltas_injustificadas": faltas_injust
+            "labels": summary.trimestres,
+            "faltas_justificadas": summary.faltas_justificadas,
+            "faltas_injustificadas": summary.faltas_injustificadas
         }
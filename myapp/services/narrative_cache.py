@@ -0,0 +1,127 @@
+"""
+Caché de narrativas generadas por el LLM.
+La clave es el hash del prompt, el modelo y las opciones, de modo que dos
+peticiones con exactamente los mismos datos reutilizan la misma narrativa.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import NarrativaCache
+from ..utils.versiones import incrementar_contador
+
+logger = logging.getLogger(__name__)
+
+
+class NarrativeCache:
+    """
+    Caché persistente (en base de datos) de narrativas con expulsión por
+    antigüedad y por número de entradas.
+    """
+
+    CONTADOR_ACIERTOS = "narrativa_cache:aciertos"
+    CONTADOR_FALLOS = "narrativa_cache:fallos"
+    MARCA_EXPULSION = "narrativa_cache:expulsion"
+
+    @staticmethod
+    def calcular_clave(prompt, modelo, opciones):
+        """
+        Calcula la clave de la caché.
+
+        Args:
+            prompt: Texto completo del prompt
+            modelo: Nombre del modelo (p. ej. 'gemma3:12b')
+            opciones: Diccionario de opciones enviadas al modelo
+
+        Returns:
+            str: Hash SHA-256 en hexadecimal
+        """
+        contenido = json.dumps([prompt, modelo, opciones], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def obtener(clave):
+        """
+        Busca una narrativa en la caché. Las entradas vencidas se eliminan.
+
+        Returns:
+            str o None si no hay una entrada válida
+        """
+        entrada = NarrativaCache.objects.filter(clave=clave).only("id", "narrativa", "fecha_creacion").first()
+
+        if entrada and entrada.fecha_creacion < NarrativeCache._fecha_limite():
+            entrada.delete()
+            entrada = None
+
+        if entrada is None:
+            incrementar_contador(NarrativeCache.CONTADOR_FALLOS)
+            logger.info("Caché de narrativas MISS %s", NarrativeCache.estadisticas())
+            return None
+
+        NarrativaCache.objects.filter(pk=entrada.pk).update(
+            aciertos=F("aciertos") + 1,
+            ultimo_acceso=timezone.now()
+        )
+        incrementar_contador(NarrativeCache.CONTADOR_ACIERTOS)
+        logger.info("Caché de narrativas HIT %s", NarrativeCache.estadisticas())
+        return entrada.narrativa
+
+    @staticmethod
+    def guardar(clave, modelo, narrativa):
+        """
+        Guarda (o reemplaza) una narrativa y, como mucho una vez cada
+        settings.NARRATIVA_CACHE_EXPULSION_CADA segundos, aplica la política
+        de expulsión.
+        """
+        # Una narrativa regenerada cuenta su antigüedad desde ahora
+        NarrativaCache.objects.update_or_create(
+            clave=clave,
+            defaults={"modelo": modelo, "narrativa": narrativa, "fecha_creacion": timezone.now()}
+        )
+        intervalo = getattr(settings, "NARRATIVA_CACHE_EXPULSION_CADA", 300)
+        # cache.add solo tiene éxito en un proceso por intervalo
+        if not intervalo or cache.add(NarrativeCache.MARCA_EXPULSION, True, timeout=intervalo):
+            NarrativeCache.expulsar()
+
+    @staticmethod
+    def expulsar():
+        """
+        Elimina las entradas vencidas y, si se supera el máximo de entradas,
+        las menos usadas recientemente.
+        """
+        NarrativaCache.objects.filter(fecha_creacion__lt=NarrativeCache._fecha_limite()).delete()
+
+        max_entradas = getattr(settings, "NARRATIVA_CACHE_MAX_ENTRADAS", 500)
+        sobrantes = list(
+            NarrativaCache.objects.order_by("-ultimo_acceso").values_list("id", flat=True)[max_entradas:]
+        )
+        if sobrantes:
+            NarrativaCache.objects.filter(id__in=sobrantes).delete()
+
+    @staticmethod
+    def estadisticas():
+        """
+        Devuelve los contadores de aciertos y fallos de la caché.
+
+        Returns:
+            dict: {'aciertos': int, 'fallos': int}
+        """
+        return {
+            "aciertos": cache.get(NarrativeCache.CONTADOR_ACIERTOS, 0),
+            "fallos": cache.get(NarrativeCache.CONTADOR_FALLOS, 0),
+        }
+
+    @staticmethod
+    def _fecha_limite():
+        """
+        Fecha a partir de la cual una entrada se considera vencida.
+        """
+        max_dias = getattr(settings, "NARRATIVA_CACHE_MAX_DIAS", 30)
+        return timezone.now() - timedelta(days=max_dias)
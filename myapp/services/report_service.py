@@ -0,0 +1,543 @@
+"""
+Servicio de generación de reportes (JSON + narrativa IA + PDF).
+Centraliza el flujo que antes vivía dentro de la vista procesar_reporte para
+poder ejecutarlo tanto en la petición HTTP como en el worker de la cola.
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import httpx
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from ..models import Estudiante, LoteReportes, ReporteGenerado, TrabajoReporte
+from .llm_client import LLMNoDisponible, obtener_cliente_llm
+from .metrics_service import MetricsService
+from .narrative_cache import NarrativeCache
+from ..prompts import get_prompt_reporte_grupal, get_prompt_reporte_individual
+from ..utils.narrativa_ast import documento_vigente, parsear_narrativa
+from ..utils.pdf_lote import renderizar_lote
+from ..utils.workbook_store import cargar_hojas
+from ..utils.report_generator import (
+    generar_pdf_documento,
+    generar_reporte_grupal_completo,
+    reporte_individual,
+)
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_OPTIONS = {"temperature": 0.7}
+
+
+class ReportService:
+    """
+    Servicio para construir y guardar reportes narrativos.
+    """
+
+    @staticmethod
+    def obtener_json_data(archivo, tipo, estudiante):
+        """
+        Genera el JSON del reporte desde el archivo guardado.
+
+        Args:
+            archivo: Instancia de ArchivoNotas
+            tipo: 'grupal' o 'individual'
+            estudiante: Nombre del estudiante (solo para reportes individuales)
+
+        Returns:
+            dict: Datos del reporte
+        """
+        logger.info("Generando JSON desde archivo guardado")
+
+        # Reutilizar el resumen guardado sin volver a leer el Excel
+        if not (tipo == "individual" and estudiante) and archivo.resumen_json:
+            return archivo.resumen_json
+
+        # Reporte individual precalculado al subir el archivo
+        if tipo == "individual" and estudiante:
+            reporte_json = (
+                Estudiante.objects
+                .filter(archivo=archivo, nombre=estudiante, reporte_json__isnull=False)
+                .values_list("reporte_json", flat=True)
+                .first()
+            )
+            if reporte_json is not None:
+                return reporte_json
+
+        # Leer la copia columnar (o el Excel si no existe)
+        hojas = cargar_hojas(archivo)
+
+        if tipo == "individual" and estudiante:
+            return reporte_individual(estudiante, hojas)
+
+        json_data = generar_reporte_grupal_completo(hojas)
+        archivo.resumen_json = json_data
+        archivo.save(update_fields=["resumen_json"])
+        MetricsService.save_summary(archivo, json_data)
+        return json_data
+
+    @staticmethod
+    def construir_prompt(json_data, tipo, estudiante, archivo):
+        """
+        Define el título, la descripción y el prompt del reporte.
+
+        Returns:
+            tuple: (titulo_reporte, descripcion, prompt)
+        """
+        titulo_reporte = ReportService.titulo_reporte(tipo, estudiante)
+        if tipo == "individual" and estudiante:
+            descripcion = f"Reporte Individual - {estudiante}"
+            prompt = get_prompt_reporte_individual(json_data, estudiante)
+        else:
+            descripcion = f"Reporte Grupal - {archivo.nombre}"
+            prompt = get_prompt_reporte_grupal(json_data)
+        return titulo_reporte, descripcion, prompt
+
+    @staticmethod
+    def titulo_reporte(tipo, estudiante):
+        """
+        Título que aparece en el PDF del reporte.
+        """
+        if tipo == "individual" and estudiante:
+            return f"Reporte Individual - {estudiante}"
+        return "Reporte Grupal"
+
+    @staticmethod
+    def generar_narrativa(prompt, json_data, forzar=False):
+        """
+        Genera la narrativa con el modelo configurado en Ollama.
+        Si el mismo prompt ya se respondió, se devuelve desde la caché salvo
+        que se pida regenerarla. Si Ollama falla, devuelve un texto explicativo
+        con los datos del reporte (que no se guarda en la caché).
+
+        Args:
+            prompt: Texto del prompt
+            json_data: Datos del reporte (para la narrativa de error)
+            forzar: Ignorar la caché y volver a llamar al modelo
+
+        Returns:
+            str: Narrativa generada
+        """
+        client = ReportService._cliente_ollama()
+        clave = NarrativeCache.calcular_clave(prompt, client.modelo, OLLAMA_OPTIONS)
+        if not forzar:
+            narrativa = NarrativeCache.obtener(clave)
+            if narrativa is not None:
+                return narrativa
+
+        try:
+            narrativa = ReportService._pedir_narrativa(client, prompt)
+        except Exception as e:
+            return ReportService.narrativa_de_error(e, json_data)
+
+        NarrativeCache.guardar(clave, client.modelo, narrativa)
+        return narrativa
+
+    @staticmethod
+    def _pedir_narrativa(client, prompt):
+        """
+        Una llamada al modelo, sin caché ni manejo de errores. No toca la base
+        de datos, así que se puede ejecutar en otro hilo.
+        """
+        respuesta = client.chat(
+            model=client.modelo,
+            messages=[{"role": "user", "content": prompt}],
+            options=OLLAMA_OPTIONS
+        )
+        return respuesta["message"]["content"]
+
+    @staticmethod
+    def generar_narrativa_stream(prompt, json_data, forzar=False):
+        """
+        Igual que generar_narrativa, pero entrega la respuesta del modelo en
+        fragmentos a medida que Ollama los produce (stream=True).
+
+        Yields:
+            str: Fragmentos de la narrativa
+        """
+        client = ReportService._cliente_ollama()
+        clave = NarrativeCache.calcular_clave(prompt, client.modelo, OLLAMA_OPTIONS)
+        if not forzar:
+            narrativa = NarrativeCache.obtener(clave)
+            if narrativa is not None:
+                yield narrativa
+                return
+
+        partes = []
+        try:
+            for parte in client.chat(
+                model=client.modelo,
+                messages=[{"role": "user", "content": prompt}],
+                options=OLLAMA_OPTIONS,
+                stream=True
+            ):
+                texto = parte["message"]["content"]
+                if texto:
+                    partes.append(texto)
+                    yield texto
+        except Exception as e:
+            separador = "\n\n" if partes else ""
+            yield separador + ReportService.narrativa_de_error(e, json_data)
+            return
+
+        NarrativeCache.guardar(clave, client.modelo, "".join(partes))
+
+    @staticmethod
+    def _cliente_ollama():
+        """
+        Cliente de Ollama del proceso (conexiones persistentes, salud en caché
+        y circuit breaker; ver services/llm_client.py).
+        """
+        return obtener_cliente_llm()
+
+    @staticmethod
+    def narrativa_de_error(error, json_data):
+        """
+        Construye la narrativa de reemplazo cuando Ollama no pudo responder.
+        """
+        datos = json.dumps(json_data, ensure_ascii=False, indent=2)
+        if isinstance(error, LLMNoDisponible):
+            logger.error("Ollama no disponible (circuito abierto): %s", error)
+            return (
+                "Ollama no está respondiendo, así que no se intentó generar la narrativa con IA.\n\n"
+                "Verifica que el servicio de Ollama esté activo ('ollama serve') e intenta "
+                "nuevamente en unos segundos.\n\n"
+                f"Datos del reporte:\n{datos}"
+            )
+        if isinstance(error, (httpx.ConnectError, ConnectionError)):
+            logger.error("Error de conexión con Ollama: %s: %s", type(error).__name__, error)
+            return (
+                "No se pudo conectar con Ollama para generar la narrativa con IA.\n\n"
+                "Por favor, verifica que:\n"
+                "1. Ollama esté instalado y ejecutándose\n"
+                "2. El servicio de Ollama esté activo\n\n"
+                "Puedes iniciar Ollama ejecutando 'ollama serve' en una terminal.\n\n"
+                f"Datos del reporte:\n{datos}"
+            )
+        if isinstance(error, httpx.ReadTimeout):
+            logger.error("Tiempo de espera agotado al generar la narrativa: %s", error)
+            return (
+                "El modelo de IA está tardando demasiado en generar la narrativa.\n\n"
+                "Esto puede ocurrir con modelos grandes. Considera:\n"
+                "1. Usar un modelo más pequeño (cambia OLLAMA_MODEL en settings.py)\n"
+                "2. Esperar más tiempo o intentar nuevamente\n\n"
+                f"Datos del reporte:\n{datos}"
+            )
+        logger.error("Error inesperado al generar la narrativa: %s: %s", type(error).__name__, error)
+        return (
+            f"Error al generar narrativa con IA: {type(error).__name__}: {str(error)}\n\n"
+            f"Datos del reporte:\n{datos}"
+        )
+
+    @staticmethod
+    def guardar_reporte(usuario, archivo, tipo, estudiante, titulo_reporte, descripcion, json_data, narrativa):
+        """
+        Renderiza el PDF directamente en el almacenamiento y guarda el
+        ReporteGenerado (un solo INSERT).
+
+        Returns:
+            ReporteGenerado: El reporte guardado
+        """
+        # Crear nombre de archivo único
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if tipo == "individual" and estudiante:
+            pdf_filename = f"reporte_individual_{estudiante.replace(' ', '_')}_{timestamp}.pdf"
+        else:
+            pdf_filename = f"reporte_grupal_{timestamp}.pdf"
+
+        # La narrativa se analiza una vez y se guarda para volver a renderizar
+        documento = parsear_narrativa(titulo_reporte, narrativa)
+        campo_pdf = ReporteGenerado._meta.get_field("pdf_file")
+        nombre_pdf = ReportService._escribir_pdf(
+            campo_pdf.storage, campo_pdf.generate_filename(None, pdf_filename), documento
+        )
+
+        try:
+            return ReporteGenerado.objects.create(
+                usuario=usuario,
+                archivo=archivo,
+                tipo=tipo,
+                estudiante=estudiante if tipo == "individual" else None,
+                descripcion=descripcion,
+                pdf_file=nombre_pdf,
+                json_data=json_data,
+                narrativa=narrativa,
+                narrativa_ast=documento
+            )
+        except Exception:
+            campo_pdf.storage.delete(nombre_pdf)
+            raise
+
+    @staticmethod
+    def _escribir_pdf(storage, nombre, documento):
+        """
+        Escribe el PDF en el almacenamiento. Con almacenamiento local se escribe
+        directo en el archivo final; con otros (S3, etc.) se pasa por memoria.
+
+        Returns:
+            str: Nombre con el que quedó guardado
+        """
+        nombre = storage.get_available_name(nombre)
+        try:
+            ruta = storage.path(nombre)
+        except NotImplementedError:
+            return storage.save(nombre, ContentFile(generar_pdf_documento(documento).getvalue()))
+
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # 'xb' falla si otro proceso tomó el mismo nombre entre tanto
+        try:
+            with open(ruta, "xb") as destino:
+                generar_pdf_documento(documento, destino=destino)
+        except FileExistsError:
+            # El archivo es de otro proceso: no se borra
+            raise
+        except Exception:
+            os.remove(ruta)
+            raise
+        return nombre
+
+    @staticmethod
+    def documento_reporte(reporte):
+        """
+        Narrativa analizada de un reporte. Si no está guardada (reportes
+        anteriores) o es de otra versión, se analiza de nuevo.
+
+        Args:
+            reporte: ReporteGenerado con tipo, estudiante, narrativa y narrativa_ast
+
+        Returns:
+            tuple: (documento, True si hubo que analizarla)
+        """
+        if documento_vigente(reporte.narrativa_ast):
+            return reporte.narrativa_ast, False
+        titulo = ReportService.titulo_reporte(reporte.tipo, reporte.estudiante)
+        return parsear_narrativa(titulo, reporte.narrativa), True
+
+    @staticmethod
+    def rerenderizar_reportes(reportes, tamano_lote=200):
+        """
+        Vuelve a generar los PDF de los reportes (p. ej. tras un cambio de
+        estilo) en el pool de procesos, sobrescribiendo cada archivo. Los
+        reportes sin narrativa analizada la guardan en el camino.
+
+        Args:
+            reportes: QuerySet de ReporteGenerado
+            tamano_lote: Reportes que se leen de la base de datos por lote
+
+        Returns:
+            tuple: (PDF renderizados, lista de (id de reporte, error))
+        """
+        reportes = reportes.only("id", "tipo", "estudiante", "narrativa", "narrativa_ast", "pdf_file").order_by("id")
+
+        renderizados, errores, lote = 0, [], []
+        for reporte in reportes.iterator(chunk_size=tamano_lote):
+            if not reporte.pdf_file:
+                errores.append((reporte.pk, "El reporte no tiene PDF"))
+                continue
+            lote.append(reporte)
+            if len(lote) == tamano_lote:
+                errores_lote = ReportService._rerenderizar_lote(lote)
+                renderizados += len(lote) - len(errores_lote)
+                errores += errores_lote
+                lote = []
+        if lote:
+            errores_lote = ReportService._rerenderizar_lote(lote)
+            renderizados += len(lote) - len(errores_lote)
+            errores += errores_lote
+
+        return renderizados, errores
+
+    @staticmethod
+    def _rerenderizar_lote(reportes):
+        """
+        Renderiza un lote de reportes y guarda las narrativas que hubo que
+        analizar.
+
+        Returns:
+            list: (id de reporte, error) de los que fallaron
+        """
+        tareas, analizados = [], []
+        for reporte in reportes:
+            documento, analizado = ReportService.documento_reporte(reporte)
+            if analizado:
+                reporte.narrativa_ast = documento
+                analizados.append(reporte)
+            tareas.append((documento, reporte.pdf_file.path))
+
+        if analizados:
+            ReporteGenerado.objects.bulk_update(analizados, ["narrativa_ast"])
+
+        return [
+            (reporte.pk, error)
+            for reporte, error in zip(reportes, renderizar_lote(tareas))
+            if error
+        ]
+
+    @staticmethod
+    def ejecutar_trabajo(trabajo):
+        """
+        Ejecuta un TrabajoReporte de la cola, actualizando su estado en cada etapa.
+
+        Args:
+            trabajo: Instancia de TrabajoReporte ya reclamada por el worker
+
+        Returns:
+            TrabajoReporte: El trabajo actualizado
+        """
+        try:
+            archivo = trabajo.archivo
+            tipo = trabajo.tipo
+            estudiante = trabajo.estudiante or ""
+
+            ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_GENERANDO_NARRATIVA)
+            json_data = trabajo.json_data
+            if json_data is None:
+                json_data = ReportService.obtener_json_data(archivo, tipo, estudiante)
+
+            titulo_reporte, descripcion, prompt = ReportService.construir_prompt(
+                json_data, tipo, estudiante, archivo
+            )
+            narrativa = ReportService.generar_narrativa(
+                prompt, json_data, forzar=trabajo.forzar_regeneracion
+            )
+
+            ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_RENDERIZANDO_PDF)
+            reporte = ReportService.guardar_reporte(
+                trabajo.usuario, archivo, tipo, estudiante,
+                titulo_reporte, descripcion, json_data, narrativa
+            )
+
+            trabajo.reporte = reporte
+            ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_COMPLETADO, campos=["reporte"])
+        except Exception as e:
+            logger.error("Error en el trabajo %s: %s: %s", trabajo.pk, type(e).__name__, e)
+            trabajo.error = f"{type(e).__name__}: {str(e)}"
+            ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_ERROR, campos=["error"])
+        return trabajo
+
+    @staticmethod
+    def ejecutar_lote(lote, cliente=None):
+        """
+        Genera los reportes individuales de un LoteReportes. Las narrativas se
+        piden al modelo en paralelo, con a lo sumo settings.OLLAMA_NUM_PARALLEL
+        peticiones a la vez, y el PDF de cada estudiante se renderiza en este
+        hilo en cuanto llega su narrativa, mientras las demás se generan.
+
+        Solo los hilos de Ollama esperan la red; las consultas a la base de
+        datos (caché de narrativas, estados, reportes) se hacen en este hilo.
+
+        Args:
+            lote: Instancia de LoteReportes ya reclamada por el worker
+            cliente: Cliente del modelo (por defecto, el del proceso)
+
+        Returns:
+            LoteReportes: El lote actualizado
+        """
+        try:
+            archivo = lote.archivo
+            trabajos = list(lote.trabajos.filter(estado=TrabajoReporte.ESTADO_EN_COLA).order_by("id"))
+
+            # Reportes individuales precalculados de todo el lote en una consulta
+            precalculados = dict(
+                Estudiante.objects
+                .filter(archivo=archivo, nombre__in=[t.estudiante for t in trabajos], reporte_json__isnull=False)
+                .values_list("nombre", "reporte_json")
+            )
+
+            # Si Ollama está caído, el circuit breaker hace fallar rápido el resto
+            cliente = cliente or ReportService._cliente_ollama()
+            pendientes = []
+            for trabajo in trabajos:
+                try:
+                    json_data = precalculados.get(trabajo.estudiante)
+                    if json_data is None:
+                        json_data = ReportService.obtener_json_data(archivo, "individual", trabajo.estudiante)
+                    titulo_reporte, descripcion, prompt = ReportService.construir_prompt(
+                        json_data, "individual", trabajo.estudiante, archivo
+                    )
+                    clave = NarrativeCache.calcular_clave(prompt, cliente.modelo, OLLAMA_OPTIONS)
+                    narrativa = None if lote.forzar_regeneracion else NarrativeCache.obtener(clave)
+                except Exception as e:
+                    ReportService._fallar_trabajo(trabajo, e)
+                    continue
+
+                trabajo.json_data = json_data
+                datos = (trabajo, titulo_reporte, descripcion, prompt, clave)
+                if narrativa is not None:
+                    ReportService._terminar_trabajo_lote(lote, datos, narrativa)
+                else:
+                    pendientes.append(datos)
+
+            if pendientes:
+                TrabajoReporte.objects.filter(pk__in=[datos[0].pk for datos in pendientes]).update(
+                    estado=TrabajoReporte.ESTADO_GENERANDO_NARRATIVA
+                )
+                ReportService._narrativas_en_paralelo(lote, pendientes, cliente)
+
+            ReportService._actualizar_estado(lote, LoteReportes.ESTADO_COMPLETADO)
+        except Exception as e:
+            logger.error("Error en el lote %s: %s: %s", lote.pk, type(e).__name__, e)
+            lote.error = f"{type(e).__name__}: {str(e)}"
+            ReportService._actualizar_estado(lote, LoteReportes.ESTADO_ERROR, campos=["error"])
+        return lote
+
+    @staticmethod
+    def _narrativas_en_paralelo(lote, pendientes, cliente):
+        """
+        Pide las narrativas pendientes del lote con un número acotado de hilos
+        y termina cada trabajo a medida que llegan.
+        """
+        paralelo = max(1, getattr(settings, "OLLAMA_NUM_PARALLEL", 1))
+        with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix=f"lote-{lote.pk}") as executor:
+            futuros = {
+                executor.submit(ReportService._pedir_narrativa, cliente, datos[3]): datos
+                for datos in pendientes
+            }
+            for futuro in as_completed(futuros):
+                datos = futuros[futuro]
+                try:
+                    narrativa = futuro.result()
+                    NarrativeCache.guardar(datos[4], cliente.modelo, narrativa)
+                except Exception as e:
+                    narrativa = ReportService.narrativa_de_error(e, datos[0].json_data)
+                ReportService._terminar_trabajo_lote(lote, datos, narrativa)
+
+    @staticmethod
+    def _terminar_trabajo_lote(lote, datos, narrativa):
+        """
+        Renderiza el PDF y guarda el reporte de un trabajo del lote.
+        """
+        trabajo, titulo_reporte, descripcion, _, _ = datos
+        try:
+            ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_RENDERIZANDO_PDF)
+            trabajo.reporte = ReportService.guardar_reporte(
+                lote.usuario, lote.archivo, "individual", trabajo.estudiante,
+                titulo_reporte, descripcion, trabajo.json_data, narrativa
+            )
+            ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_COMPLETADO, campos=["reporte"])
+        except Exception as e:
+            ReportService._fallar_trabajo(trabajo, e)
+        # El lote sigue vivo: procesar_trabajos no lo da por abandonado
+        LoteReportes.objects.filter(pk=lote.pk).update(fecha_actualizacion=timezone.now())
+
+    @staticmethod
+    def _fallar_trabajo(trabajo, error):
+        """
+        Marca un trabajo con error sin detener el resto del lote.
+        """
+        logger.error("Error en el trabajo %s: %s: %s", trabajo.pk, type(error).__name__, error)
+        trabajo.error = f"{type(error).__name__}: {str(error)}"
+        ReportService._actualizar_estado(trabajo, TrabajoReporte.ESTADO_ERROR, campos=["error"])
+
+    @staticmethod
+    def _actualizar_estado(trabajo, estado, campos=None):
+        """
+        Guarda el nuevo estado del trabajo o lote (y los campos extra indicados).
+        """
+        trabajo.estado = estado
+        trabajo.save(update_fields=["estado", "fecha_actualizacion"] + (campos or []))
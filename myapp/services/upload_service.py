@@ -0,0 +1,141 @@
+"""
+Servicio de ingesta de libros de notas.
+Parsea el Excel una sola vez (en el pool de procesos), calcula los resúmenes y
+guarda el archivo y sus estudiantes en una sola transacción.
+"""
+
+import io
+
+from django.db import transaction
+
+from ..models import ArchivoNotas, Estudiante
+from .metrics_service import MetricsService
+from ..utils.report_generator import generar_reporte_grupal_completo, reportes_individuales_batch
+from ..utils.process_pool import ejecutar
+from ..utils.excel_readers import leer_libro
+from ..utils.workbook_store import guardar_copia_columnar
+
+# Tamaño de lote para los INSERT de estudiantes
+ESTUDIANTES_BATCH_SIZE = 500
+
+
+class UploadService:
+    """
+    Servicio para procesar y guardar archivos de notas subidos por el usuario.
+    """
+
+    @staticmethod
+    def procesar_hojas(hojas):
+        """
+        Calcula todo lo que se guarda de un libro a partir de sus hojas ya parseadas.
+
+        Args:
+            hojas: dict {nombre_hoja: DataFrame}
+
+        Returns:
+            dict: resumen_json, nombres (primera hoja) y reportes_individuales
+        """
+        # Siempre calculamos resumen grupal
+        resumen_grupal = generar_reporte_grupal_completo(hojas)
+
+        # Extraer nombres de estudiantes (primera hoja)
+        hoja_principal = next(iter(hojas.values()))
+        nombres = hoja_principal["APELLIDOS/NOMBRES"].dropna().tolist()
+
+        # Precalcular el reporte individual de todos los estudiantes en una pasada
+        reportes_individuales = reportes_individuales_batch(hojas, nombres)
+
+        return {
+            "resumen_json": resumen_grupal,
+            "nombres": nombres,
+            "reportes_individuales": reportes_individuales,
+        }
+
+    @staticmethod
+    def ingerir(usuario, archivo_subido):
+        """
+        Procesa un archivo subido y lo guarda junto con sus estudiantes.
+
+        Args:
+            usuario: Usuario de Django
+            archivo_subido: UploadedFile recibido en request.FILES
+
+        Returns:
+            tuple: (ArchivoNotas, hojas, resultado de procesar_hojas)
+        """
+        # Parsear y calcular una sola vez, en el pool de procesos
+        hojas, resultado = ejecutar(procesar_libro, UploadService._origen_serializable(archivo_subido))
+
+        nuevo_archivo = UploadService.guardar(usuario, archivo_subido, resultado)
+
+        # Copia columnar para lecturas posteriores (necesita el ID del archivo)
+        guardar_copia_columnar(nuevo_archivo, hojas)
+        return nuevo_archivo, hojas, resultado
+
+    @staticmethod
+    def _origen_serializable(archivo_subido):
+        """
+        Lo que se envía al proceso hijo: la ruta si Django guardó la subida en
+        un archivo temporal, o su contenido si está en memoria.
+        """
+        if hasattr(archivo_subido, "temporary_file_path"):
+            return archivo_subido.temporary_file_path()
+        archivo_subido.seek(0)
+        contenido = archivo_subido.read()
+        archivo_subido.seek(0)
+        return contenido
+
+    @staticmethod
+    def guardar(usuario, archivo_subido, resultado):
+        """
+        Guarda el ArchivoNotas (con su resumen), los estudiantes y el
+        DashboardSummary en una transacción.
+        Si algo falla, se revierte todo y se elimina el archivo físico.
+
+        Returns:
+            ArchivoNotas: El archivo guardado
+        """
+        nuevo_archivo = ArchivoNotas(
+            usuario=usuario,
+            nombre=archivo_subido.name,
+            archivo=archivo_subido,
+            resumen_json=resultado["resumen_json"]
+        )
+        try:
+            with transaction.atomic():
+                nuevo_archivo.save()
+
+                reportes = resultado["reportes_individuales"]
+                Estudiante.objects.bulk_create(
+                    [
+                        Estudiante(archivo=nuevo_archivo, nombre=nombre, reporte_json=reportes.get(nombre))
+                        for nombre in resultado["nombres"]
+                    ],
+                    batch_size=ESTUDIANTES_BATCH_SIZE
+                )
+
+                # Resumen compacto que lee el dashboard
+                if resultado["resumen_json"]:
+                    MetricsService.save_summary(nuevo_archivo, resultado["resumen_json"])
+        except Exception:
+            campo = nuevo_archivo.archivo
+            if campo.name and campo.name.startswith("uploads/") and campo.storage.exists(campo.name):
+                campo.delete(save=False)
+            raise
+        return nuevo_archivo
+
+
+def procesar_libro(origen):
+    """
+    Parsea un libro y calcula sus resúmenes. Se ejecuta en el pool de procesos.
+
+    Args:
+        origen: Ruta del .xlsx o su contenido en bytes
+
+    Returns:
+        tuple: (hojas, resultado de UploadService.procesar_hojas)
+    """
+    if isinstance(origen, bytes):
+        origen = io.BytesIO(origen)
+    hojas = leer_libro(origen)
+    return hojas, UploadService.procesar_hojas(hojas)
@@ -0,0 +1,56 @@
+"""
+Señales que invalidan las versiones por usuario (ver utils/versiones.py) y
+el cliente del modelo cuando cambia su configuración.
+
+Las versiones se incrementan al confirmar la transacción: si se hiciera antes,
+otra petición podría calcular con los datos viejos y guardarlos en caché bajo
+la versión nueva.
+"""
+
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ArchivoNotas, DashboardSummary, ReporteGenerado
+from .services.llm_client import cerrar_cliente_llm
+from .utils.versiones import incrementar_version
+
+
+def _invalidar(ambitos, usuario_id):
+    def incrementar():
+        for ambito in ambitos:
+            incrementar_version(ambito, usuario_id)
+
+    transaction.on_commit(incrementar)
+
+
+@receiver([post_save, post_delete], sender=ReporteGenerado)
+def reportes_modificados(sender, instance, **kwargs):
+    # La tarjeta "último reporte" del dashboard también depende de los reportes
+    _invalidar(["reportes", "metricas"], instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=ArchivoNotas)
+def archivos_modificados(sender, instance, **kwargs):
+    # Subir, activar o eliminar un archivo cambia las métricas del dashboard
+    _invalidar(["metricas"], instance.usuario_id)
+
+
+@receiver(post_save, sender=DashboardSummary)
+def resumen_dashboard_modificado(sender, instance, **kwargs):
+    # Al subir un archivo el resumen ya trae su ArchivoNotas; si no (p. ej. al
+    # actualizarlo con update_or_create) solo se lee el usuario, no la fila
+    # completa con resumen_json
+    if DashboardSummary.archivo.is_cached(instance):
+        usuario_id = instance.archivo.usuario_id
+    else:
+        usuario_id = ArchivoNotas.objects.filter(pk=instance.archivo_id).values_list("usuario_id", flat=True).first()
+    _invalidar(["metricas"], usuario_id)
+
+
+@receiver(setting_changed)
+def configuracion_llm_modificada(sender, setting, **kwargs):
+    # El cliente del modelo se crea con la configuración del momento
+    if setting.startswith(("LLM_", "OLLAMA_")):
+        cerrar_cliente_llm()
@@ -30,7 +30,7 @@ function setupEventListeners() {
   const tipoReporteGenerar = document.getElementById('tipo-reporte-generar');
 
   if (btnVerArchivos) {
-    btnVerArchivos.addEventListener('click', mostrarListaArchivos);
+    btnVerArchivos.addEventListener('click', () => mostrarListaArchivos());
   }
 
   if (btnCambiarArchivo) {
@@ -68,8 +68,14 @@ function setupEventListeners() {
 
 // Cargar archivo activo del usuario
 function cargarArchivoActivo() {
-  fetch('/dashboard/get-archivo-activo/')
-    .then(res => res.json())
+  // En la primera página se reutiliza la carga inicial (dashboard.js)
+  const bootstrap = consumirBootstrap();
+  const pedirArchivo = () => fetch('/dashboard/get-archivo-activo/').then(res => res.json());
+  const archivoPromesa = bootstrap
+    ? bootstrap.then(datos => ({ archivo: datos.archivo }), pedirArchivo)
+    : pedirArchivo();
+
+  archivoPromesa
     .then(data => {
       if (data.archivo) {
         archivoActivo = data.archivo;
@@ -112,15 +118,23 @@ function mostrarArchivoActivo() {
   formUploadBox.style.display = 'none';
 }
 
-// Mostrar lista de todos los archivos
-function mostrarListaArchivos() {
-  fetch('/dashboard/mis-archivos/')
+// Mostrar lista de todos los archivos (paginada: "Cargar más" pide la siguiente página)
+function mostrarListaArchivos(cursor = null) {
+  const url = cursor
+    ? `/dashboard/mis-archivos/?cursor=${encodeURIComponent(cursor)}`
+    : '/dashboard/mis-archivos/';
+
+  fetch(url)
     .then(res => res.json())
     .then(data => {
       const container = document.getElementById('lista-archivos');
       const box = document.getElementById('lista-archivos-box');
 
-      if (!data.archivos || data.archivos.length === 0) {
+      if (data.error) {
+        throw new Error(data.error);
+      }
+
+      if (!cursor && (!data.archivos || data.archivos.length === 0)) {
         container.innerHTML = '<p>No tienes archivos guardados.</p>';
       } else {
         let html = '';
@@ -146,7 +160,24 @@ function mostrarListaArchivos() {
             </div>
           `;
         });
-        container.innerHTML = html;
+
+        const botonAnterior = document.getElementById('btn-mas-archivos');
+        if (botonAnterior) botonAnterior.remove();
+
+        if (cursor) {
+          container.insertAdjacentHTML('beforeend', html);
+        } else {
+          container.innerHTML = html;
+        }
+
+        if (data.next_cursor) {
+          const boton = document.createElement('button');
+          boton.id = 'btn-mas-archivos';
+          boton.className = 'btn-secondary';
+          boton.textContent = 'Cargar más';
+          boton.addEventListener('click', () => mostrarListaArchivos(data.next_cursor));
+          container.appendChild(boton);
+        }
       }
 
       box.style.display = 'block';
@@ -224,96 +255,12 @@ function generarReporteDesdeArchivoActivo() {
     return;
   }
 
-  resultadoBox.innerHTML = `
-    <div style="text-align:center; padding:20px;">
-      <h3>⏳ Generando reporte...</h3>
-      <p style="color:#666;">Esto puede tardar entre 10-30 segundos.</p>
-      <div style="margin-top:20px;">
-        <div class="spinner" style="border:4px solid #f3f3f3; border-top:4px solid #3498db; border-radius:50%; width:40px; height:40px; animation:spin 1s linear infinite; margin:0 auto;"></div>
-      </div>
-    </div>
-    <style>
-      @keyframes spin {
-        0% { transform: rotate(0deg); }
-        100% { transform: rotate(360deg); }
-      }
-    </style>
-  `;
+  // El backend genera el JSON desde el archivo guardado (resumen_json)
+  let formData = new FormData();
+  formData.append('archivo_id', archivoActivo.id);
+  formData.append('tipo', tipo);
+  formData.append('estudiante', estudiante);
 
-  // Obtener JSON desde el backend (ya está guardado en resumen_json)
-  fetch(`/dashboard/get-estudiantes/${archivoActivo.id}/`)
-    .then(res => res.json())
-    .then(data => {
-      // Preparar datos para el reporte
-      let formData = new FormData();
-      formData.append('archivo_id', archivoActivo.id);
-      formData.append('tipo', tipo);
-      formData.append('estudiante', estudiante);
-
-      // Llamar al endpoint de procesar reporte
-      return fetch('/dashboard/procesar_reporte/', {
-        method: 'POST',
-        body: formData
-      });
-    })
-    .then(res => {
-      console.log("Respuesta recibida, status:", res.status);
-      if (!res.ok) {
-        throw new Error(`HTTP error! status: ${res.status}`);
-      }
-      return res.json();
-    })
-    .then(data => {
-      console.log("Datos recibidos:", data);
-      if (data.error) {
-        resultadoBox.innerHTML = `
-          <div style="padding:20px; background:#ffebee; border-radius:8px;">
-            <h3>❌ Error al generar reporte</h3>
-            <p>${data.error}</p>
-          </div>
-        `;
-        return;
-      }
-
-      // Botón "Ver métricas" solo para reportes grupales
-      const botonMetricas = tipo === "grupal" 
-        ? `<button class="btn-primary" onclick="window.location.href='/dashboard/'" style="background:#015E80;">
-             📊 Ver Métricas
-           </button>`
-        : '';
-
-      resultadoBox.innerHTML = `
-        <div style="margin-top:20px; padding:15px; background:#e8f5e9; border-radius:8px; border-left:4px solid #4CAF50;">
-          <h3>¡Reporte Generado Exitosamente!</h3>
-          <p style="margin:10px 0;">Tu reporte está listo. Puedes descargarlo o previsualizarlo:</p>
-          <div style="display:flex; gap:10px; flex-wrap:wrap; margin-top:15px;">
-            <button class="btn-success" onclick="descargarPDF('${data.pdf}', '${tipo === 'individual' ? 'reporte_individual' : 'reporte_grupal'}')">
-              📥 Descargar PDF
-            </button>
-            <button class="btn-primary" onclick="previsualizarPDF('${data.pdf}')">
-              Previsualizar PDF
-            </button>
-            ${botonMetricas}
-          </div>
-        </div>
-      `;
-
-      resultadoBox.scrollIntoView({ behavior: "smooth", block: "start" });
-    })
-    .catch(err => {
-      console.error('Error completo:', err);
-      resultadoBox.innerHTML = `
-        <div style="padding:20px; background:#ffebee; border-radius:8px;">
-          <h3>❌ Error inesperado</h3>
-          <p><strong>Error:</strong> ${err.message}</p>
-          <p style="margin-top:10px; color:#666;">Por favor verifica que:</p>
-          <ul style="color:#666;">
-            <li>El servidor Django esté corriendo</li>
-            <li>Ollama esté corriendo (ejecuta: ollama list)</li>
-            <li>El modelo gemma3:12b esté descargado</li>
-            <li>Revisa la consola del navegador (F12) y del servidor para más detalles</li>
-          </ul>
-        </div>
-      `;
-    });
+  // Llamar al endpoint de procesar reporte en modo streaming (definido en upload.js)
+  procesarReporteStream(formData, resultadoBox, tipo);
 }
@@ -27,6 +27,21 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 });
 
+// ======================================================
+// CARGA INICIAL: archivo activo y métricas en una sola petición.
+// Solo la usa la primera página que se muestra; las navegaciones
+// siguientes piden los datos a sus endpoints habituales.
+// ======================================================
+let bootstrapPendiente = fetch('/dashboard/bootstrap/')
+  .then(response => response.ok ? response.json() : Promise.reject(response.status));
+bootstrapPendiente.catch(() => {});
+
+function consumirBootstrap() {
+  const pendiente = bootstrapPendiente;
+  bootstrapPendiente = null;
+  return pendiente;
+}
+
 // ======================================================
 // Utility para destruir gráficos previos de Chart.js
 // ======================================================
@@ -47,8 +62,13 @@ function initCharts() {
   if (!chartBar && !chartPie && !chartAsistencia) return;
 
   // Cargar métricas del archivo activo desde el backend
-  fetch('/dashboard/get-metricas/')
-    .then(response => response.json())
+  const bootstrap = consumirBootstrap();
+  const pedirMetricas = () => fetch('/dashboard/get-metricas/').then(response => response.json());
+  const metricasPromesa = bootstrap
+    ? bootstrap.then(datos => datos.metricas, pedirMetricas)
+    : pedirMetricas();
+
+  metricasPromesa
     .then(metricas => {
       if (metricas.sin_datos) {
         // Mostrar mensaje si no hay datos
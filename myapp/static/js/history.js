@@ -0,0 +1,98 @@
+// ======================================================
+// Historial de reportes – paginación por cursor y descarga en ZIP
+// ======================================================
+
+document.addEventListener("spa:navigate", initHistoryPage);
+
+const TIPOS_REPORTE = { grupal: "Grupal", individual: "Individual" };
+
+function initHistoryPage() {
+  const page = document.querySelector('[data-page="history"]');
+  if (!page) return;
+
+  const boton = document.getElementById("btn-mas-reportes");
+  if (boton) {
+    boton.addEventListener("click", () => cargarMasReportes(boton));
+  }
+
+  const botonZip = document.getElementById("btn-descargar-seleccionados");
+  if (botonZip) {
+    botonZip.addEventListener("click", descargarSeleccionados);
+  }
+}
+
+// Descarga los reportes marcados en un solo ZIP (se genera mientras se descarga)
+function descargarSeleccionados() {
+  const ids = Array.from(document.querySelectorAll(".reporte-check:checked")).map((c) => c.value);
+  if (ids.length === 0) {
+    alert("Selecciona al menos un reporte.");
+    return;
+  }
+
+  const params = new URLSearchParams();
+  ids.forEach((id) => params.append("ids", id));
+  window.location.href = `/dashboard/descargar-reportes-zip/?${params.toString()}`;
+}
+
+// Pide la siguiente página a la API con los mismos filtros de la página
+// (el cursor solo guarda la posición; responde 304 si no cambió nada)
+function cargarMasReportes(boton) {
+  const cursor = boton.dataset.nextCursor;
+  if (!cursor) return;
+
+  const params = new URLSearchParams(boton.dataset.filtros || "");
+  params.set("cursor", cursor);
+
+  boton.disabled = true;
+  fetch(`/dashboard/get-reportes/?${params.toString()}`)
+    .then((res) => res.json())
+    .then((data) => {
+      if (data.error) throw new Error(data.error);
+
+      const tbody = document.getElementById("reportes-tbody");
+      data.reportes.forEach((reporte) => tbody.appendChild(filaReporte(reporte)));
+
+      boton.dataset.nextCursor = data.next_cursor || "";
+      boton.style.display = data.next_cursor ? "" : "none";
+    })
+    .catch((err) => {
+      console.error("Error al cargar más reportes:", err);
+      alert("Error al cargar más reportes");
+    })
+    .finally(() => {
+      boton.disabled = false;
+    });
+}
+
+// Fila con textContent: la descripción incluye nombres de estudiantes y de
+// archivos subidos, que no deben interpretarse como HTML
+function filaReporte(reporte) {
+  const fila = document.createElement("tr");
+  const celda = (contenido) => {
+    const td = document.createElement("td");
+    if (contenido instanceof Node) {
+      td.appendChild(contenido);
+    } else {
+      td.textContent = contenido;
+    }
+    fila.appendChild(td);
+  };
+
+  const check = document.createElement("input");
+  check.type = "checkbox";
+  check.className = "reporte-check";
+  check.value = reporte.id;
+
+  const enlace = document.createElement("a");
+  enlace.href = `/dashboard/descargar-reporte/${encodeURIComponent(reporte.id)}/`;
+  enlace.className = "btn-success";
+  enlace.download = "";
+  enlace.textContent = "📥 Descargar";
+
+  celda(check);
+  celda(reporte.fecha_generacion);
+  celda(TIPOS_REPORTE[reporte.tipo] || reporte.tipo);
+  celda(reporte.descripcion);
+  celda(enlace);
+  return fila;
+}
@@ -67,6 +67,9 @@ function loadPartial(url, push = true) {
         new CustomEvent("spa:navigate", { detail: { url } })
       );
 
+      // La carga inicial (dashboard.js) solo vale para la primera página
+      consumirBootstrap();
+
       // Ejecutar inicializador auxiliar
       runPageInitializer();
 
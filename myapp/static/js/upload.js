@@ -115,7 +115,19 @@ function initUploadPage() {
       .then((res) => res.json())
       .then((data) => {
         if (data.error) {
-          resultadoBox.innerHTML = `<p>❌ Error: ${data.error}</p>`;
+          // Los mensajes traen nombres de hojas y columnas del libro: van como texto
+          const mensaje = document.createElement("p");
+          mensaje.textContent = `❌ Error: ${data.error}`;
+          resultadoBox.replaceChildren(mensaje);
+          if (Array.isArray(data.detalles)) {
+            const lista = document.createElement("ul");
+            data.detalles.forEach((detalle) => {
+              const item = document.createElement("li");
+              item.textContent = detalle;
+              lista.appendChild(item);
+            });
+            resultadoBox.appendChild(lista);
+          }
           return;
         }
 
@@ -163,95 +175,13 @@ function initUploadPage() {
 
     console.log("Generando reporte con archivo_id:", archivoId);
 
-    resultadoBox.innerHTML = `
-      <div style="text-align:center; padding:20px;">
-        <h3>⏳ Generando Reporte narrativo...</h3>
-        <p style="color:#666;">Esto puede tardar entre 10-30 segundos.</p>
-        <div style="margin-top:20px;">
-          <div class="spinner" style="border:4px solid #f3f3f3; border-top:4px solid #3498db; border-radius:50%; width:40px; height:40px; animation:spin 1s linear infinite; margin:0 auto;"></div>
-        </div>
-      </div>
-      <style>
-        @keyframes spin {
-          0% { transform: rotate(0deg); }
-          100% { transform: rotate(360deg); }
-        }
-      </style>
-    `;
-
     let formData = new FormData();
     // NO enviar json_data, que el backend lo genere desde el archivo
     formData.append("tipo", tipoReporte);
     formData.append("estudiante", estudianteSeleccionado);
     formData.append("archivo_id", archivoId);
 
-    fetch("/dashboard/procesar_reporte/", {
-      method: "POST",
-      body: formData,
-    })
-      .then((res) => {
-        console.log("Respuesta recibida, status:", res.status);
-        if (!res.ok) {
-          throw new Error(`HTTP error! status: ${res.status}`);
-        }
-        return res.json();
-      })
-      .then((data) => {
-        console.log("Datos recibidos:", data);
-        if (data.error) {
-          resultadoBox.innerHTML = `
-            <div style="padding:20px; background:#ffebee; border-radius:8px;">
-              <h3>❌ Error al generar reporte</h3>
-              <p>${data.error}</p>
-            </div>
-          `;
-          return;
-        }
-
-        // Mostrar resultado completo
-        const tituloJson = tipoReporte === "individual" 
-          ? "JSON de reporte individual"
-          : "JSON de resumen grupal";
-
-        // Botón "Ver métricas" solo para reportes grupales
-        const botonMetricas = tipoReporte === "grupal" 
-          ? `<button class="btn-primary" onclick="window.location.href='/dashboard/'" style="background:#015E80;">
-               📊 Ver Métricas
-             </button>`
-          : '';
-
-        resultadoBox.innerHTML = `
-          <div style="margin-top:20px; padding:15px; background:#e8f5e9; border-radius:8px; border-left:4px solid #4CAF50;">
-            <h3>¡Reporte Generado Exitosamente!</h3>
-            <p style="margin:10px 0;">Tu reporte está listo. Puedes descargarlo o previsualizarlo:</p>
-            <div style="display:flex; gap:10px; flex-wrap:wrap; margin-top:15px;">
-              <button class="btn-success" onclick="descargarPDF('${data.pdf}', '${tipoReporte === 'individual' ? 'reporte_individual' : 'reporte_grupal'}')">
-                📥 Descargar PDF
-              </button>
-              <button class="btn-primary" onclick="previsualizarPDF('${data.pdf}')">Previsualizar PDF
-              </button>
-              ${botonMetricas}
-            </div>
-          </div>`;
-
-        resultadoBox.scrollIntoView({ behavior: "smooth", block: "start" });
-      })
-      .catch((err) => {
-        console.error("Error completo:", err);
-        resultadoBox.innerHTML = `
-          <div style="padding:20px; background:#ffebee; border-radius:8px;">
-            <h3>❌ Error inesperado</h3>
-            <p><strong>Error:</strong> ${err.message}</p>
-            <p style="margin-top:10px; color:#666;">Por favor verifica que:</p>
-            <ul style="color:#666;">
-              <li>El servidor Django esté corriendo</li>
-              <li>Ollama esté corriendo (ejecuta: ollama list)</li>
-              <li>El modelo gemma3:12b esté descargado</li>
-              <li>Revisa la consola del navegador (F12) y del servidor para más detalles</li>
-            </ul>
-          </div>
-        `;
-      });
+    procesarReporteStream(formData, resultadoBox, tipoReporte);
   }
 
   // Hacer la función accesible globalmente
@@ -259,56 +189,124 @@ function initUploadPage() {
 }
 
 // =========================
-// FUNCIONES PARA PDF
+// REPORTE EN STREAMING (SSE)
 // =========================
 
-function descargarPDF(pdfBase64, nombreArchivo) {
-  try {
-    const byteCharacters = atob(pdfBase64);
-    const byteNumbers = new Array(byteCharacters.length);
-    for (let i = 0; i < byteCharacters.length; i++) {
-      byteNumbers[i] = byteCharacters.charCodeAt(i);
+// Envía el formulario a procesar_reporte en modo stream y muestra la narrativa
+// a medida que llega. Al terminar, muestra los botones de descarga.
+function procesarReporteStream(formData, resultadoBox, tipoReporte) {
+  formData.append("stream", "1");
+
+  resultadoBox.innerHTML = `
+    <div style="padding:20px;">
+      <h3 id="stream-estado">⏳ Generando reporte narrativo...</h3>
+      <pre id="stream-narrativa" style="white-space:pre-wrap; font-family:inherit; background:#fafafa; padding:15px; border-radius:8px; max-height:400px; overflow:auto;"></pre>
+    </div>
+  `;
+  const estado = document.getElementById("stream-estado");
+  const narrativa = document.getElementById("stream-narrativa");
+
+  const manejarEvento = (evento, datos) => {
+    if (evento === "fragmento") {
+      narrativa.textContent += datos.texto;
+      narrativa.scrollTop = narrativa.scrollHeight;
+    } else if (evento === "estado") {
+      estado.textContent = "⏳ Generando PDF...";
+    } else if (evento === "fin") {
+      mostrarReporteListo(resultadoBox, tipoReporte, datos.url_descarga);
+    } else if (evento === "error") {
+      resultadoBox.innerHTML = `
+        <div style="padding:20px; background:#ffebee; border-radius:8px;">
+          <h3>❌ Error al generar reporte</h3>
+          <p id="stream-error"></p>
+        </div>
+      `;
+      document.getElementById("stream-error").textContent = datos.error;
     }
-    const byteArray = new Uint8Array(byteNumbers);
-    const blob = new Blob([byteArray], { type: "application/pdf" });
-    
-    const link = document.createElement("a");
-    link.href = URL.createObjectURL(blob);
-    link.download = `${nombreArchivo}_${new Date().toISOString().split('T')[0]}.pdf`;
-    link.click();
-    URL.revokeObjectURL(link.href);
-  } catch (error) {
-    console.error("Error al descargar PDF:", error);
-    alert("Error al descargar el PDF");
-  }
-}
+  };
+
+  fetch("/dashboard/procesar_reporte/", {
+    method: "POST",
+    body: formData,
+  })
+    .then(async (res) => {
+      if (!res.ok) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.error || `HTTP error! status: ${res.status}`);
+      }
 
-function previsualizarPDF(pdfBase64) {
-  try {
-    const byteCharacters = atob(pdfBase64);
-    const byteNumbers = new Array(byteCharacters.length);
-    for (let i = 0; i < byteCharacters.length; i++) {
-      byteNumbers[i] = byteCharacters.charCodeAt(i);
-    }
-    const byteArray = new Uint8Array(byteNumbers);
-    const blob = new Blob([byteArray], { type: "application/pdf" });
-    
-    const previewBox = document.getElementById("preview-box");
-    const previewFrame = document.getElementById("preview-frame");
-    
-    if (previewBox && previewFrame) {
-      previewFrame.src = URL.createObjectURL(blob);
-      previewBox.style.display = "block";
-      previewBox.scrollIntoView({ behavior: "smooth" });
-    }
-  } catch (error) {
-    console.error("Error al previsualizar PDF:", error);
-    alert("Error al previsualizar el PDF");
-  }
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Los eventos SSE se separan con una línea en blanco
+        let corte;
+        while ((corte = buffer.indexOf("\n\n")) !== -1) {
+          const bloque = buffer.slice(0, corte);
+          buffer = buffer.slice(corte + 2);
+          const evento = (bloque.match(/^event: (.*)$/m) || [])[1];
+          const datos = (bloque.match(/^data: (.*)$/m) || [])[1];
+          if (evento && datos) manejarEvento(evento, JSON.parse(datos));
+        }
+      }
+    })
+    .catch((err) => {
+      console.error("Error completo:", err);
+      resultadoBox.innerHTML = `
+        <div style="padding:20px; background:#ffebee; border-radius:8px;">
+          <h3>❌ Error inesperado</h3>
+          <p><strong>Error:</strong> <span id="stream-error"></span></p>
+          <p style="margin-top:10px; color:#666;">Por favor verifica que:</p>
+          <ul style="color:#666;">
+            <li>El servidor Django esté corriendo</li>
+            <li>Ollama esté corriendo (ejecuta: ollama list)</li>
+            <li>El modelo gemma3:12b esté descargado</li>
+            <li>Revisa la consola del navegador (F12) y del servidor para más detalles</li>
+          </ul>
+        </div>
+      `;
+      document.getElementById("stream-error").textContent = err.message;
+    });
 }
 
+function mostrarReporteListo(resultadoBox, tipoReporte, urlDescarga) {
+  // Botón "Ver métricas" solo para reportes grupales
+  const botonMetricas = tipoReporte === "grupal"
+    ? `<button class="btn-primary" onclick="window.location.href='/dashboard/'" style="background:#015E80;">
+         📊 Ver Métricas
+       </button>`
+    : '';
+
+  resultadoBox.innerHTML = `
+    <div style="margin-top:20px; padding:15px; background:#e8f5e9; border-radius:8px; border-left:4px solid #4CAF50;">
+      <h3>¡Reporte Generado Exitosamente!</h3>
+      <p style="margin:10px 0;">Tu reporte está listo. Puedes descargarlo o previsualizarlo:</p>
+      <div style="display:flex; gap:10px; flex-wrap:wrap; margin-top:15px;">
+        <a class="btn-success" href="${urlDescarga}" download>
+          📥 Descargar PDF
+        </a>
+        <button class="btn-primary" onclick="previsualizarPDFDesdeUrl('${urlDescarga}')">Previsualizar PDF
+        </button>
+        ${botonMetricas}
+      </div>
+    </div>`;
 
+  resultadoBox.scrollIntoView({ behavior: "smooth", block: "start" });
+}
 
+// El navegador descarga el PDF directamente (por rangos) en el visor
+function previsualizarPDFDesdeUrl(url) {
+  const previewBox = document.getElementById("preview-box");
+  const previewFrame = document.getElementById("preview-frame");
 
-
-
+  if (previewBox && previewFrame) {
+    previewFrame.src = `${url}?inline=1`;
+    previewBox.style.display = "block";
+    previewBox.scrollIntoView({ behavior: "smooth" });
+  }
+}
@@ -1,3 +1,1310 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import ollama
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .management.commands.bench_pdf import NARRATIVA, documento_sin_cache, renderizar, sin_fuentes_incrustadas
+from .management.commands.bench_lote import ClienteSimulado
+from .management.commands.bench_lectores_excel import escribir_libro_sintetico, leer_anterior
+from .management.commands.bench_reporte_grupal import generar_hojas_sinteticas, generar_reporte_grupal_por_hojas
+from .management.commands import procesar_trabajos
+from .management.commands.procesar_trabajos import Command as ProcesarTrabajos
+from .models import ArchivoNotas, DashboardSummary, Estudiante, LoteReportes, NarrativaCache, ReporteGenerado, TrabajoReporte
+from .management.commands.servidor_llm_simulado import crear_servidor
+from .services.llm_backends import OllamaBackend, OpenAIBackend, SimuladorLLM, StubBackend, crear_backend
+from .services.llm_client import LLMClient, LLMNoDisponible
+from .services.metrics_service import MetricsService
+from .services.narrative_cache import NarrativeCache
+from .services.report_service import OLLAMA_OPTIONS, ReportService
+from .services.upload_service import UploadService
+from .utils.excel_readers import LECTORES, leer_libro, validar_encabezados
+from .utils import process_pool, workbook_store
+from .utils.descargas import respuesta_descarga
+from .utils.narrativa_ast import parsear_narrativa
+from .utils.pdf_plantilla import obtener_plantilla
+from .utils.prompt_compacto import compactar_grupal, contar_tokens, serializar
+from .prompts import get_prompt_reporte_grupal, get_prompt_reporte_individual
+from .utils.report_generator import (
+    generar_reporte_grupal_completo,
+    reporte_individual,
+    reportes_individuales_batch,
+)
+
+
+class ReporteGrupalLongFormTests(SimpleTestCase):
+    """
+    El motor long-form debe producir exactamente la misma salida que la
+    implementación original por hojas.
+    """
+
+    def assertMismaSalida(self, hojas):
+        self.assertEqual(
+            json.dumps(generar_reporte_grupal_completo(hojas), ensure_ascii=False),
+            json.dumps(generar_reporte_grupal_por_hojas(hojas), ensure_ascii=False),
+        )
+
+    def test_libro_sintetico(self):
+        self.assertMismaSalida(generar_hojas_sinteticas(500, 3))
+
+    def test_muchas_hojas(self):
+        self.assertMismaSalida(generar_hojas_sinteticas(300, 8, semilla=1))
+
+    def test_empates_y_notas_vacias(self):
+        hojas = generar_hojas_sinteticas(6, 3, semilla=2)
+        hojas["TRIMESTRE1"]["Nota Trimemestre"] = [9.0, 9.0, 9.0, 9.0, None, 5.0]
+        hojas["TRIMESTRE2"]["Nota Trimemestre"] = [None, None, 7, 7, None, None]
+        hojas["TRIMESTRE3"] = hojas["TRIMESTRE3"].iloc[:2]
+        self.assertMismaSalida(hojas)
+
+    def test_sin_hojas(self):
+        self.assertMismaSalida({})
+
+
+class LectoresExcelTests(SimpleTestCase):
+    """
+    Todos los lectores de Excel deben producir los mismos reportes que la
+    lectura original con pd.read_excel.
+    """
+
+    def test_mismos_reportes_con_todos_los_lectores(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "libro.xlsx")
+            escribir_libro_sintetico(ruta, 40, 3)
+
+            esperado = json.dumps(UploadService.procesar_hojas(leer_anterior(ruta)), ensure_ascii=False)
+            for motor in LECTORES:
+                with self.subTest(motor=motor):
+                    hojas = leer_libro(ruta, motor)
+                    self.assertNotIn("Observaciones", hojas["TRIMESTRE1"].columns)
+                    self.assertEqual(
+                        json.dumps(UploadService.procesar_hojas(hojas), ensure_ascii=False), esperado
+                    )
+
+
+def libro_con_celdas_vacias(ruta, estudiantes=6):
+    """
+    Libro sintético con celdas vacías en notas, componentes y texto.
+    """
+    from openpyxl import load_workbook
+
+    escribir_libro_sintetico(ruta, estudiantes, 3)
+    libro = load_workbook(ruta)
+    for hoja, fila in [("TRIMESTRE1", 2), ("TRIMESTRE2", 2), ("TRIMESTRE2", 3), ("TRIMESTRE3", 4)]:
+        encabezados = [celda.value for celda in libro[hoja][1]]
+        for columna in ("Nota Trimemestre", "Cualitativa", "Aporte Individual", "Examen", "Comportamiento"):
+            libro[hoja].cell(row=fila, column=encabezados.index(columna) + 1).value = None
+    libro.save(ruta)
+
+
+class ReportesIndividualesTests(TestCase):
+    """
+    Reportes individuales precalculados al subir el libro.
+    """
+
+    def test_lote_igual_al_individual(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "libro.xlsx")
+            libro_con_celdas_vacias(ruta)
+            hojas = leer_libro(ruta)
+
+        nombres = hojas["TRIMESTRE1"]["APELLIDOS/NOMBRES"].tolist() + ["Nadie"]
+        lote = reportes_individuales_batch(hojas, nombres)
+        self.assertEqual(list(lote), nombres)
+        for nombre in nombres:
+            self.assertEqual(lote[nombre], reporte_individual(nombre, hojas))
+
+    def test_upload_con_celdas_vacias(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        usuario = User.objects.create_user("docente", password="clave")
+        self.client.force_login(usuario)
+
+        ruta = os.path.join(media.name, "libro.xlsx")
+        libro_con_celdas_vacias(ruta)
+        with open(ruta, "rb") as f:
+            respuesta = self.client.post("/dashboard/upload/", {"file": SimpleUploadedFile("libro.xlsx", f.read())})
+        self.assertEqual(respuesta.status_code, 200)
+
+        estudiantes = Estudiante.objects.filter(archivo_id=respuesta.json()["archivo_id"]).order_by("id")
+        self.assertEqual(estudiantes.count(), 6)
+        for estudiante in estudiantes:
+            # jsonb (PostgreSQL) rechaza NaN
+            json.dumps(estudiante.reporte_json, allow_nan=False)
+        trimestre = estudiantes[0].reporte_json["trimestres"]["TRIMESTRE1"]
+        self.assertEqual((trimestre["nota_final"], trimestre["cualitativa"], trimestre["comportamiento"]), (None, None, None))
+        self.assertIsNone(trimestre["componentes"]["examen"])
+        self.assertIsInstance(trimestre["componentes"]["proyecto"], float)
+
+
+class IngestaTests(TestCase):
+    """
+    UploadService.guardar: consultas fijas sin importar el tamaño de la clase
+    y todo o nada.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.usuario = User.objects.create_user("docente")
+
+    def guardar(self, estudiantes):
+        resultado = UploadService.procesar_hojas(generar_hojas_sinteticas(estudiantes, 3))
+        return UploadService.guardar(self.usuario, SimpleUploadedFile("a.xlsx", b"libro"), resultado)
+
+    def test_consultas_fijas(self):
+        # Archivo (desactivar el anterior + INSERT), estudiantes en un INSERT
+        # (SQLite admite hasta 333 filas de 3 columnas por INSERT), resumen del
+        # dashboard y los savepoints de las transacciones
+        for estudiantes in (5, 300):
+            with self.subTest(estudiantes=estudiantes), self.assertNumQueries(14):
+                archivo = self.guardar(estudiantes)
+            self.assertEqual(archivo.estudiantes.count(), estudiantes)
+            self.assertEqual(archivo.estudiantes.filter(reporte_json__isnull=True).count(), 0)
+
+    def test_revierte_todo_si_falla(self):
+        with mock.patch.object(MetricsService, "save_summary", side_effect=RuntimeError("fallo simulado")):
+            with self.assertRaises(RuntimeError):
+                self.guardar(20)
+        self.assertFalse(ArchivoNotas.objects.exists())
+        self.assertFalse(Estudiante.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media.name, "uploads")), [])
+
+
+def terminar_proceso(*args):
+    """
+    Simula un proceso del pool que muere (p. ej. por falta de memoria).
+    """
+    os._exit(1)
+
+
+@override_settings(UPLOAD_PROCESS_POOL_WORKERS=1)
+class ProcessPoolTests(TestCase):
+    """
+    Un proceso hijo caído reemplaza el pool y falla la tarea, sin repetirla
+    en el proceso del servidor.
+    """
+
+    def setUp(self):
+        process_pool.cerrar_pool()
+        self.addCleanup(process_pool.cerrar_pool)
+
+    def test_ejecuta_en_otro_proceso(self):
+        self.assertNotEqual(process_pool.ejecutar(os.getpid), os.getpid())
+
+    @override_settings(UPLOAD_PROCESS_POOL_WORKERS=0)
+    def test_sin_pool(self):
+        self.assertEqual(process_pool.ejecutar(os.getpid), os.getpid())
+        self.assertIsNone(process_pool.obtener_pool())
+
+    def test_proceso_caido(self):
+        roto = process_pool.obtener_pool()
+        with self.assertRaises(process_pool.ProcesoCaido):
+            process_pool.ejecutar(terminar_proceso)
+
+        # El pool nuevo atiende las tareas siguientes
+        self.assertIsNot(process_pool.obtener_pool(), roto)
+        self.assertNotEqual(process_pool.ejecutar(os.getpid), os.getpid())
+
+    def test_upload_falla_sin_guardar(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client.force_login(User.objects.create_user("docente"))
+
+        ruta = os.path.join(media.name, "libro.xlsx")
+        escribir_libro_sintetico(ruta, 5, 3)
+        with open(ruta, "rb") as f:
+            archivo = SimpleUploadedFile("libro.xlsx", f.read())
+        with mock.patch("myapp.services.upload_service.procesar_libro", terminar_proceso):
+            respuesta = self.client.post("/dashboard/upload/", {"file": archivo})
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn("intente de nuevo", respuesta.json()["error"])
+        self.assertFalse(ArchivoNotas.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(media.name, "uploads")))
+
+
+class CopiaColumnarTests(TestCase):
+    """
+    Copia Feather de los libros: ida y vuelta con los mismos tipos que la
+    lectura del Excel, y vuelta al Excel si falta o está desactualizada.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        usuario = User.objects.create_user("docente")
+        os.makedirs(os.path.join(self.media.name, "uploads"))
+        self.archivo = ArchivoNotas.objects.create(usuario=usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        escribir_libro_sintetico(self.archivo.archivo.path, 30, 3)
+
+    def assertMismasHojas(self, hojas, esperadas):
+        self.assertEqual(list(hojas), list(esperadas))
+        for nombre, df in esperadas.items():
+            pd.testing.assert_frame_equal(hojas[nombre], df)
+
+    def test_ida_y_vuelta(self):
+        hojas = leer_libro(self.archivo.archivo.path)
+        self.assertTrue(workbook_store.guardar_copia_columnar(self.archivo, hojas))
+        self.assertMismasHojas(workbook_store.cargar_copia_columnar(self.archivo), hojas)
+
+    def test_sin_copia_lee_el_excel_una_vez(self):
+        self.assertIsNone(workbook_store.cargar_copia_columnar(self.archivo))
+        with mock.patch.object(workbook_store, "leer_libro", wraps=workbook_store.leer_libro) as leer:
+            primera = workbook_store.cargar_hojas(self.archivo)
+            segunda = workbook_store.cargar_hojas(self.archivo)
+        self.assertEqual(leer.call_count, 1)
+        self.assertMismasHojas(segunda, primera)
+
+    def test_copia_desactualizada(self):
+        workbook_store.cargar_hojas(self.archivo)
+        escribir_libro_sintetico(self.archivo.archivo.path, 12, 2)
+        self.assertIsNone(workbook_store.cargar_copia_columnar(self.archivo))
+        hojas = workbook_store.cargar_hojas(self.archivo)
+        self.assertEqual((len(hojas), len(hojas["TRIMESTRE1"])), (2, 12))
+        self.assertMismasHojas(workbook_store.cargar_copia_columnar(self.archivo), hojas)
+
+        # Índice del formato anterior (una lista de hojas)
+        ruta_indice = os.path.join(workbook_store.ruta_copia_columnar(self.archivo), workbook_store.INDICE)
+        with open(ruta_indice, "w", encoding="utf-8") as f:
+            json.dump([{"hoja": "TRIMESTRE1", "archivo": "hoja_000.feather"}], f)
+        self.assertIsNone(workbook_store.cargar_copia_columnar(self.archivo))
+
+
+class ValidacionEncabezadosTests(TestCase):
+    """
+    La validación previa rechaza libros sin las columnas requeridas antes de
+    parsearlos o guardar nada.
+    """
+
+    def libro_sin_columnas(self):
+        from openpyxl import Workbook
+
+        libro = Workbook()
+        libro.active.title = "TRIMESTRE1"
+        libro.active.append(["APELLIDOS/NOMBRES", "Aporte Individual", "Aporte Grupal", "Proyecto", "Examen",
+                             "Cualitativa", "Comportamiento", "Falta Justificada"])
+        libro.create_sheet("TRIMESTRE2").append(["APELLIDOS/NOMBRES"])
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as f:
+            libro.save(f.name)
+            return f.read()
+
+    def test_informa_todos_los_problemas(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "libro.xlsx")
+            escribir_libro_sintetico(ruta, 5, 2)
+            self.assertEqual(validar_encabezados(ruta), [])
+
+        problemas = validar_encabezados(SimpleUploadedFile("malo.xlsx", self.libro_sin_columnas()))
+        self.assertEqual(len(problemas), 2)
+        self.assertIn("Nota Trimemestre", problemas[0])
+        self.assertIn("Falta Injustificada", problemas[0])
+        self.assertIn("Hoja 'TRIMESTRE2'", problemas[1])
+
+    def test_upload_rechaza_sin_escribir_en_bd(self):
+        usuario = User.objects.create_user("docente", password="clave")
+        self.client.force_login(usuario)
+
+        respuesta = self.client.post("/dashboard/upload/", {
+            "file": SimpleUploadedFile("malo.xlsx", self.libro_sin_columnas()),
+        })
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(len(respuesta.json()["detalles"]), 2)
+
+        respuesta = self.client.post("/dashboard/upload/", {
+            "file": SimpleUploadedFile("texto.xlsx", b"no es un excel"),
+        })
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(ArchivoNotas.objects.exists())
+
+
+class ListarArchivosTests(TestCase):
+    """
+    listar_archivos pagina por cursor con un número fijo de consultas.
+    """
+
+    def test_paginas_por_cursor(self):
+        usuario = User.objects.create_user("docente", password="clave")
+        for i in range(5):
+            archivo = ArchivoNotas.objects.create(usuario=usuario, nombre=f"{i}.xlsx", archivo="uploads/x.xlsx")
+            archivo.estudiantes.create(nombre="Ana")
+        self.client.force_login(usuario)
+
+        ids, cursor = [], None
+        while True:
+            parametros = {"limite": 2, **({"cursor": cursor} if cursor else {})}
+            with self.assertNumQueries(3):  # sesión, usuario y la página
+                datos = self.client.get("/dashboard/mis-archivos/", parametros).json()
+            ids += [archivo["id"] for archivo in datos["archivos"]]
+            self.assertTrue(all(archivo["num_estudiantes"] == 1 for archivo in datos["archivos"]))
+            cursor = datos["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(ids, list(ArchivoNotas.objects.order_by("-fecha_subida", "-id").values_list("id", flat=True)))
+        self.assertEqual(self.client.get("/dashboard/mis-archivos/", {"cursor": "x"}).status_code, 400)
+
+
+# Caché en memoria por test: las versiones y métricas no se comparten con otras ejecuciones
+CACHE_LOCAL = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class HistorialReportesTests(TestCase):
+    """
+    get_reportes pagina por cursor, filtra y responde 304 sin consultar la BD
+    mientras los reportes del usuario no cambien.
+    """
+
+    def setUp(self):
+        self.usuario = User.objects.create_user("docente", password="clave")
+        self.archivo = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        for i in range(3):
+            self.crear_reporte("grupal")
+        self.crear_reporte("individual", estudiante="Ana")
+        self.client.force_login(self.usuario)
+
+    def crear_reporte(self, tipo, estudiante=None):
+        return ReporteGenerado.objects.create(
+            usuario=self.usuario, archivo=self.archivo, tipo=tipo, estudiante=estudiante,
+            descripcion=tipo, pdf_file="reportes/x.pdf", json_data={}, narrativa=""
+        )
+
+    def test_filtros_y_cursor(self):
+        datos = self.client.get("/dashboard/get-reportes/", {"tipo": "grupal", "limite": 2}).json()
+        self.assertEqual(len(datos["reportes"]), 2)
+        siguiente = self.client.get(
+            "/dashboard/get-reportes/", {"tipo": "grupal", "limite": 2, "cursor": datos["next_cursor"]}
+        ).json()
+        self.assertEqual(len(siguiente["reportes"]), 1)
+        self.assertIsNone(siguiente["next_cursor"])
+
+        datos = self.client.get("/dashboard/get-reportes/", {"estudiante": "Ana"}).json()
+        self.assertEqual([r["tipo"] for r in datos["reportes"]], ["individual"])
+        self.assertEqual(self.client.get("/dashboard/get-reportes/", {"desde": "ayer"}).status_code, 400)
+
+    def test_parcial_conserva_filtros(self):
+        ReporteGenerado.objects.filter(tipo="grupal").update(descripcion='<img src=x onerror="alert(1)">')
+        respuesta = self.client.get(
+            "/dashboard/history/", {"tipo": "grupal", "limite": 2}, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        self.assertContains(respuesta, 'data-filtros="tipo=grupal&amp;limite=2"')
+        self.assertNotContains(respuesta, "<img")
+
+        # Las páginas siguientes siguen filtradas
+        cursor = respuesta.context["next_cursor"]
+        datos = self.client.get("/dashboard/get-reportes/", {"tipo": "grupal", "limite": 2, "cursor": cursor}).json()
+        self.assertEqual({r["tipo"] for r in datos["reportes"]}, {"grupal"})
+
+    def test_get_condicional(self):
+        respuesta = self.client.get("/dashboard/get-reportes/")
+        etag = respuesta["ETag"]
+
+        with self.assertNumQueries(2):  # sesión y usuario; ninguna de reportes
+            respuesta = self.client.get("/dashboard/get-reportes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_reporte("grupal")
+        respuesta = self.client.get("/dashboard/get-reportes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()["reportes"]), 5)
+
+
+class DescargasTests(TestCase):
+    """
+    Descarga por bloques con Range/ETag y ZIP generado al vuelo.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+
+        self.usuario = User.objects.create_user("docente", password="clave")
+        archivo = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        self.contenido = os.urandom(100_000)
+        self.reportes = []
+        for i in range(2):
+            reporte = ReporteGenerado.objects.create(
+                usuario=self.usuario, archivo=archivo, tipo="grupal", descripcion="d", json_data={}, narrativa=""
+            )
+            reporte.pdf_file.save(f"r{i}.pdf", ContentFile(self.contenido))
+            self.reportes.append(reporte)
+        self.client.force_login(self.usuario)
+
+    def test_range_y_etag(self):
+        url = f"/dashboard/descargar-reporte/{self.reportes[0].id}/"
+        completo = self.client.get(url)
+        self.assertEqual(b"".join(completo.streaming_content), self.contenido)
+        self.assertEqual(completo["Content-Length"], str(len(self.contenido)))
+
+        parcial = self.client.get(url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(parcial["Content-Range"], f"bytes 100-199/{len(self.contenido)}")
+        self.assertEqual(b"".join(parcial.streaming_content), self.contenido[100:200])
+
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=999999-").status_code, 416)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=completo["ETag"]).status_code, 304)
+
+    def test_nombre_con_comillas(self):
+        peticion = RequestFactory().get("/")
+        respuesta = respuesta_descarga(peticion, self.reportes[0].pdf_file, nombre='Reporte "Ana" \\ Muñoz.pdf')
+        respuesta.close()
+        self.assertEqual(
+            respuesta["Content-Disposition"],
+            'attachment; filename*=utf-8\'\'Reporte%20%22Ana%22%20%5C%20Mu%C3%B1oz.pdf',
+        )
+        respuesta = respuesta_descarga(peticion, self.reportes[0].pdf_file, nombre='a"b.pdf', en_linea=True)
+        self.assertEqual(respuesta["Content-Disposition"], 'inline; filename="a\\"b.pdf"')
+        respuesta.close()
+
+    def test_zip(self):
+        respuesta = self.client.get("/dashboard/descargar-reportes-zip/", {"ids": [r.id for r in self.reportes]})
+        with zipfile.ZipFile(io.BytesIO(b"".join(respuesta.streaming_content))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(len(zf.namelist()), 2)
+            self.assertEqual(zf.read(zf.namelist()[0]), self.contenido)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class MetricasCacheTests(TestCase):
+    """
+    Las métricas del dashboard salen del caché hasta que cambian los archivos
+    o los reportes del usuario.
+    """
+
+    def test_acierto_e_invalidacion(self):
+        usuario = User.objects.create_user("docente", password="clave")
+        archivo = ArchivoNotas.objects.create(
+            usuario=usuario, nombre="a.xlsx", archivo="uploads/a.xlsx",
+            resumen_json={"reportes_trimestrales": {"T1": {"promedio_general": 8.0}}}
+        )
+        self.client.force_login(usuario)
+
+        self.assertEqual(self.client.get("/dashboard/get-metricas/")["X-Cache"], "MISS")
+        with self.assertNumQueries(2):  # sesión y usuario
+            respuesta = self.client.get("/dashboard/get-metricas/")
+        self.assertEqual(respuesta["X-Cache"], "HIT")
+        self.assertEqual(respuesta.json()["cards"]["ultimo_reporte"], "Sin reportes")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ReporteGenerado.objects.create(
+                usuario=usuario, archivo=archivo, tipo="grupal", descripcion="d",
+                pdf_file="reportes/x.pdf", json_data={}, narrativa=""
+            )
+        respuesta = self.client.get("/dashboard/get-metricas/")
+        self.assertEqual(respuesta["X-Cache"], "MISS")
+        self.assertNotEqual(respuesta.json()["cards"]["ultimo_reporte"], "Sin reportes")
+
+
+    def test_guardar_resumen_invalida_sin_leer_el_archivo(self):
+        usuario = User.objects.create_user("docente", password="clave")
+        resumen = {"reportes_trimestrales": {"T1": {"promedio_general": 8.0}}}
+        archivo = ArchivoNotas.objects.create(usuario=usuario, nombre="a.xlsx", archivo="uploads/a.xlsx", resumen_json=resumen)
+        for accion in ("crear", "actualizar"):
+            with self.subTest(accion), CaptureQueriesContext(connection) as consultas, \
+                    self.captureOnCommitCallbacks() as callbacks:
+                MetricsService.save_summary(archivo, resumen)
+            self.assertEqual(len(callbacks), 1)
+            lecturas = [q["sql"] for q in consultas if 'FROM "myapp_archivonotas"' in q["sql"]]
+            # Al crear no se consulta; al actualizar solo se lee el usuario
+            self.assertEqual(len(lecturas), 0 if accion == "crear" else 1)
+            self.assertNotIn("resumen_json", "".join(lecturas))
+
+    def test_sin_resumen_no_escribe(self):
+        # Archivo anterior a DashboardSummary: se calcula en memoria
+        usuario = User.objects.create_user("docente", password="clave")
+        archivo = ArchivoNotas.objects.create(
+            usuario=usuario, nombre="a.xlsx", archivo="uploads/a.xlsx",
+            resumen_json={"reportes_trimestrales": {"T1": {"promedio_general": 8.0}}}
+        )
+        self.client.force_login(usuario)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            respuesta = self.client.get("/dashboard/get-metricas/")
+        self.assertEqual(respuesta.json()["grafica_barras"], {"labels": ["T1"], "valores": [8.0]})
+        self.assertEqual(callbacks, [])
+        self.assertFalse(DashboardSummary.objects.filter(archivo=archivo).exists())
+        self.assertEqual(self.client.get("/dashboard/get-metricas/")["X-Cache"], "HIT")
+
+@override_settings(CACHES=CACHE_LOCAL)
+class BootstrapDashboardTests(TestCase):
+    """
+    /dashboard/bootstrap/ devuelve archivo, estudiantes y métricas con un
+    número fijo de consultas y sin escribir en la base de datos.
+    """
+
+    def setUp(self):
+        # El caché en memoria se comparte entre tests y los ids de usuario se repiten
+        cache.clear()
+
+    def test_consultas_fijas(self):
+        usuario = User.objects.create_user("docente", password="clave")
+        anterior = ArchivoNotas.objects.create(usuario=usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        archivo = ArchivoNotas.objects.create(
+            usuario=usuario, nombre="b.xlsx", archivo="uploads/b.xlsx",
+            resumen_json={"reportes_trimestrales": {"T1": {"promedio_general": 8.0}}}
+        )
+        for nombre in ["Ana", "Luis"]:
+            archivo.estudiantes.create(nombre=nombre)
+        for i in range(25):
+            ReporteGenerado.objects.create(
+                usuario=usuario, archivo=archivo if i % 2 else anterior, tipo="grupal", descripcion=f"{i}",
+                pdf_file=f"reportes/{i}.pdf", json_data={}, narrativa=""
+            )
+        MetricsService.save_summary(archivo, archivo.resumen_json)
+        self.client.force_login(usuario)
+
+        # sesión, usuario, archivo con resumen, estudiantes y último reporte grupal
+        with self.assertNumQueries(5):
+            respuesta = self.client.get("/dashboard/bootstrap/")
+        datos = respuesta.json()
+        self.assertEqual(respuesta["X-Cache"], "MISS")
+        self.assertEqual(datos["archivo"]["id"], archivo.id)
+        self.assertEqual(datos["archivo"]["estudiantes"], ["Ana", "Luis"])
+        self.assertTrue(datos["archivo"]["tiene_datos"])
+        self.assertFalse(datos["metricas"]["sin_datos"])
+        self.assertEqual(set(datos), {"archivo", "metricas"})
+
+        # Con las métricas en caché no se consulta el último reporte
+        with self.assertNumQueries(4):
+            respuesta = self.client.get("/dashboard/bootstrap/")
+        self.assertEqual(respuesta["X-Cache"], "HIT")
+
+    def test_sin_archivos(self):
+        usuario = User.objects.create_user("docente", password="clave")
+        self.client.force_login(usuario)
+        datos = self.client.get("/dashboard/bootstrap/").json()
+        self.assertIsNone(datos["archivo"])
+        self.assertTrue(datos["metricas"]["sin_datos"])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ArchivoActivoTests(TestCase):
+    """
+    Un solo archivo activo por usuario; activar es una operación atómica y
+    las lecturas no escriben.
+    """
+
+    def setUp(self):
+        self.usuario = User.objects.create_user("docente", password="clave")
+        self.a = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        self.b = ArchivoNotas.objects.create(usuario=self.usuario, nombre="b.xlsx", archivo="uploads/b.xlsx")
+
+    def activos(self):
+        return list(ArchivoNotas.objects.filter(usuario=self.usuario, activo=True).values_list("id", flat=True))
+
+    def test_activar_y_subir(self):
+        self.assertEqual(self.activos(), [self.b.id])
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(f"/dashboard/activar-archivo/{self.a.id}/").status_code, 200)
+        self.assertEqual(self.activos(), [self.a.id])
+
+        # Otro usuario no se ve afectado
+        otro = User.objects.create_user("otro", password="clave")
+        ArchivoNotas.objects.create(usuario=otro, nombre="c.xlsx", archivo="uploads/c.xlsx")
+        self.assertEqual(self.activos(), [self.a.id])
+
+    def test_indice_unico_parcial(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ArchivoNotas.objects.filter(pk=self.a.pk).update(activo=True)
+
+    def test_guardar_sin_cambiar_activo_no_desactiva(self):
+        archivo = ArchivoNotas.objects.get(pk=self.b.pk)
+        archivo.resumen_json = {"reportes_trimestrales": {}}
+        with self.assertNumQueries(1):  # solo el UPDATE del propio archivo
+            archivo.save()
+
+    def test_lecturas_sin_escrituras(self):
+        ArchivoNotas.objects.filter(usuario=self.usuario).update(activo=False)
+        self.client.force_login(self.usuario)
+
+        for url in ["/dashboard/get-archivo-activo/", "/dashboard/get-metricas/", "/dashboard/bootstrap/"]:
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            escrituras = [q["sql"] for q in consultas if not q["sql"].lstrip().upper().startswith("SELECT")]
+            self.assertEqual(escrituras, [], url)
+
+        self.assertEqual(self.client.get("/dashboard/get-archivo-activo/").json()["archivo"]["id"], self.b.id)
+        self.assertEqual(self.activos(), [])
+
+    def test_eliminar_activo_activa_el_siguiente(self):
+        self.client.force_login(self.usuario)
+        self.client.get(f"/dashboard/eliminar-archivo/{self.b.id}/")
+        self.assertEqual(self.activos(), [self.a.id])
+
+
+class PlanesConsultaTests(TestCase):
+    """
+    Las consultas frecuentes del dashboard y del historial usan índices
+    (EXPLAIN en SQLite o PostgreSQL) con muchas filas en las tablas.
+    """
+
+    USUARIOS = 20
+    ARCHIVOS_POR_USUARIO = 100
+    REPORTES_POR_USUARIO = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        usuarios = User.objects.bulk_create(
+            [User(username=f"docente{i}") for i in range(cls.USUARIOS)]
+        )
+        archivos = ArchivoNotas.objects.bulk_create([
+            ArchivoNotas(usuario=usuario, nombre=f"{i}.xlsx", archivo=f"uploads/{i}.xlsx", activo=i == 0)
+            for usuario in usuarios
+            for i in range(cls.ARCHIVOS_POR_USUARIO)
+        ])
+        ReporteGenerado.objects.bulk_create([
+            ReporteGenerado(
+                usuario=archivo.usuario, archivo=archivo, tipo="grupal" if i % 5 == 0 else "individual",
+                estudiante=f"Estudiante {i}", descripcion="d", pdf_file=f"reportes/{i}.pdf",
+                json_data={}, narrativa=""
+            )
+            for archivo in archivos[::cls.ARCHIVOS_POR_USUARIO // 10]
+            for i in range(cls.REPORTES_POR_USUARIO // 10)
+        ], batch_size=1000)
+        cls.usuario = usuarios[cls.USUARIOS // 2]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsaIndice(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == "sqlite":
+            self.assertIn("USING", plan)
+            # SCAN sin índice recorre toda la tabla
+            self.assertNotRegex(plan, r"(?m)\bSCAN myapp_\w+$")
+            # El orden sale del índice, sin ordenar en una tabla temporal
+            self.assertNotIn("TEMP B-TREE", plan)
+        elif connection.vendor == "postgresql":
+            self.assertIn("Index", plan)
+            self.assertNotIn("Seq Scan", plan)
+            self.assertNotRegex(plan, r"(?m)^\s*(->\s*)?Sort ")
+        else:
+            self.skipTest(f"EXPLAIN no verificado para {connection.vendor}")
+
+    def test_archivo_activo(self):
+        # MetricsService.get_active_file / get_archivo_activo / bootstrap
+        self.assertUsaIndice(
+            ArchivoNotas.objects.filter(usuario=self.usuario).order_by("-activo", "-fecha_subida", "-id")[:1]
+        )
+        # Desactivación del archivo anterior (índice único parcial)
+        self.assertUsaIndice(ArchivoNotas.objects.filter(usuario=self.usuario, activo=True).order_by())
+
+    def test_listado_archivos(self):
+        self.assertUsaIndice(
+            ArchivoNotas.objects.filter(usuario=self.usuario).order_by("-fecha_subida", "-id")[:21]
+        )
+
+    def test_ultimo_reporte_grupal(self):
+        self.assertUsaIndice(
+            ReporteGenerado.objects.filter(usuario=self.usuario, tipo="grupal")
+            .order_by("-fecha_generacion", "-id").values_list("fecha_generacion", flat=True)[:1]
+        )
+
+    def test_historial(self):
+        self.assertUsaIndice(
+            ReporteGenerado.objects.filter(usuario=self.usuario).order_by("-fecha_generacion", "-id")[:21]
+        )
+
+
+class PlantillaPDFTests(SimpleTestCase):
+    """
+    Los PDF de la plantilla de fuentes son iguales a los de add_font.
+    """
+
+    def test_mismo_pdf_que_add_font(self):
+        plantilla = obtener_plantilla()
+        self.assertEqual(plantilla.familia, "DejaVu")
+
+        narrativa = NARRATIVA + "\nΣύνοψη: Ελληνικά"
+        self.assertEqual(plantilla.elegir_juego(NARRATIVA), "latino")
+        self.assertEqual(plantilla.elegir_juego(narrativa), "completo")
+
+        # Dos documentos seguidos: las copias no comparten el estado del anterior
+        for _ in range(2):
+            self.assertEqual(
+                renderizar(lambda: plantilla.nuevo_documento(juego="completo"), narrativa),
+                renderizar(documento_sin_cache, narrativa),
+            )
+            self.assertEqual(
+                sin_fuentes_incrustadas(renderizar(lambda: plantilla.nuevo_documento(juego="latino"), NARRATIVA, False)),
+                sin_fuentes_incrustadas(renderizar(documento_sin_cache, NARRATIVA, False)),
+            )
+
+
+class NarrativaASTTests(TestCase):
+    """
+    La narrativa se analiza una vez, se guarda con el reporte y sirve para
+    volver a renderizar los PDF en lote.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.usuario = User.objects.create_user("docente", password="clave")
+        self.archivo = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+
+    def test_parseo(self):
+        documento = parsear_narrativa("Título", "## Resumen\nTexto:- uno\n* **Aprobados:** 27\n\nNota **final** ok")
+        self.assertEqual(documento["bloques"], [
+            {"tipo": "h2", "texto": "Resumen"},
+            {"tipo": "parrafo", "texto": "Texto:"},
+            {"tipo": "vineta", "runs": [["uno", False]]},
+            {"tipo": "vineta", "runs": [["Aprobados:", True], [" 27", False]]},
+            {"tipo": "espacio"},
+            {"tipo": "runs", "runs": [["Nota ", False], ["final", True], [" ok", False]]},
+        ])
+
+    def test_guardar_y_rerenderizar(self):
+        reporte = ReportService.guardar_reporte(
+            self.usuario, self.archivo, "grupal", "", "Reporte Grupal", "d", {}, NARRATIVA
+        )
+        self.assertEqual(reporte.narrativa_ast, parsear_narrativa("Reporte Grupal", NARRATIVA))
+
+        # Reporte anterior al AST: se analiza al renderizar y se guarda
+        anterior = ReporteGenerado.objects.create(
+            usuario=self.usuario, archivo=self.archivo, tipo="individual", estudiante="Ana", descripcion="d",
+            pdf_file="reportes/anterior.pdf", json_data={}, narrativa=NARRATIVA
+        )
+        for r in (reporte, anterior):
+            if os.path.exists(r.pdf_file.path):
+                os.remove(r.pdf_file.path)
+
+        renderizados, errores = ReportService.rerenderizar_reportes(ReporteGenerado.objects.all())
+        self.assertEqual((renderizados, errores), (2, []))
+        for r in (reporte, anterior):
+            with open(r.pdf_file.path, "rb") as f:
+                self.assertEqual(f.read(5), b"%PDF-")
+        anterior.refresh_from_db()
+        self.assertEqual(anterior.narrativa_ast["titulo"], "Reporte Individual - Ana")
+
+
+def leer_eventos_sse(respuesta):
+    """
+    Lista de (evento, datos) de una respuesta text/event-stream.
+    """
+    contenido = b"".join(respuesta.streaming_content).decode("utf-8")
+    eventos = []
+    for bloque in contenido.strip().split("\n\n"):
+        lineas = dict(linea.split(": ", 1) for linea in bloque.split("\n"))
+        eventos.append((lineas["event"], json.loads(lineas["data"])))
+    return eventos
+
+
+@override_settings(LLM_BACKEND="stub", CACHES=CACHE_LOCAL)
+class ProcesarReporteTests(TestCase):
+    """
+    Respuestas de procesar_reporte con el backend stub.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.usuario = User.objects.create_user("docente", password="clave")
+        self.client.force_login(self.usuario)
+        self.archivo = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        self.datos = {
+            "archivo_id": self.archivo.id, "tipo": "individual", "estudiante": "Ana",
+            "json_data": json.dumps({"nombre": "Ana", "trimestres": {}}),
+        }
+
+    def test_respuesta_ligera(self):
+        respuesta = self.client.post("/dashboard/procesar_reporte/", self.datos)
+        self.assertEqual(respuesta.status_code, 200)
+        reporte = ReporteGenerado.objects.get()
+        self.assertEqual(respuesta.json(), {
+            "ok": True, "reporte_id": reporte.id, "url_descarga": f"/dashboard/descargar-reporte/{reporte.id}/",
+        })
+
+        respuesta = self.client.post("/dashboard/procesar_reporte/", {**self.datos, "incluir_narrativa": "1"})
+        self.assertEqual(respuesta.json()["narrativa"], reporte.narrativa)
+
+    def test_formato_completo(self):
+        respuesta = self.client.post("/dashboard/procesar_reporte/", {**self.datos, "formato": "completo"})
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        reporte = ReporteGenerado.objects.get(id=datos["reporte_id"])
+        self.assertEqual(set(datos), {"ok", "json", "narrativa", "pdf", "reporte_id"})
+        self.assertEqual(datos["json"], json.loads(self.datos["json_data"]))
+        self.assertEqual(datos["narrativa"], reporte.narrativa)
+        with reporte.pdf_file.open("rb") as f:
+            self.assertEqual(base64.b64decode(datos["pdf"]), f.read())
+
+    def test_stream(self):
+        respuesta = self.client.post("/dashboard/procesar_reporte/", {**self.datos, "stream": "1"})
+        self.assertEqual(respuesta["Content-Type"], "text/event-stream")
+        eventos = leer_eventos_sse(respuesta)
+
+        nombres = [evento for evento, _ in eventos]
+        self.assertEqual(nombres[-2:], ["estado", "fin"])
+        self.assertTrue(nombres[:-2] and set(nombres[:-2]) == {"fragmento"})
+        self.assertEqual(eventos[-2][1], {"estado": "renderizando_pdf"})
+
+        fin = eventos[-1][1]
+        reporte = ReporteGenerado.objects.get(id=fin["reporte_id"])
+        self.assertEqual(fin, {"ok": True, "reporte_id": reporte.id, "url_descarga": f"/dashboard/descargar-reporte/{reporte.id}/"})
+        self.assertEqual("".join(datos["texto"] for evento, datos in eventos[:-2]), reporte.narrativa)
+        with reporte.pdf_file.open("rb") as f:
+            self.assertEqual(f.read(5), b"%PDF-")
+
+        # La segunda vez la narrativa sale de la caché en un solo fragmento
+        eventos = leer_eventos_sse(self.client.post("/dashboard/procesar_reporte/", {**self.datos, "stream": "1"}))
+        self.assertEqual([evento for evento, _ in eventos], ["fragmento", "estado", "fin"])
+        self.assertEqual(eventos[0][1]["texto"], reporte.narrativa)
+
+
+class ClienteVersiones:
+    """
+    Cliente del modelo que responde una narrativa distinta en cada llamada.
+    """
+
+    modelo = "m"
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def chat(self, model, messages, options=None):
+        self.llamadas += 1
+        return {"message": {"content": f"versión {self.llamadas}"}}
+
+
+@override_settings(CACHES=CACHE_LOCAL, NARRATIVA_CACHE_MAX_ENTRADAS=2, NARRATIVA_CACHE_MAX_DIAS=30)
+class NarrativaCacheTests(TestCase):
+    """
+    Caché de narrativas: aciertos, regeneración forzada y expulsión.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = ClienteVersiones()
+        self.enterContext(mock.patch.object(ReportService, "_cliente_ollama", return_value=self.cliente))
+
+    def test_acierto_y_fallo(self):
+        self.assertEqual(ReportService.generar_narrativa("prompt", {}), "versión 1")
+        self.assertEqual(ReportService.generar_narrativa("prompt", {}), "versión 1")
+        self.assertEqual(ReportService.generar_narrativa("otro", {}), "versión 2")
+        self.assertEqual(self.cliente.llamadas, 2)
+        self.assertEqual(NarrativeCache.estadisticas(), {"aciertos": 1, "fallos": 2})
+
+        clave = NarrativeCache.calcular_clave("prompt", "m", OLLAMA_OPTIONS)
+        self.assertEqual(NarrativaCache.objects.get(clave=clave).aciertos, 1)
+        self.assertNotEqual(clave, NarrativeCache.calcular_clave("prompt", "otro-modelo", OLLAMA_OPTIONS))
+
+    def test_forzar_regenera_y_renueva_la_fecha(self):
+        ReportService.generar_narrativa("prompt", {})
+        antes = timezone.now() - timedelta(days=29)
+        NarrativaCache.objects.update(fecha_creacion=antes)
+
+        self.assertEqual(ReportService.generar_narrativa("prompt", {}, forzar=True), "versión 2")
+        entrada = NarrativaCache.objects.get()
+        self.assertEqual(entrada.narrativa, "versión 2")
+        self.assertGreater(entrada.fecha_creacion, antes)
+        self.assertEqual(ReportService.generar_narrativa("prompt", {}), "versión 2")
+
+    def test_expulsion(self):
+        NarrativeCache.guardar("vieja", "m", "a")
+        NarrativaCache.objects.update(fecha_creacion=timezone.now() - timedelta(days=31))
+        # Vencida: no se devuelve y se elimina
+        self.assertIsNone(NarrativeCache.obtener("vieja"))
+        self.assertFalse(NarrativaCache.objects.exists())
+
+        for minutos, clave in [(3, "a"), (2, "b"), (1, "c")]:
+            NarrativeCache.guardar(clave, "m", clave)
+            NarrativaCache.objects.filter(clave=clave).update(ultimo_acceso=timezone.now() - timedelta(minutes=minutos))
+        # La expulsión ya corrió en este intervalo: no se repite en cada guardado
+        self.assertEqual(NarrativaCache.objects.count(), 3)
+
+        NarrativeCache.obtener("a")
+        cache.delete(NarrativeCache.MARCA_EXPULSION)
+        NarrativeCache.guardar("d", "m", "d")
+        # Se conservan las 2 usadas más recientemente
+        self.assertEqual(sorted(NarrativaCache.objects.values_list("clave", flat=True)), ["a", "d"])
+
+
+@override_settings(LLM_BACKEND="stub", CACHES=CACHE_LOCAL, TRABAJOS_TIEMPO_MAXIMO=600)
+class ColaReportesTests(TestCase):
+    """
+    Cola de reportes: encolar, consultar el estado y reclamar trabajos.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.usuario = User.objects.create_user("docente", password="clave")
+        self.client.force_login(self.usuario)
+        self.archivo = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+
+    def encolar(self, **datos):
+        return self.client.post("/dashboard/encolar-reporte/", {"archivo_id": self.archivo.id, **datos})
+
+    def crear_trabajo(self, **campos):
+        return TrabajoReporte.objects.create(usuario=self.usuario, archivo=self.archivo, tipo="grupal", **campos)
+
+    def test_encolar_y_estado(self):
+        respuesta = self.encolar(
+            tipo="individual", estudiante="Ana", json_data=json.dumps({"nombre": "Ana", "trimestres": {}})
+        )
+        self.assertEqual(respuesta.status_code, 202)
+        url_estado = f"/dashboard/estado-reporte/{respuesta.json()['trabajo_id']}/"
+        estado = self.client.get(url_estado).json()
+        self.assertEqual((estado["estado"], estado["terminado"], estado["reporte_id"]), ("en_cola", False, None))
+
+        trabajo = ProcesarTrabajos.reclamar_siguiente()
+        self.assertEqual(trabajo.estado, TrabajoReporte.ESTADO_GENERANDO_NARRATIVA)
+        ReportService.ejecutar_trabajo(trabajo)
+        estado = self.client.get(url_estado).json()
+        self.assertEqual((estado["estado"], estado["terminado"], estado["error"]), ("completado", True, None))
+        self.assertEqual(ReporteGenerado.objects.get(id=estado["reporte_id"]).estudiante, "Ana")
+
+    def test_validaciones(self):
+        self.assertEqual(self.client.post("/dashboard/encolar-reporte/", {}).status_code, 400)
+        self.assertEqual(self.encolar(json_data="{no es json").status_code, 400)
+        self.assertEqual(self.client.get("/dashboard/encolar-reporte/").status_code, 405)
+        trabajo_id = self.encolar().json()["trabajo_id"]
+
+        self.client.force_login(User.objects.create_user("otro"))
+        self.assertEqual(self.encolar().status_code, 404)
+        self.assertEqual(self.client.get(f"/dashboard/estado-reporte/{trabajo_id}/").status_code, 404)
+
+    def test_carrera_entre_workers(self):
+        primero, segundo = self.crear_trabajo(), self.crear_trabajo()
+        reclamar = procesar_trabajos._reclamar
+        otro_worker = []
+
+        def otro_worker_primero(*args):
+            # Otro worker reclama el mismo candidato entre la lectura y el UPDATE
+            if not otro_worker:
+                otro_worker.append(None)
+                otro_worker[0] = ProcesarTrabajos.reclamar_siguiente()
+            return reclamar(*args)
+
+        with mock.patch.object(procesar_trabajos, "_reclamar", side_effect=otro_worker_primero):
+            propio = ProcesarTrabajos.reclamar_siguiente()
+        self.assertEqual((otro_worker[0].pk, propio.pk), (primero.pk, segundo.pk))
+        self.assertIsNone(ProcesarTrabajos.reclamar_siguiente())
+
+    def test_reclama_abandonados(self):
+        antes = timezone.now() - timedelta(seconds=601)
+        abandonado = self.crear_trabajo()
+        activo = self.crear_trabajo()
+        TrabajoReporte.objects.filter(pk=abandonado.pk).update(
+            estado=TrabajoReporte.ESTADO_RENDERIZANDO_PDF, fecha_actualizacion=antes
+        )
+        TrabajoReporte.objects.filter(pk=activo.pk).update(estado=TrabajoReporte.ESTADO_GENERANDO_NARRATIVA)
+
+        with self.assertLogs("myapp.management.commands.procesar_trabajos", "WARNING") as logs:
+            trabajo = ProcesarTrabajos.reclamar_siguiente()
+        self.assertIn(f"TrabajoReporte {abandonado.pk} abandonado en 'renderizando_pdf'", logs.output[0])
+        self.assertEqual(trabajo.pk, abandonado.pk)
+        self.assertEqual(trabajo.estado, TrabajoReporte.ESTADO_GENERANDO_NARRATIVA)
+        self.assertGreater(trabajo.fecha_actualizacion, antes)
+        self.assertIsNone(ProcesarTrabajos.reclamar_siguiente())
+
+        lote = LoteReportes.objects.create(usuario=self.usuario, archivo=self.archivo)
+        pendiente = self.crear_trabajo(lote=lote, estado=TrabajoReporte.ESTADO_GENERANDO_NARRATIVA)
+        terminado = self.crear_trabajo(lote=lote, estado=TrabajoReporte.ESTADO_COMPLETADO)
+        LoteReportes.objects.filter(pk=lote.pk).update(estado=LoteReportes.ESTADO_PROCESANDO)
+        self.assertIsNone(ProcesarTrabajos.reclamar_lote())
+
+        LoteReportes.objects.filter(pk=lote.pk).update(fecha_actualizacion=antes)
+        self.assertEqual(ProcesarTrabajos.reclamar_lote().pk, lote.pk)
+        estados = dict(lote.trabajos.values_list("id", "estado"))
+        self.assertEqual(estados, {pendiente.pk: "en_cola", terminado.pk: "completado"})
+
+
+class LoteReportesTests(TestCase):
+    """
+    Reportes individuales de toda la clase: lote, progreso y ZIP.
+    """
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name, OLLAMA_NUM_PARALLEL=3))
+        self.addCleanup(self.media.cleanup)
+        self.usuario = User.objects.create_user("docente", password="clave")
+        self.client.force_login(self.usuario)
+        self.archivo = ArchivoNotas.objects.create(usuario=self.usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        self.nombres = ["Ana", "Luis", "Marta", "Pedro"]
+        Estudiante.objects.bulk_create([
+            Estudiante(archivo=self.archivo, nombre=nombre, reporte_json={"nombre": nombre}) for nombre in self.nombres
+        ])
+
+    def crear_lote(self, **datos):
+        return self.client.post("/dashboard/generar-reportes-lote/", {"archivo_id": self.archivo.id, **datos})
+
+    def test_lote_completo(self):
+        respuesta = self.crear_lote()
+        self.assertEqual(respuesta.status_code, 202)
+        lote = LoteReportes.objects.get(id=respuesta.json()["lote_id"])
+        self.assertEqual(sorted(lote.trabajos.values_list("estudiante", flat=True)), sorted(self.nombres))
+
+        estado = self.client.get(respuesta.json()["url_estado"]).json()
+        self.assertEqual((estado["terminado"], estado["pendientes"]), (False, 4))
+
+        ReportService.ejecutar_lote(lote, cliente=ClienteSimulado(0, 3))
+        estado = self.client.get(respuesta.json()["url_estado"]).json()
+        self.assertEqual((estado["estado"], estado["completados"], estado["errores"]), ("completado", 4, 0))
+        self.assertEqual([r["estudiante"] for r in estado["reportes"]], self.nombres)
+        # Las narrativas quedan en caché con el modelo del cliente recibido
+        self.assertEqual(set(NarrativaCache.objects.values_list("modelo", flat=True)), {"simulado"})
+
+        zip_respuesta = self.client.get(respuesta.json()["url_zip"])
+        with zipfile.ZipFile(io.BytesIO(b"".join(zip_respuesta.streaming_content))) as zf:
+            self.assertEqual(len(zf.namelist()), 4)
+            self.assertIsNone(zf.testzip())
+
+    def test_subconjunto_y_validacion(self):
+        respuesta = self.crear_lote(estudiantes=["Luis", "Ana"])
+        lote = LoteReportes.objects.get(id=respuesta.json()["lote_id"])
+        self.assertEqual(list(lote.trabajos.order_by("id").values_list("estudiante", flat=True)), ["Luis", "Ana"])
+
+        self.assertEqual(self.crear_lote(estudiantes=["Nadie"]).status_code, 400)
+        with override_settings(LOTE_MAX_ESTUDIANTES=3):
+            self.assertEqual(self.crear_lote().status_code, 400)
+            self.assertEqual(self.crear_lote(estudiantes=["Ana", "Luis", "Marta"]).status_code, 202)
+        otro = User.objects.create_user("otro")
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(f"/dashboard/estado-lote/{lote.id}/").status_code, 404)
+
+    def test_error_del_modelo_no_detiene_el_lote(self):
+        class ClienteConFallos(ClienteSimulado):
+            def chat(self, model, messages, options=None):
+                if "Marta" in messages[0]["content"]:
+                    raise RuntimeError("fallo simulado")
+                return super().chat(model, messages, options)
+
+        lote = LoteReportes.objects.get(id=self.crear_lote().json()["lote_id"])
+        ReportService.ejecutar_lote(lote, cliente=ClienteConFallos(0, 3))
+        reporte = ReporteGenerado.objects.get(estudiante="Marta")
+        self.assertIn("fallo simulado", reporte.narrativa)
+        self.assertEqual(ReporteGenerado.objects.filter(trabajos__lote=lote).count(), 4)
+
+
+class OllamaFalso:
+    """
+    Sustituye a ollama.Client: cuenta las llamadas y lanza los errores de la cola.
+    """
+
+    def __init__(self, errores=()):
+        self.errores = list(errores)
+        self.llamadas = 0
+
+    def _responder(self):
+        self.llamadas += 1
+        if self.errores:
+            error = self.errores.pop(0)
+            if error:
+                raise error
+
+    def list(self):
+        self._responder()
+        return {"models": []}
+
+    def chat(self, model, messages, options=None, stream=False):
+        self._responder()
+        if stream:
+            return iter([{"message": {"content": "ok"}}])
+        return {"message": {"content": "ok"}}
+
+
+@override_settings(OLLAMA_SALUD_TTL=60, OLLAMA_FALLOS_PARA_ABRIR=2, OLLAMA_ESPERA_REINTENTO=60)
+class LLMClientTests(SimpleTestCase):
+    """
+    Salud en caché y circuit breaker del cliente de Ollama.
+    """
+
+    def crear(self, errores_chat=(), errores_sonda=()):
+        self.chat, self.sonda = OllamaFalso(errores_chat), OllamaFalso(errores_sonda)
+        return LLMClient(OllamaBackend(modelo="m", cliente=self.chat, sonda=self.sonda))
+
+    def test_salud_en_cache(self):
+        cliente = self.crear()
+        for _ in range(3):
+            cliente.chat(model="m", messages=[])
+        self.assertEqual((self.sonda.llamadas, self.chat.llamadas), (1, 3))
+
+    def test_circuito_abre_y_se_recupera(self):
+        cliente = self.crear(errores_chat=[ConnectionError("caído"), ConnectionError("caído")])
+        with self.assertLogs("myapp.services.llm_client", "WARNING") as logs:
+            for _ in range(2):
+                with self.assertRaises(ConnectionError):
+                    cliente.chat(model="m", messages=[])
+        self.assertEqual(cliente.estado()["circuito"], "abierto")
+        self.assertIn("circuito abierto", logs.output[0])
+
+        # Falla de inmediato, sin llamar al servidor
+        with self.assertRaises(LLMNoDisponible):
+            cliente.chat(model="m", messages=[])
+        self.assertEqual(self.chat.llamadas, 2)
+
+        # Pasada la espera, una llamada prueba el servidor y cierra el circuito
+        cliente._abierto_hasta = time.monotonic() - 1
+        self.assertEqual(cliente.chat(model="m", messages=[])["message"]["content"], "ok")
+        self.assertEqual(cliente.estado(), {"circuito": "cerrado", "fallos_seguidos": 0})
+
+    def test_sonda_fallida_en_semiabierto_reabre(self):
+        cliente = self.crear(errores_chat=[ConnectionError(), ConnectionError()])
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                cliente.chat(model="m", messages=[])
+        cliente._abierto_hasta = time.monotonic() - 1
+        self.sonda.errores = [ConnectionError()]
+        with self.assertRaises(ConnectionError):
+            cliente.chat(model="m", messages=[])
+        self.assertEqual(cliente.estado()["circuito"], "abierto")
+
+    def test_errores_del_cliente_no_abren(self):
+        cliente = self.crear(errores_chat=[ollama.ResponseError("model not found", 404)] * 3)
+        for _ in range(3):
+            with self.assertRaises(ollama.ResponseError):
+                cliente.chat(model="m", messages=[])
+        self.assertEqual(cliente.estado()["circuito"], "cerrado")
+
+    def test_narrativa_con_circuito_abierto(self):
+        narrativa = ReportService.narrativa_de_error(LLMNoDisponible("abierto"), {"a": 1})
+        self.assertIn("no se intentó", narrativa)
+
+
+def contar_palabras(texto):
+    return len(texto.split())
+
+
+class PromptCompactoTests(SimpleTestCase):
+    """
+    Prompts con los datos compactos y dentro del presupuesto de tokens.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        hojas = generar_hojas_sinteticas(200, 3)
+        cls.grupal = json.loads(json.dumps(generar_reporte_grupal_completo(hojas)))
+
+    def test_conserva_los_datos(self):
+        compacto = compactar_grupal(self.grupal)
+        t1 = self.grupal["reportes_trimestrales"]["TRIMESTRE1"]
+        self.assertEqual(compacto["trimestres"]["TRIMESTRE1"]["mejores"]["filas"][0], [
+            t1["Buen rendimiento"][0]["APELLIDOS/NOMBRES"], t1["Buen rendimiento"][0]["Nota Trimemestre"]
+        ])
+        self.assertEqual(len(compacto["trimestres"]["TRIMESTRE1"]["faltas"]["filas"]), len(t1["faltas_por_estudiante"]))
+        self.assertEqual(serializar({"a": [3.0, 2.504]}), '{"a":[3,2.5]}')
+
+    @override_settings(PROMPT_MAX_TOKENS=2500)
+    def test_presupuesto(self):
+        with self.assertLogs("myapp.prompts", "INFO") as logs:
+            prompt = get_prompt_reporte_grupal(self.grupal)
+        self.assertLessEqual(contar_tokens(prompt), 2500)
+        self.assertIn("recortes:", logs.output[0])
+        # Lo que más aporta se conserva
+        self.assertIn(self.grupal["estatus_academico_acumulado"]["estudiantes_en_riesgo"][0], prompt)
+        self.assertIn('"mejores"', prompt)
+
+    @override_settings(PROMPT_MAX_TOKENS=50)
+    def test_presupuesto_insuficiente(self):
+        with self.assertLogs("myapp.utils.prompt_compacto", "WARNING") as logs:
+            get_prompt_reporte_grupal(self.grupal)
+        self.assertIn("sigue superando el presupuesto", logs.output[0])
+
+    @override_settings(PROMPT_MAX_TOKENS=None)
+    def test_sin_presupuesto_no_recorta(self):
+        prompt = get_prompt_reporte_grupal(self.grupal)
+        self.assertEqual(prompt.count('"faltas"'), 3)
+
+    @override_settings(PROMPT_TOKENIZADOR="myapp.tests.contar_palabras")
+    def test_tokenizador_configurable(self):
+        self.assertEqual(contar_tokens("uno dos tres"), 3)
+
+    def test_datos_desconocidos_se_envian_igual(self):
+        prompt = get_prompt_reporte_individual({"otro": [1.0, "x"]}, "Ana")
+        self.assertTrue(prompt.endswith('{"otro":[1,"x"]}'))
+
+
+class BackendsLLMTests(TestCase):
+    """
+    Backends del modelo: stub en el proceso y servidor HTTP simulado con los
+    clientes de Ollama y de OpenAI.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = crear_servidor(SimuladorLLM(tokens=80), puerto=0)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.servidor.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def test_simulador_determinista(self):
+        mensajes = [{"role": "user", "content": "Datos del grupo"}]
+        narrativa = SimuladorLLM(tokens=80).narrativa(mensajes)
+        self.assertEqual(narrativa, SimuladorLLM(tokens=80).narrativa(mensajes))
+        self.assertTrue(narrativa.startswith("## "))
+        self.assertNotEqual(narrativa, SimuladorLLM(tokens=80).narrativa([{"role": "user", "content": "otro"}]))
+
+    def test_servidor_con_ollama_y_openai(self):
+        mensajes = [{"role": "user", "content": "hola"}]
+        esperada = SimuladorLLM(tokens=80).narrativa(mensajes)
+        for backend in (OllamaBackend(host=self.url, modelo="simulado"), OpenAIBackend(url=f"{self.url}/v1", modelo="simulado")):
+            cliente = LLMClient(backend)
+            self.addCleanup(cliente.cerrar)
+            respuesta = cliente.chat(model=cliente.modelo, messages=mensajes, options={"temperature": 0.7})
+            self.assertEqual(respuesta["message"]["content"], esperada)
+            partes = list(cliente.chat(model=cliente.modelo, messages=mensajes, stream=True))
+            self.assertEqual("".join(p["message"]["content"] for p in partes), esperada)
+            self.assertTrue(partes[-1]["done"])
+
+    def test_crear_backend(self):
+        self.assertIsInstance(crear_backend("stub"), StubBackend)
+        with self.assertRaisesMessage(ValueError, "LLM_BACKEND desconocido: 'otro'"):
+            crear_backend("otro")
+        with override_settings(LLM_OPENAI_MODEL=""), self.assertRaises(ImproperlyConfigured):
+            crear_backend("openai")
+
+    @override_settings(LLM_BACKEND="stub", CACHES=CACHE_LOCAL)
+    def test_reporte_completo_con_stub(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        usuario = User.objects.create_user("docente", password="clave")
+        archivo = ArchivoNotas.objects.create(usuario=usuario, nombre="a.xlsx", archivo="uploads/a.xlsx")
+        self.client.force_login(usuario)
+
+        respuesta = self.client.post("/dashboard/procesar_reporte/", {
+            "archivo_id": archivo.id, "tipo": "individual", "estudiante": "Ana",
+            "json_data": json.dumps({"nombre": "Ana", "trimestres": {}}),
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        reporte = ReporteGenerado.objects.get(id=respuesta.json()["reporte_id"])
+        self.assertTrue(reporte.narrativa.startswith("## "))
+        with reporte.pdf_file.open("rb") as f:
+            self.assertEqual(f.read(5), b"%PDF-")
@@ -7,13 +7,22 @@ urlpatterns = [
     path("login/", views.login_view, name="login"),
     path("register/", views.register_view, name="register"),
     path('dashboard/', views.dashboard, name='inicio'),
+    path("dashboard/bootstrap/", views.bootstrap, name="bootstrap"),
     path("dashboard/upload/", views.upload_view, name="upload"),
     path('dashboard/get-estudiantes/<int:archivo_id>/', views.get_estudiantes, name='get_estudiantes'),
     path("dashboard/history/", views.history_view, name="history"),
     path("dashboard/get-reportes/", views.get_reportes, name="get_reportes"),
     path("dashboard/descargar-reporte/<int:reporte_id>/", views.descargar_reporte, name="descargar_reporte"),
+    path("dashboard/descargar-reportes-zip/", views.descargar_reportes_zip, name="descargar_reportes_zip"),
     path("logout/", views.logout_view, name="logout"),
     path("dashboard/procesar_reporte/", views.procesar_reporte, name="procesar_reporte"),
+    # Cola de reportes (procesada por el comando procesar_trabajos)
+    path("dashboard/encolar-reporte/", views.encolar_reporte, name="encolar_reporte"),
+    path("dashboard/estado-reporte/<int:trabajo_id>/", views.estado_reporte, name="estado_reporte"),
+    # Reportes individuales de toda la clase (también los procesa procesar_trabajos)
+    path("dashboard/generar-reportes-lote/", views.generar_reportes_lote, name="generar_reportes_lote"),
+    path("dashboard/estado-lote/<int:lote_id>/", views.estado_lote, name="estado_lote"),
+    path("dashboard/descargar-lote-zip/<int:lote_id>/", views.descargar_lote_zip, name="descargar_lote_zip"),
     # Rutas para manejo de archivos
     path("dashboard/get-archivo-activo/", views.get_archivo_activo, name="get_archivo_activo"),
     path("dashboard/mis-archivos/", views.listar_archivos, name="listar_archivos"),
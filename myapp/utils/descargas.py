@@ -0,0 +1,207 @@
+"""
+Descargas de archivos guardados (PDF de reportes) sin cargarlos en memoria.
+
+- respuesta_descarga: un archivo con FileResponse (el servidor WSGI puede usar
+  sendfile), soporte de Range/If-Range, ETag y Content-Length. Si hay un proxy
+  configurado (settings.DESCARGAS_SERVIDOR) se le delega el envío con
+  X-Accel-Redirect (nginx) o X-Sendfile (Apache/lighttpd).
+- respuesta_zip: varios archivos en un ZIP que se genera mientras se envía.
+"""
+
+import hashlib
+import io
+import os
+import re
+import zipfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_etags
+
+TAMANO_BLOQUE = 64 * 1024
+
+# Máximo de archivos por ZIP
+MAX_ARCHIVOS_ZIP = 200
+
+RANGO_BYTES = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def etag_archivo(ruta):
+    """
+    ETag a partir de la ruta, el tamaño y la fecha de modificación del archivo.
+    """
+    info = os.stat(ruta)
+    contenido = f"{ruta}:{info.st_size}:{info.st_mtime_ns}"
+    return f'"{hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def _leer_rango(request, tamano, etag):
+    """
+    Interpreta la cabecera Range (un solo rango de bytes).
+
+    Returns:
+        tuple (inicio, fin) inclusivo, None si se debe enviar todo el archivo
+        o 'invalido' si el rango no se puede satisfacer
+    """
+    cabecera = request.headers.get("Range")
+    if not cabecera:
+        return None
+
+    # If-Range: si el archivo cambió desde que el cliente pidió el rango, se envía completo
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        return None
+
+    coincidencia = RANGO_BYTES.match(cabecera.strip())
+    if not coincidencia:
+        # Varios rangos o unidades desconocidas: se ignora la cabecera (RFC 9110)
+        return None
+
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # bytes=-N: los últimos N bytes
+        sufijo = int(fin)
+        if sufijo == 0:
+            return "invalido"
+        return max(tamano - sufijo, 0), tamano - 1
+
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return "invalido"
+    return inicio, fin
+
+
+def _bloques(ruta, inicio, fin):
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        pendientes = fin - inicio + 1
+        while pendientes > 0:
+            bloque = f.read(min(TAMANO_BLOQUE, pendientes))
+            if not bloque:
+                break
+            pendientes -= len(bloque)
+            yield bloque
+
+
+def respuesta_descarga(request, archivo, nombre=None, content_type="application/pdf", en_linea=False):
+    """
+    Respuesta para descargar un FieldFile guardado en disco.
+
+    Args:
+        request: HttpRequest (para Range, If-Range e If-None-Match)
+        archivo: FieldFile (p. ej. reporte.pdf_file)
+        nombre: Nombre del archivo descargado (por defecto, el del archivo)
+        content_type: Tipo MIME
+        en_linea: Mostrar en el navegador (inline) en lugar de descargar
+
+    Returns:
+        HttpResponse (200, 206, 304 o 416)
+    """
+    ruta = archivo.path
+    nombre = nombre or os.path.basename(archivo.name)
+    tamano = os.path.getsize(ruta)
+    etag = etag_archivo(ruta)
+    modificado = http_date(os.path.getmtime(ruta))
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        return response
+
+    servidor = getattr(settings, "DESCARGAS_SERVIDOR", None)
+    if servidor:
+        # El proxy envía el archivo (y atiende los Range) sin pasar por Python
+        response = HttpResponse(content_type=content_type)
+        if servidor == "nginx":
+            prefijo = getattr(settings, "DESCARGAS_ACCEL_PREFIJO", "/media-protegida/")
+            response["X-Accel-Redirect"] = quote(prefijo + archivo.name)
+        else:
+            response["X-Sendfile"] = ruta
+    else:
+        rango = _leer_rango(request, tamano, etag)
+        if rango == "invalido":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{tamano}"
+            return response
+
+        if rango is None:
+            response = FileResponse(open(ruta, "rb"), content_type=content_type)
+        else:
+            inicio, fin = rango
+            response = StreamingHttpResponse(_bloques(ruta, inicio, fin), status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+            response["Content-Length"] = str(fin - inicio + 1)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = modificado
+    response["Content-Disposition"] = content_disposition_header(not en_linea, nombre)
+    return response
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino de escritura no posicionable para ZipFile: acumula lo escrito
+    hasta que el generador lo envía. ZipFile detecta que no puede hacer seek
+    y usa descriptores de datos en lugar de reescribir las cabeceras.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def generar_zip(entradas):
+    """
+    Genera un ZIP por bloques, sin tenerlo completo en memoria.
+
+    Args:
+        entradas: Iterable de (nombre_en_zip, ruta_en_disco)
+
+    Yields:
+        bytes
+    """
+    salida = _SalidaZip()
+    # Los PDF ya están comprimidos: se guardan sin volver a comprimir
+    with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for nombre, ruta in entradas:
+            with open(ruta, "rb") as origen, zf.open(nombre, mode="w", force_zip64=True) as destino:
+                while True:
+                    bloque = origen.read(TAMANO_BLOQUE)
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    yield salida.vaciar()
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def respuesta_zip(entradas, nombre):
+    """
+    StreamingHttpResponse que envía un ZIP generado al vuelo.
+
+    Args:
+        entradas: Iterable de (nombre_en_zip, ruta_en_disco)
+        nombre: Nombre del .zip descargado
+    """
+    response = StreamingHttpResponse(
+        (bloque for bloque in generar_zip(entradas) if bloque),
+        content_type="application/zip"
+    )
+    response["Content-Disposition"] = content_disposition_header(True, nombre)
+    return response
@@ -0,0 +1,192 @@
+"""
+Lectores de libros Excel para la ruta de subida.
+
+Todos los lectores devuelven {nombre_hoja: DataFrame} con solo las columnas que
+usa el código de reportes y con tipos compactos:
+
+- openpyxl:        pd.read_excel con el motor por defecto (carga todo el libro).
+- openpyxl_stream: openpyxl en modo read_only, recorre las filas en streaming.
+- calamine:        pd.read_excel con python-calamine (Rust), si está instalado.
+
+El lector se elige con settings.EXCEL_READER_ENGINE ("auto" usa calamine si
+está disponible y, si no, openpyxl_stream). Todos producen los mismos datos.
+"""
+
+import importlib.util
+
+import pandas as pd
+from django.conf import settings
+from pandas.io.parsers import TextParser
+
+from .report_generator import COLUMNAS_GRUPALES, COLUMNAS_INDIVIDUAL
+
+# Columnas que leen generar_reporte_grupal_completo y reporte_individual
+COLUMNAS_REPORTE = list(dict.fromkeys(COLUMNAS_GRUPALES + COLUMNAS_INDIVIDUAL))
+
+# Columnas de texto con pocos valores distintos (A, B, F...)
+COLUMNAS_CATEGORICAS = ["Cualitativa", "Comportamiento"]
+
+# Valores de error de Excel (openpyxl los devuelve como texto en values_only)
+ERRORES_EXCEL = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
+
+
+def calamine_disponible():
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def motor_configurado():
+    """
+    Devuelve el nombre del lector a usar según settings.EXCEL_READER_ENGINE.
+    """
+    motor = getattr(settings, "EXCEL_READER_ENGINE", "auto")
+    if motor == "auto":
+        return "calamine" if calamine_disponible() else "openpyxl_stream"
+    return motor
+
+
+def leer_libro(origen, motor=None):
+    """
+    Lee todas las hojas de un libro con el lector indicado (o el configurado).
+
+    Args:
+        origen: Ruta o archivo (file-like) del .xlsx
+        motor: 'openpyxl', 'openpyxl_stream' o 'calamine'
+
+    Returns:
+        dict: {nombre_hoja: DataFrame} en el orden del libro
+    """
+    motor = motor or motor_configurado()
+    try:
+        lector = LECTORES[motor]
+    except KeyError:
+        raise ValueError(f"Lector de Excel desconocido: {motor}")
+
+    hojas = lector(origen)
+    return {nombre: compactar_tipos(df) for nombre, df in hojas.items()}
+
+
+def compactar_tipos(df):
+    """
+    Aplica tipos compactos sin alterar los resultados de los reportes:
+    los enteros se reducen al menor tipo entero posible y las columnas de
+    texto de pocos valores pasan a category. Las notas se mantienen en
+    float64 para que los promedios no cambien.
+    """
+    for columna in df.columns:
+        if pd.api.types.is_integer_dtype(df[columna].dtype):
+            df[columna] = pd.to_numeric(df[columna], downcast="integer")
+        elif columna in COLUMNAS_CATEGORICAS:
+            df[columna] = df[columna].astype("category")
+    return df
+
+
+def _usecols(columna):
+    return columna in COLUMNAS_REPORTE
+
+
+def _leer_pandas(origen, engine):
+    xls = pd.ExcelFile(origen, engine=engine)
+    return {sheet: pd.read_excel(xls, sheet, usecols=_usecols) for sheet in xls.sheet_names}
+
+
+def leer_openpyxl(origen):
+    return _leer_pandas(origen, "openpyxl")
+
+
+def leer_calamine(origen):
+    if not calamine_disponible():
+        raise ValueError("El lector 'calamine' requiere el paquete python-calamine")
+    return _leer_pandas(origen, "calamine")
+
+
+def leer_openpyxl_stream(origen):
+    """
+    Recorre cada hoja fila por fila con openpyxl en modo read_only y guarda solo
+    las celdas de las columnas del reporte. Las celdas se convierten igual que
+    en pd.read_excel y se pasan al mismo TextParser, así que los valores
+    vacíos, los NA y los tipos resultantes coinciden con el lector 'openpyxl'.
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(origen, read_only=True, data_only=True, keep_links=False)
+    try:
+        hojas = {}
+        for hoja in libro.worksheets:
+            hoja.reset_dimensions()
+            filas = hoja.iter_rows(values_only=True)
+            encabezado = [_convertir_celda(valor) for valor in next(filas, ())]
+            posiciones = [i for i, columna in enumerate(encabezado) if _usecols(columna)]
+
+            datos = [[encabezado[i] for i in posiciones]]
+            for fila in filas:
+                # read_excel omite las filas completamente vacías
+                if all(valor is None for valor in fila):
+                    continue
+                datos.append([_convertir_celda(fila[i]) if i < len(fila) else "" for i in posiciones])
+
+            hojas[hoja.title] = TextParser(datos, header=0).read()
+        return hojas
+    finally:
+        libro.close()
+
+
+def _convertir_celda(valor):
+    """
+    Misma conversión que aplica pandas a las celdas de openpyxl: vacío como "",
+    errores de fórmula como NaN y números enteros como int.
+    """
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str) and valor in ERRORES_EXCEL:
+        return float("nan")
+    return valor
+
+
+LECTORES = {
+    "openpyxl": leer_openpyxl,
+    "openpyxl_stream": leer_openpyxl_stream,
+    "calamine": leer_calamine,
+}
+
+
+def validar_encabezados(origen):
+    """
+    Validación previa: lee solo la fila de encabezados de cada hoja y comprueba
+    que estén todas las columnas que necesitan los reportes. No parsea los
+    datos, así que un archivo mal formado se rechaza en milisegundos.
+
+    Args:
+        origen: Ruta o archivo (file-like) del .xlsx
+
+    Returns:
+        list: Descripción de cada problema encontrado (vacía si es válido)
+    """
+    from openpyxl import load_workbook
+
+    try:
+        libro = load_workbook(origen, read_only=True, data_only=True, keep_links=False)
+    except Exception as e:
+        return [f"No se pudo abrir el archivo como un libro de Excel (.xlsx): {e}"]
+    finally:
+        # El archivo subido se vuelve a leer completo si pasa la validación
+        if hasattr(origen, "seek"):
+            origen.seek(0)
+
+    try:
+        if not libro.worksheets:
+            return ["El libro no tiene hojas."]
+
+        problemas = []
+        for hoja in libro.worksheets:
+            encabezado = next(hoja.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            presentes = {columna for columna in encabezado if columna is not None}
+            faltantes = [columna for columna in COLUMNAS_REPORTE if columna not in presentes]
+            if faltantes:
+                problemas.append(f"Hoja '{hoja.title}': faltan las columnas {', '.join(faltantes)}")
+        return problemas
+    finally:
+        libro.close()
+        if hasattr(origen, "seek"):
+            origen.seek(0)
@@ -0,0 +1,93 @@
+"""
+Documento intermedio (AST) de la narrativa de un reporte.
+
+La narrativa del modelo es Markdown simple. Se analiza una sola vez y el
+resultado se guarda en ReporteGenerado.narrativa_ast, de modo que volver a
+renderizar el PDF (p. ej. tras un cambio de estilo) no vuelve a procesar el
+texto. El documento es JSON:
+
+    {"version": 1, "titulo": "...", "bloques": [...]}
+
+Tipos de bloque:
+    {"tipo": "espacio"}                       línea vacía
+    {"tipo": "h2", "texto": "..."}            "## Título"
+    {"tipo": "h3", "texto": "..."}            "### Subtítulo"
+    {"tipo": "vineta", "runs": [[texto, negrita], ...]}   "- elemento"
+    {"tipo": "runs", "runs": [[texto, negrita], ...]}     línea con **negritas**
+    {"tipo": "parrafo", "texto": "..."}       cualquier otra línea
+"""
+
+import re
+
+# Cambiar si cambia la forma del documento: los guardados se vuelven a analizar
+VERSION_AST = 1
+
+NEGRITA = re.compile(r"(\*\*(?:.*?)\*\*)")
+
+
+def parsear_narrativa(titulo, contenido):
+    """
+    Convierte la narrativa en Markdown simple en un documento.
+
+    Args:
+        titulo: Título del reporte
+        contenido: Narrativa del modelo
+
+    Returns:
+        dict: Documento serializable a JSON
+    """
+    # Listas pegadas a los dos puntos ("Resumen:- a") y viñetas con '*'
+    contenido = contenido.replace(":-", ":\n-")
+    contenido = re.sub(r"^\*\s+", "- ", contenido, flags=re.MULTILINE)
+
+    bloques = []
+    for linea in contenido.split("\n"):
+        linea = linea.strip()
+        if not linea:
+            bloques.append({"tipo": "espacio"})
+        elif linea.startswith("## "):
+            bloques.append({"tipo": "h2", "texto": linea.replace("## ", "")})
+        elif linea.startswith("### "):
+            bloques.append({"tipo": "h3", "texto": linea.replace("### ", "")})
+        elif linea.startswith("- "):
+            bloques.append({"tipo": "vineta", "runs": _runs(linea[2:].strip())})
+        elif "**" in linea:
+            bloques.append({"tipo": "runs", "runs": _runs(linea)})
+        else:
+            bloques.append({"tipo": "parrafo", "texto": linea})
+
+    return {"version": VERSION_AST, "titulo": titulo, "bloques": bloques}
+
+
+def _runs(texto):
+    """
+    Divide una línea en tramos [texto, negrita] según los **marcadores**.
+    """
+    runs = []
+    for parte in NEGRITA.split(texto):
+        negrita = parte.startswith("**") and parte.endswith("**")
+        if negrita:
+            parte = parte.strip("**")
+        if parte:
+            runs.append([parte, negrita])
+    return runs
+
+
+def documento_vigente(documento):
+    """
+    Indica si un documento guardado se puede usar con la versión actual.
+    """
+    return isinstance(documento, dict) and documento.get("version") == VERSION_AST
+
+
+def texto_documento(documento):
+    """
+    Todo el texto del documento (para elegir el juego de fuentes del PDF).
+    """
+    partes = [documento["titulo"]]
+    for bloque in documento["bloques"]:
+        if "texto" in bloque:
+            partes.append(bloque["texto"])
+        for texto, _ in bloque.get("runs", ()):
+            partes.append(texto)
+    return "".join(partes)
@@ -0,0 +1,99 @@
+"""
+Paginación por cursor (keyset) para los listados del dashboard.
+
+Los listados se ordenan por (fecha, id) descendente y cada página continúa a
+partir de la última fila de la anterior, en lugar de usar OFFSET. Así el costo
+de una página no depende de cuántas filas tenga el usuario, siempre que haya
+un índice (usuario, -fecha, -id).
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+
+def codificar_cursor(fecha, pk):
+    """
+    Codifica la posición (fecha, id) de la última fila de una página.
+
+    Returns:
+        str: Cursor opaco (base64 url-safe)
+    """
+    contenido = json.dumps([fecha.isoformat(), pk])
+    return base64.urlsafe_b64encode(contenido.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """
+    Decodifica un cursor generado por codificar_cursor.
+
+    Returns:
+        tuple: (datetime, id)
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fecha, pk = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        fecha = parse_datetime(fecha)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
+    if fecha is None or not isinstance(pk, int):
+        raise ValueError("Cursor de paginación inválido")
+    return fecha, pk
+
+
+def leer_limite(valor):
+    """
+    Interpreta el parámetro 'limite' de la petición.
+
+    Raises:
+        ValueError: Si no es un entero positivo
+    """
+    if not valor:
+        return LIMITE_POR_DEFECTO
+    limite = int(valor)
+    if limite < 1:
+        raise ValueError("El límite debe ser un entero positivo")
+    return min(limite, LIMITE_MAXIMO)
+
+
+def paginar_keyset(queryset, campo_fecha, cursor=None, limite=LIMITE_POR_DEFECTO):
+    """
+    Devuelve una página de un queryset ordenado por (campo_fecha, id) descendente.
+
+    Args:
+        queryset: QuerySet ya filtrado
+        campo_fecha: Nombre del campo de fecha (p. ej. 'fecha_subida')
+        cursor: Cursor de la página anterior (o None para la primera)
+        limite: Número de filas por página
+
+    Returns:
+        tuple: (lista de objetos, next_cursor o None si no hay más)
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    queryset = queryset.order_by(f"-{campo_fecha}", "-id")
+
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{campo_fecha}__lt": fecha}) | Q(**{campo_fecha: fecha, "id__lt": pk})
+        )
+
+    # Una fila extra indica si hay otra página sin necesidad de un COUNT
+    filas = list(queryset[:limite + 1])
+    if len(filas) <= limite:
+        return filas, None
+
+    filas = filas[:limite]
+    ultima = filas[-1]
+    return filas, codificar_cursor(getattr(ultima, campo_fecha), ultima.pk)
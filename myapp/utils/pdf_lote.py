@@ -0,0 +1,80 @@
+"""
+Renderizado de muchos PDF a la vez en el pool de procesos compartido
+(utils/process_pool.py).
+
+Las tareas se envían en bloques para que el costo de pasar cada documento al
+proceso hijo sea pequeño frente al de renderizarlo. Cada proceso del pool
+carga las fuentes una sola vez (utils/pdf_plantilla.py) y las reutiliza en
+todos los documentos que recibe.
+"""
+
+import logging
+import math
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+from .process_pool import cerrar_pool, enviar, numero_workers
+from .report_generator import generar_pdf_documento
+
+logger = logging.getLogger(__name__)
+
+# Máximo de documentos por envío al pool
+TAREAS_POR_ENVIO = 16
+
+
+def renderizar_a_archivos(tareas):
+    """
+    Se ejecuta en un proceso del pool. Escribe cada PDF en un archivo temporal
+    y lo mueve a su ruta final, así una descarga nunca ve un PDF a medias.
+
+    Args:
+        tareas: Lista de (documento, ruta)
+
+    Returns:
+        list: None por cada PDF escrito o el texto del error
+    """
+    resultados = []
+    for documento, ruta in tareas:
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(temporal, "wb") as destino:
+                generar_pdf_documento(documento, destino=destino)
+            os.replace(temporal, ruta)
+            resultados.append(None)
+        except Exception as e:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            resultados.append(f"{type(e).__name__}: {e}")
+    return resultados
+
+
+def renderizar_lote(tareas):
+    """
+    Renderiza una lista de documentos en PDF repartiéndolos entre los
+    procesos del pool.
+
+    Args:
+        tareas: Lista de (documento, ruta de destino)
+
+    Returns:
+        list: Un error (str) o None por cada tarea, en el mismo orden
+    """
+    tareas = list(tareas)
+    if not tareas:
+        return []
+
+    # Unos cuatro envíos por proceso para repartir bien la carga
+    por_envio = max(1, min(TAREAS_POR_ENVIO, math.ceil(len(tareas) / (max(numero_workers(), 1) * 4))))
+    bloques = [tareas[i:i + por_envio] for i in range(0, len(tareas), por_envio)]
+    futuros = [enviar(renderizar_a_archivos, bloque) for bloque in bloques]
+
+    errores = []
+    for bloque, futuro in zip(bloques, futuros):
+        try:
+            errores.extend(futuro.result())
+        except BrokenProcessPool as e:
+            logger.warning("Pool de procesos roto, se renderiza en el proceso actual: %s", e)
+            cerrar_pool()
+            errores.extend(renderizar_a_archivos(bloque))
+    return errores
@@ -0,0 +1,194 @@
+"""
+Contexto de renderizado de PDF compartido por el proceso.
+
+Casi todo el costo fijo de un reporte está en las fuentes: FPDF.add_font
+analiza cada TTF (tablas cmap y hmtx de miles de glifos) y, al generar el
+PDF, fontTools vuelve a leer el archivo completo para recortar los glifos
+usados. La plantilla reduce ambos costos:
+
+- Las fuentes se analizan una sola vez por proceso. Cada documento recibe una
+  copia ligera: lo que no cambia (anchos, glifos, descriptor) se comparte y el
+  TTFont de fontTools se abre de nuevo desde bytes en memoria (con lazy=True
+  es casi inmediato), porque fpdf2 lo recorta al generar el PDF.
+- Además de las fuentes completas se prepara un juego "latino" con solo los
+  caracteres latinos, la puntuación y los símbolos comunes (una quinta parte
+  del archivo). Los reportes en español usan ese juego; si el texto tiene un
+  carácter que solo está en la fuente completa, se usa la completa.
+
+Los anchos de los glifos son los mismos en ambos juegos, así que el texto se
+distribuye igual en la página.
+"""
+
+import io
+import logging
+import os
+import threading
+from copy import copy
+
+from fontTools import subset as ftsubset
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.fonts import SubsetMap, TTFFont
+
+logger = logging.getLogger(__name__)
+
+FUENTES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "fonts")
+
+FAMILIA = "DejaVu"
+FUENTES = {
+    "": "DejaVuSans.ttf",
+    "B": "DejaVuSans-Bold.ttf",
+    "I": "DejaVuSans-Oblique.ttf",
+}
+
+# Latín (con diacríticos), puntuación general, monedas, flechas, símbolos
+# matemáticos y formas geométricas (viñetas)
+RANGOS_LATINOS = [(0x20, 0x24F), (0x300, 0x36F), (0x2000, 0x22FF), (0x25A0, 0x25FF)]
+
+# Margen inferior para el salto de página automático
+MARGEN_INFERIOR = 15
+
+_plantilla = None
+_lock = threading.Lock()
+
+
+class PlantillaPDF:
+    """
+    Fuentes ya analizadas (juegos 'completo' y 'latino') y configuración de
+    página de los reportes.
+    """
+
+    def __init__(self, fuentes_dir=FUENTES_DIR):
+        self.familia = FAMILIA
+        # {juego: {estilo: (TTFFont de plantilla, bytes del TTF)}}
+        self.juegos = {}
+        # Caracteres que solo tiene el juego completo
+        self.solo_completo = frozenset()
+        try:
+            base = FPDF()
+            completo, latino = {}, {}
+            for estilo, archivo in FUENTES.items():
+                with open(os.path.join(fuentes_dir, archivo), "rb") as f:
+                    datos = f.read()
+                completo[estilo] = (_analizar(base, datos, "completo", estilo), datos)
+                recortada = recortar_fuente(datos, RANGOS_LATINOS)
+                latino[estilo] = (_analizar(base, recortada, "latino", estilo), recortada)
+
+            self.juegos = {"completo": completo, "latino": latino}
+            self.solo_completo = frozenset(
+                chr(codigo)
+                for estilo in FUENTES
+                for codigo in completo[estilo][0].cmap.keys() - latino[estilo][0].cmap.keys()
+            )
+            logger.info("Fuentes %s cargadas para los PDF", FAMILIA)
+        except Exception as e:
+            logger.warning("No se pudieron cargar las fuentes DejaVu: %s", e)
+            self.familia = "Arial"
+            self.juegos = {}
+
+    def elegir_juego(self, texto):
+        """
+        'latino' si todos los caracteres del texto están en el juego latino,
+        'completo' si alguno solo está en la fuente completa.
+        """
+        return "completo" if self.solo_completo.intersection(texto) else "latino"
+
+    def nuevo_documento(self, texto="", juego=None):
+        """
+        Crea un documento con una página, márgenes y fuentes de la plantilla.
+
+        Args:
+            texto: Texto que se va a escribir (para elegir el juego de fuentes)
+            juego: 'completo' o 'latino' (por defecto, según el texto)
+
+        Returns:
+            tuple: (FPDF, nombre de la familia de fuentes)
+        """
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=MARGEN_INFERIOR)
+        if self.juegos:
+            for fuente, datos in self.juegos[juego or self.elegir_juego(texto)].values():
+                copia = _copiar_fuente(fuente, datos)
+                copia.i = len(pdf.fonts) + 1
+                pdf.fonts[copia.fontkey] = copia
+        return pdf, self.familia
+
+
+def recortar_fuente(datos, rangos):
+    """
+    Devuelve un TTF con solo los caracteres de los rangos indicados. Conserva
+    los nombres, las métricas y los límites de la fuente original.
+    """
+    fuente = ttLib.TTFont(io.BytesIO(datos), recalcBBoxes=False, recalcTimestamp=False)
+    opciones = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, glyph_names=True)
+    opciones.name_IDs = ["*"]
+    opciones.name_languages = ["*"]
+    # fpdf2 no usa las tablas de posicionamiento y las descarta al generar el PDF
+    opciones.layout_features = []
+    opciones.drop_tables += ["FFTM"]
+    subsetter = ftsubset.Subsetter(opciones)
+    subsetter.populate(unicodes=[codigo for inicio, fin in rangos for codigo in range(inicio, fin + 1)])
+    subsetter.subset(fuente)
+
+    salida = io.BytesIO()
+    fuente.save(salida)
+    return salida.getvalue()
+
+
+def _analizar(base, datos, juego, estilo):
+    """
+    Analiza un TTF (lo mismo que hace FPDF.add_font) a partir de sus bytes.
+    """
+    fuente = TTFFont(base, io.BytesIO(datos), f"{FAMILIA.lower()}{estilo}", estilo)
+    # fpdf2 agrega un .notdef al TTFont si falta; esa corrección no está en
+    # los bytes y no llegaría a las copias
+    if "glyf" in fuente.ttfont and ".notdef" not in fuente.ttfont["glyf"]:
+        raise ValueError(f"La fuente {FUENTES[estilo]} ({juego}) no tiene el glifo .notdef")
+    return fuente
+
+
+def _copiar_fuente(fuente, datos):
+    """
+    Copia de un TTFFont para un documento nuevo, sin volver a analizar el TTF.
+    """
+    copia = TTFFont.__new__(TTFFont)
+    for atributo in TTFFont.__slots__:
+        if hasattr(fuente, atributo):
+            setattr(copia, atributo, getattr(fuente, atributo))
+
+    copia.ttffile = io.BytesIO(datos)
+    copia.ttfont = ttLib.TTFont(copia.ttffile, recalcTimestamp=False, lazy=True)
+    # cw es un defaultdict: leer un carácter sin ancho lo agrega
+    copia.cw = copy(fuente.cw)
+    copia.missing_glyphs = []
+    copia.biggest_size_pt = 0
+    copia._hbfont = None
+    copia.subset = SubsetMap(copia)
+    return copia
+
+
+def obtener_plantilla():
+    """
+    Devuelve la plantilla del proceso (la crea la primera vez).
+    """
+    global _plantilla
+
+    if _plantilla is None:
+        with _lock:
+            if _plantilla is None:
+                _plantilla = PlantillaPDF()
+    return _plantilla
+
+
+def nuevo_documento(texto=""):
+    """
+    Documento nuevo a partir de la plantilla del proceso.
+
+    Args:
+        texto: Texto que se va a escribir (para elegir el juego de fuentes)
+
+    Returns:
+        tuple: (FPDF, nombre de la familia de fuentes)
+    """
+    return obtener_plantilla().nuevo_documento(texto)
@@ -0,0 +1,153 @@
+"""
+Pool de procesos compartido para el trabajo pesado de CPU (parseo de Excel y
+agregaciones de pandas), fuera del hilo de la petición y del GIL del worker.
+
+El pool se crea la primera vez que se usa y se reutiliza entre peticiones.
+Su tamaño se configura con settings.UPLOAD_PROCESS_POOL_WORKERS (None usa el
+número de núcleos; 0 desactiva el pool y ejecuta todo en el mismo proceso).
+
+Si un proceso hijo muere (p. ej. por falta de memoria con un libro enorme),
+el pool queda inservible: se reemplaza por uno nuevo y la tarea falla con
+ProcesoCaido. No se repite en el proceso del servidor, donde el mismo libro
+podría tumbar al worker web.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+
+
+class ProcesoCaido(RuntimeError):
+    """
+    El proceso del pool que ejecutaba la tarea terminó de forma inesperada.
+    """
+
+
+def _inicializar_proceso():
+    """
+    Prepara Django en cada proceso hijo (las funciones del pool pueden
+    importar módulos que dependen de los modelos o de settings).
+    """
+    import django
+
+    django.setup()
+
+
+def numero_workers():
+    """
+    Número de procesos del pool según settings.UPLOAD_PROCESS_POOL_WORKERS.
+    """
+    workers = getattr(settings, "UPLOAD_PROCESS_POOL_WORKERS", None)
+    if workers is None:
+        return os.cpu_count() or 1
+    return max(int(workers), 0)
+
+
+def obtener_pool():
+    """
+    Devuelve el pool compartido (lo crea si no existe).
+
+    Returns:
+        ProcessPoolExecutor o None si el pool está desactivado
+    """
+    global _pool
+
+    workers = numero_workers()
+    if workers == 0:
+        return None
+
+    with _lock:
+        if _pool is None:
+            # spawn: los hijos no heredan hilos ni conexiones a la BD del servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inicializar_proceso,
+            )
+            logger.info("Pool de procesos iniciado con %d workers", workers)
+        return _pool
+
+
+def enviar(funcion, *args):
+    """
+    Envía una tarea al pool y devuelve un Future. Si el pool está desactivado
+    la tarea se ejecuta en el momento y el Future ya está resuelto.
+
+    Args:
+        funcion: Función a nivel de módulo (se serializa por nombre)
+        *args: Argumentos serializables con pickle
+
+    Returns:
+        concurrent.futures.Future
+    """
+    pool = obtener_pool()
+    if pool is None:
+        from concurrent.futures import Future
+
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    return pool.submit(funcion, *args)
+
+
+def ejecutar(funcion, *args):
+    """
+    Ejecuta una tarea en el pool y espera su resultado.
+
+    Raises:
+        ProcesoCaido: Si el proceso hijo murió; el pool ya fue reemplazado
+    """
+    pool = obtener_pool()
+    if pool is None:
+        return funcion(*args)
+
+    try:
+        return pool.submit(funcion, *args).result()
+    except BrokenProcessPool as e:
+        logger.error("Pool de procesos roto, se reemplaza: %s", e)
+        reemplazar_pool(pool)
+        raise ProcesoCaido(
+            "El proceso que procesaba la tarea terminó de forma inesperada "
+            "(p. ej. por falta de memoria)."
+        ) from e
+
+
+def reemplazar_pool(roto):
+    """
+    Cierra el pool roto y crea uno nuevo. Si otro hilo ya lo reemplazó no
+    hace nada, para no cancelar las tareas del pool nuevo.
+    """
+    global _pool
+
+    with _lock:
+        if _pool is not roto:
+            return
+        roto.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    obtener_pool()
+
+
+def cerrar_pool():
+    """
+    Cierra el pool compartido (si existe).
+    """
+    global _pool
+
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,283 @@
+"""
+Serialización compacta de los datos que se envían al modelo.
+
+El tiempo de prefill del LLM crece con el largo del prompt. El JSON con
+indent=2 de un reporte grupal repite en cada trimestre las listas por
+estudiante (faltas, mejores, peores) con claves largas, y crece con la clase.
+Aquí los datos se reescriben:
+
+- sin indentación ni espacios,
+- con claves cortas (la leyenda va en el prompt, LEYENDA),
+- con las listas por estudiante como tablas {"cols": [...], "filas": [...]},
+- con los números enteros sin decimales (3.0 -> 3).
+
+Los tokens se cuentan con settings.PROMPT_TOKENIZADOR (ruta a una función
+texto -> int, p. ej. una que use el tokenizador del modelo) o, por defecto,
+con una aproximación. Si el prompt supera settings.PROMPT_MAX_TOKENS se
+aplican recortes, de menor a mayor valor para el reporte, hasta que quepa.
+"""
+
+import json
+import logging
+import math
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+LEYENDA = (
+    "Claves de los datos: ind=Aporte Individual, grp=Aporte Grupal, proy=Proyecto, exam=Examen, "
+    "prom=promedio, f_inj/f_just=faltas injustificadas/justificadas. "
+    "Las tablas tienen 'cols' (columnas) y 'filas'."
+)
+
+COMPONENTES_CORTOS = {
+    "Aporte Individual": "ind",
+    "Aporte Grupal": "grp",
+    "Proyecto": "proy",
+    "Examen": "exam",
+    "aporte_individual": "ind",
+    "aporte_grupal": "grp",
+    "proyecto": "proy",
+    "examen": "exam",
+}
+
+_TOKEN = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_")
+
+
+# =============================
+# CONTEO DE TOKENS
+# =============================
+def tokens_aproximados(texto):
+    """
+    Aproximación para modelos con tokenizador de subpalabras (SentencePiece,
+    BPE): una palabra cada 4 letras, cada dígito y cada signo por separado.
+    """
+    return sum(
+        math.ceil(len(parte) / 4) if parte[0].isalpha() else 1
+        for parte in _TOKEN.findall(texto)
+    )
+
+
+@lru_cache(maxsize=None)
+def _tokenizador(ruta):
+    return import_string(ruta) if ruta else tokens_aproximados
+
+
+def contar_tokens(texto):
+    """
+    Tokens del texto según settings.PROMPT_TOKENIZADOR.
+    """
+    return _tokenizador(getattr(settings, "PROMPT_TOKENIZADOR", None))(texto)
+
+
+# =============================
+# SERIALIZACIÓN
+# =============================
+def serializar(datos):
+    """
+    JSON sin espacios y con los enteros sin decimales.
+    """
+    return json.dumps(_numeros(datos), ensure_ascii=False, separators=(",", ":"))
+
+
+def _numeros(valor):
+    if isinstance(valor, float):
+        return int(valor) if valor.is_integer() else round(valor, 2)
+    if isinstance(valor, dict):
+        return {k: _numeros(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_numeros(v) for v in valor]
+    return valor
+
+
+def _tabla(cols, filas):
+    return {"cols": cols, "filas": filas}
+
+
+def _componentes(valores):
+    return {COMPONENTES_CORTOS.get(k, k): v for k, v in valores.items()}
+
+
+def compactar_grupal(json_data):
+    """
+    Datos del reporte grupal (generar_reporte_grupal_completo) con claves
+    cortas y tablas. Otros datos (p. ej. un JSON enviado por el cliente) se
+    devuelven sin cambios.
+    """
+    if not isinstance(json_data, dict) or "reportes_trimestrales" not in json_data:
+        return json_data
+    estatus = json_data.get("estatus_academico_acumulado", {})
+    trimestres = {}
+    for trimestre, r in json_data.get("reportes_trimestrales", {}).items():
+        trimestres[trimestre] = {
+            "prom": r.get("promedio_general"),
+            "comp": _componentes(r.get("componentes_promedio", {})),
+            "mejores": _tabla(["nombre", "nota"], [
+                [e.get("APELLIDOS/NOMBRES"), e.get("Nota Trimemestre")] for e in r.get("Buen rendimiento", [])
+            ]),
+            "peores": _tabla(["nombre", "nota"], [
+                [e.get("APELLIDOS/NOMBRES"), e.get("Nota Trimemestre")] for e in r.get("Bajo rendimiento", [])
+            ]),
+            "f_inj": r.get("total_faltas_injustificadas"),
+            "f_just": r.get("total_faltas_justificadas"),
+            "faltas": _tabla(["nombre", "f_inj", "f_just"], [
+                [e.get("APELLIDOS/NOMBRES"), e.get("Falta Injustificada"), e.get("Falta Justificada")]
+                for e in r.get("faltas_por_estudiante", [])
+            ]),
+            "mal_comp_total": r.get("total_mal_comportamiento"),
+            "mal_comp": r.get("estudiantes_mal_comportamiento", []),
+        }
+
+    fortalezas = json_data.get("fortalezas_debilidades_grupales", {})
+    return {
+        "aprobados": estatus.get("total_aprobados"),
+        "reprobados": estatus.get("total_reprobados"),
+        "en_riesgo": estatus.get("estudiantes_en_riesgo", []),
+        "trimestres": trimestres,
+        "evolucion": _componentes(json_data.get("analisis_evolucion_grupal", {})),
+        "fortalezas": [COMPONENTES_CORTOS.get(c, c) for c in fortalezas.get("fortalezas", [])],
+        "debilidades": [COMPONENTES_CORTOS.get(c, c) for c in fortalezas.get("debilidades", [])],
+    }
+
+
+def compactar_individual(json_data):
+    """
+    Datos del reporte individual (reporte_individual) con los trimestres
+    como una tabla. Otros datos se devuelven sin cambios.
+    """
+    if not isinstance(json_data, dict) or not isinstance(json_data.get("trimestres"), dict):
+        return json_data
+    filas, sin_datos = [], []
+    for trimestre, t in json_data.get("trimestres", {}).items():
+        if not isinstance(t, dict):
+            sin_datos.append(trimestre)
+            continue
+        comp = t.get("componentes", {})
+        faltas = t.get("faltas", {})
+        filas.append([
+            trimestre, t.get("nota_final"), t.get("cualitativa"),
+            comp.get("aporte_individual"), comp.get("aporte_grupal"), comp.get("proyecto"), comp.get("examen"),
+            faltas.get("injustificadas"), faltas.get("justificadas"), t.get("comportamiento"),
+        ])
+
+    compacto = {
+        "nombre": json_data.get("nombre"),
+        "trimestres": _tabla(
+            ["trimestre", "nota", "cualitativa", "ind", "grp", "proy", "exam", "f_inj", "f_just", "comportamiento"],
+            filas
+        ),
+    }
+    if sin_datos:
+        compacto["sin_datos"] = sin_datos
+    fortalezas = json_data.get("fortalezas_debilidades", {})
+    compacto.update({
+        "evolucion": _componentes(json_data.get("analisis_evolucion", {})),
+        "fortalezas": [COMPONENTES_CORTOS.get(c, c) for c in fortalezas.get("fortalezas", [])],
+        "debilidades": [COMPONENTES_CORTOS.get(c, c) for c in fortalezas.get("debilidades", [])],
+    })
+    return compacto
+
+
+# =============================
+# RECORTES POR PRESUPUESTO
+# =============================
+# Cada recorte modifica los datos compactos y devuelve True si cambió algo.
+# Se aplican en este orden (primero lo que menos aporta a la narrativa).
+def _faltas_solo_injustificadas(datos):
+    cambio = False
+    for t in datos.get("trimestres", {}).values():
+        filas = [f for f in t.get("faltas", {}).get("filas", []) if f[1]]
+        if "faltas" in t and len(filas) < len(t["faltas"]["filas"]):
+            t["faltas"]["filas"] = filas
+            cambio = True
+    return cambio
+
+
+def _faltas_solo_ultimo_trimestre(datos):
+    trimestres = list(datos.get("trimestres", {}).values())
+    cambio = False
+    for t in trimestres[:-1]:
+        cambio = t.pop("faltas", None) is not None or cambio
+    return cambio
+
+
+def _mal_comportamiento_solo_total(datos):
+    cambio = False
+    for t in datos.get("trimestres", {}).values():
+        cambio = t.pop("mal_comp", None) is not None or cambio
+    return cambio
+
+
+def _faltas_principales(datos, n=10):
+    cambio = False
+    for t in datos.get("trimestres", {}).values():
+        filas = t.get("faltas", {}).get("filas", [])
+        if len(filas) > n:
+            t["faltas"]["filas"] = sorted(filas, key=lambda f: -(f[1] or 0))[:n]
+            t["faltas_omitidas"] = len(filas) - n
+            cambio = True
+    return cambio
+
+
+def _en_riesgo_principales(datos, n=15):
+    if len(datos.get("en_riesgo", [])) <= n:
+        return False
+    datos["en_riesgo_omitidos"] = len(datos["en_riesgo"]) - n
+    datos["en_riesgo"] = datos["en_riesgo"][:n]
+    return True
+
+
+def _sin_faltas_por_estudiante(datos):
+    cambio = False
+    for t in datos.get("trimestres", {}).values():
+        cambio = t.pop("faltas", None) is not None or cambio
+        t.pop("faltas_omitidas", None)
+    return cambio
+
+
+RECORTES_GRUPAL = [
+    ("faltas: solo estudiantes con injustificadas", _faltas_solo_injustificadas),
+    ("faltas: solo el último trimestre", _faltas_solo_ultimo_trimestre),
+    ("mal comportamiento: solo totales", _mal_comportamiento_solo_total),
+    ("faltas: los 10 con más injustificadas", _faltas_principales),
+    ("en riesgo: los 15 primeros", _en_riesgo_principales),
+    ("faltas: solo totales", _sin_faltas_por_estudiante),
+]
+
+
+def ajustar_a_presupuesto(armar, datos, recortes=(), max_tokens=None):
+    """
+    Arma el prompt y, mientras supere el presupuesto, aplica los recortes.
+
+    Args:
+        armar: Función datos_serializados -> prompt
+        datos: Datos compactos (se modifican)
+        recortes: Lista de (descripción, función)
+        max_tokens: Presupuesto (por defecto, settings.PROMPT_MAX_TOKENS)
+
+    Returns:
+        tuple: (prompt, tokens, lista de recortes aplicados)
+    """
+    if max_tokens is None:
+        max_tokens = getattr(settings, "PROMPT_MAX_TOKENS", None)
+
+    prompt = armar(serializar(datos))
+    tokens = contar_tokens(prompt)
+    aplicados = []
+    if not isinstance(datos, dict):
+        recortes = ()
+    for descripcion, recorte in recortes:
+        if not max_tokens or tokens <= max_tokens:
+            break
+        if recorte(datos):
+            aplicados.append(descripcion)
+            prompt = armar(serializar(datos))
+            tokens = contar_tokens(prompt)
+
+    if max_tokens and tokens > max_tokens:
+        logger.warning("El prompt sigue superando el presupuesto: ~%d tokens de %d", tokens, max_tokens)
+    return prompt, tokens, aplicados
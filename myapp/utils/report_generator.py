@@ -1,90 +1,90 @@
 import pandas as pd
+import numpy as np
 import json
-import ollama
-from fpdf import FPDF, XPos, YPos
-import re
+from fpdf import XPos, YPos
 import io
-import os
 from django.conf import settings
-
-OLLAMA_MODEL = "gemma3:12b"
+from .narrativa_ast import parsear_narrativa, texto_documento
+from .pdf_plantilla import nuevo_documento
 
 # =============================
 # FUNCIÓN PDF UTF-8 (Se mantiene igual)
 # =============================
-def generar_pdf(titulo, contenido):
-    # ... (Tu código de PDF se mantiene idéntico) ...
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    fonts_dir = os.path.join(base_dir, 'static', 'fonts')
-    try:
-        pdf.add_font("DejaVu", "", os.path.join(fonts_dir, "DejaVuSans.ttf"))
-        pdf.add_font("DejaVu", "B", os.path.join(fonts_dir, "DejaVuSans-Bold.ttf"))
-        pdf.add_font("DejaVu", "I", os.path.join(fonts_dir, "DejaVuSans-Oblique.ttf"))
-        font_family = "DejaVu"
-    except Exception as e:
-        print(f"⚠️ No se pudieron cargar las fuentes DejaVu: {e}")
-        font_family = "Arial"
-    pdf.set_font(font_family, "B", 16)
-    pdf.cell(0, 12, titulo, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+def generar_pdf(titulo, contenido, destino=None):
+    """
+    Renderiza el reporte en PDF. Las fuentes se cargan una vez por proceso
+    (utils/pdf_plantilla.py).
+
+    Args:
+        titulo: Título del reporte
+        contenido: Narrativa en Markdown simple
+        destino: Ruta o archivo abierto donde escribir el PDF. Si se omite,
+                 se devuelve un BytesIO.
+
+    Returns:
+        El destino (o el BytesIO) con el PDF escrito
+    """
+    return generar_pdf_documento(parsear_narrativa(titulo, contenido), destino)
+
+
+def generar_pdf_documento(documento, destino=None):
+    """
+    Igual que generar_pdf, a partir de la narrativa ya analizada
+    (utils/narrativa_ast.py).
+    """
+    pdf, font_family = nuevo_documento(texto_documento(documento))
+    return renderizar_pdf(pdf, font_family, documento, destino)
+
+
+def renderizar_pdf(pdf, font_family, documento, destino=None):
+    """
+    Escribe un documento (utils/narrativa_ast.py) en un FPDF ya preparado
+    (con una página y las fuentes agregadas) y lo guarda en destino.
+    """
+    actual = [None]
+
+    def fuente(estilo, tamano):
+        # Solo se cambia de fuente cuando el bloque usa otra
+        if actual[0] != (estilo, tamano):
+            pdf.set_font(font_family, estilo, tamano)
+            actual[0] = (estilo, tamano)
+
+    def escribir_runs(runs):
+        for texto, negrita in runs:
+            fuente("B" if negrita else "", 12)
+            pdf.write(8, texto)
+
+    fuente("B", 16)
+    pdf.cell(0, 12, documento["titulo"], new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
     pdf.ln(8)
-    contenido = contenido.replace(":-", ":\n-")
-    contenido = re.sub(r"^\*\s+", "- ", contenido, flags=re.MULTILINE)
-    lines = contenido.split("\n")
-    for line in lines:
-        line = line.strip()
-        if not line:
+    for bloque in documento["bloques"]:
+        tipo = bloque["tipo"]
+        if tipo == "espacio":
             pdf.ln(5)
-            continue
-        if line.startswith("## "):
-            text = line.replace("## ", "")
-            pdf.set_font(font_family, "B", 14)
-            pdf.multi_cell(190, 10, text=text)
+        elif tipo == "h2":
+            fuente("B", 14)
+            pdf.multi_cell(190, 10, text=bloque["texto"])
             pdf.ln(2)
-            pdf.set_font(font_family, "", 12)
-            continue
-        if line.startswith("### "):
-            text = line.replace("### ", "")
-            pdf.set_font(font_family, "I", 12)
-            pdf.multi_cell(190, 9, text=text)
+        elif tipo == "h3":
+            fuente("I", 12)
+            pdf.multi_cell(190, 9, text=bloque["texto"])
             pdf.ln(2)
-            pdf.set_font(font_family, "", 12)
-            continue
-        if line.startswith("- "):
-            bullet = "• "
-            text = line[2:].strip()
+        elif tipo == "vineta":
             pdf.set_x(20)
-            pdf.set_font(font_family, "", 12)
-            pdf.write(8, bullet)
-            if "**" in text:
-                parts = re.split(r"(\*\*(?:.*?)\*\*)", text)
-                for part in parts:
-                    if part.startswith("**") and part.endswith("**"):
-                        pdf.set_font(font_family, "B", 12)
-                        pdf.write(8, part.strip("**"))
-                        pdf.set_font(font_family, "", 12)
-                    else:
-                        pdf.write(8, part)
-            else:
-                pdf.write(8, text)
+            fuente("", 12)
+            pdf.write(8, "• ")
+            escribir_runs(bloque["runs"])
             pdf.ln(8)
-            continue
-        if "**" in line:
-            parts = re.split(r"(\*\*(?:.*?)\*\*)", line)
-            pdf.set_font(font_family, "", 12)
-            for part in parts:
-                if part.startswith("**") and part.endswith("**"):
-                    pdf.set_font(font_family, "B", 12)
-                    pdf.write(8, part.strip("**"))
-                    pdf.set_font(font_family, "", 12)
-                else:
-                    pdf.write(8, part)
+        elif tipo == "runs":
+            escribir_runs(bloque["runs"])
             pdf.ln(8)
-            continue
-        pdf.set_font(font_family, "", 12)
-        pdf.multi_cell(190, 8, text=line)
+        else:
+            fuente("", 12)
+            pdf.multi_cell(190, 8, text=bloque["texto"])
+    if destino is not None:
+        # Directo al archivo, sin buffer intermedio
+        pdf.output(destino)
+        return destino
     buffer = io.BytesIO()
     pdf.output(buffer)
     buffer.seek(0)
@@ -103,6 +103,8 @@ def analizar_evolucion_detallada(valores):
             return "Empeoró en el segundo trimestre."
         else:
             return "Se mantuvo estable entre ambos trimestres."
+    if len(valores) > 3:
+        return analizar_evolucion_periodos(valores)
     T1, T2, T3 = valores
     if T2 > T1 and T3 > T2:
         return "Mejoró de forma continua en los tres trimestres."
@@ -117,20 +119,160 @@ def analizar_evolucion_detallada(valores):
     else:
         return "Mostró un rendimiento variable con altibajos."
 
+
+def analizar_evolucion_periodos(valores):
+    """
+    Evolución para libros con más de tres hojas (p. ej. parciales o meses).
+    """
+    diferencias = [b - a for a, b in zip(valores, valores[1:])]
+    if all(d > 0 for d in diferencias):
+        return "Mejoró de forma continua en todos los periodos."
+    elif all(d < 0 for d in diferencias):
+        return "Empeoró de forma continua a lo largo de todos los periodos."
+    elif all(abs(d) <= 0.1 for d in diferencias):
+        return "Se mantuvo estable durante todos los periodos."
+    elif valores[-1] > valores[0] + 0.1:
+        return "Mostró altibajos, pero terminó por encima del primer periodo."
+    elif valores[-1] < valores[0] - 0.1:
+        return "Mostró altibajos y terminó por debajo del primer periodo."
+    else:
+        return "Mostró un rendimiento variable con altibajos."
+
 # =============================
-# REPORTE GRUPAL (ESTA ES LA PARTE MODIFICADA)
+# REPORTE GRUPAL
 # =============================
+COMPONENTES_GRUPALES = ["Aporte Individual", "Aporte Grupal", "Proyecto", "Examen"]
+
+COLUMNAS_GRUPALES = [
+    "APELLIDOS/NOMBRES", "Nota Trimemestre", *COMPONENTES_GRUPALES,
+    "Falta Injustificada", "Falta Justificada", "Comportamiento"
+]
+
+
 def generar_reporte_grupal_completo(hojas):
+    """
+    Genera el resumen grupal de todos los trimestres.
+
+    Motor "long-form": une todas las hojas en un solo DataFrame (con el trimestre
+    como clave) y calcula las estadísticas de cada trimestre con operaciones
+    agrupadas, en lugar de repetir nlargest/nsmallest/to_dict hoja por hoja.
+    El resultado es idéntico al de la implementación original por hojas
+    (comando bench_reporte_grupal).
+    """
+    estatus = _estatus_academico_acumulado(hojas)
+    reportes = _resumenes_trimestrales(hojas) if hojas else {}
+    return _ensamblar_reporte_grupal(list(hojas.keys()), reportes, estatus)
+
+
+def _resumenes_trimestrales(hojas):
+    """
+    Calcula el resumen de cada trimestre sobre el DataFrame largo.
+
+    Returns:
+        dict: {trimestre: resumen} en el orden de las hojas
+    """
+    nombres_hojas = list(hojas.keys())
+    tamanos = [len(df) for df in hojas.values()]
+
+    largo = pd.concat([df[COLUMNAS_GRUPALES] for df in hojas.values()], ignore_index=True)
+    trimestre = np.repeat(np.arange(len(nombres_hojas)), tamanos)
+    largo["_trimestre"] = trimestre
+
+    # to_dict(orient="records") devuelve int o float según el tipo de cada hoja;
+    # se conserva ese tipo aunque el concat haya unificado las columnas a float.
+    def conversores(columna):
+        return [
+            int if pd.api.types.is_integer_dtype(df[columna].dtype) else float
+            for df in hojas.values()
+        ]
+
+    conv_nota = conversores("Nota Trimemestre")
+    conv_inj = conversores("Falta Injustificada")
+    conv_just = conversores("Falta Justificada")
+
+    # Promedios y totales de faltas de todos los trimestres en un groupby.
+    # reindex mantiene las hojas vacías (promedio NaN y 0 faltas, como antes).
+    por_trimestre = largo.groupby("_trimestre")
+    todos = pd.RangeIndex(len(nombres_hojas))
+    medias = por_trimestre[["Nota Trimemestre", *COMPONENTES_GRUPALES]].mean().reindex(todos)
+    promedios = [round(valor, 2) for valor in medias["Nota Trimemestre"].to_numpy()]
+    componentes = {comp: medias[comp].to_numpy() for comp in COMPONENTES_GRUPALES}
+
+    # Faltas
+    inj = largo["Falta Injustificada"].fillna(0)
+    just = largo["Falta Justificada"].fillna(0)
+    totales = pd.DataFrame({"inj": inj, "just": just}).groupby(largo["_trimestre"]).sum().reindex(todos, fill_value=0)
+    total_inj = [int(valor) for valor in totales["inj"]]
+    total_just = [int(valor) for valor in totales["just"]]
+
+    con_faltas = ((inj > 0) | (just > 0)).to_numpy()
+    faltas_por_estudiante = [[] for _ in nombres_hojas]
+    for t, nombre, f_inj, f_just in zip(
+            trimestre[con_faltas].tolist(),
+            largo["APELLIDOS/NOMBRES"].fillna(0).to_numpy(dtype=object)[con_faltas].tolist(),
+            inj.to_numpy()[con_faltas].tolist(),
+            just.to_numpy()[con_faltas].tolist()):
+        faltas_por_estudiante[t].append({
+            "APELLIDOS/NOMBRES": nombre,
+            "Falta Injustificada": conv_inj[t](f_inj),
+            "Falta Justificada": conv_just[t](f_just)
+        })
+
+    # Mejores y peores 3 por trimestre
+    notas = largo[["_trimestre", "APELLIDOS/NOMBRES", "Nota Trimemestre"]]
+    mejores = _primeros_por_trimestre(notas, len(nombres_hojas), ascendente=False, conv_nota=conv_nota)
+    peores = _primeros_por_trimestre(notas, len(nombres_hojas), ascendente=True, conv_nota=conv_nota)
+
+    # Comportamiento
+    mal_comportamiento = [[] for _ in nombres_hojas]
+    es_f = (largo["Comportamiento"] == "F").to_numpy()
+    for t, nombre in zip(trimestre[es_f].tolist(), largo["APELLIDOS/NOMBRES"].to_numpy(dtype=object)[es_f].tolist()):
+        mal_comportamiento[t].append(nombre)
+
     reportes = {}
-    promedios_trimestres = {}
-    componentes_por_trimestre = {}
+    for t, nombre_hoja in enumerate(nombres_hojas):
+        reportes[nombre_hoja] = {
+            "promedio_general": promedios[t],
+            "Buen rendimiento": mejores[t],
+            "Bajo rendimiento": peores[t],
+            "total_faltas_injustificadas": total_inj[t],
+            "total_faltas_justificadas": total_just[t],
+            "faltas_por_estudiante": faltas_por_estudiante[t],
+            "estudiantes_mal_comportamiento": mal_comportamiento[t],
+            "total_mal_comportamiento": len(mal_comportamiento[t]),
+            "componentes_promedio": pd.Series(
+                {comp: componentes[comp][t] for comp in COMPONENTES_GRUPALES}
+            ).round(2).to_dict()
+        }
+    return reportes
+
+
+def _primeros_por_trimestre(notas, num_trimestres, ascendente, conv_nota, n=3):
+    """
+    Devuelve, para cada trimestre, los n registros con mayor (o menor) nota.
+
+    Reproduce nlargest/nsmallest(keep="first"): el ordenamiento por varias
+    columnas es estable (los empates quedan en orden de aparición) y las notas
+    vacías van al final, por lo que solo aparecen si hay menos de n notas.
+    """
+    ordenado = notas.sort_values(
+        ["_trimestre", "Nota Trimemestre"], ascending=[True, ascendente]
+    ).groupby("_trimestre", sort=False).head(n)
+
+    resultado = [[] for _ in range(num_trimestres)]
+    for t, nombre, valor in zip(ordenado["_trimestre"], ordenado["APELLIDOS/NOMBRES"], ordenado["Nota Trimemestre"]):
+        resultado[t].append({"APELLIDOS/NOMBRES": nombre, "Nota Trimemestre": conv_nota[t](valor)})
+    return resultado
 
-    # -------------------------------------------------------------------------
-    # ### NUEVO CÓDIGO: CÁLCULO ACUMULADO GLOBAL
+
+def _estatus_academico_acumulado(hojas):
+    """
+    Promedio acumulado de todos los trimestres por estudiante y conteo de
+    aprobados/reprobados sobre ese promedio.
+    """
     # Unificamos todos los trimestres para sacar el promedio real hasta la fecha
-    # -------------------------------------------------------------------------
     datos_consolidados = []
-    
+
     for nombre, df in hojas.items():
         # Extraemos solo nombre y nota, renombramos la nota al nombre del trimestre
         temp = df[["APELLIDOS/NOMBRES", "Nota Trimemestre"]].copy()
@@ -146,66 +288,46 @@ def generar_reporte_grupal_completo(hojas):
     if datos_consolidados:
         # Unimos las columnas de todos los trimestres alineando por estudiante
         df_global = pd.concat(datos_consolidados, axis=1)
-        
+
         # Calculamos promedio acumulado (ignora celdas vacías automáticamente)
         df_global["Promedio_Acumulado"] = df_global.mean(axis=1)
-        
+
         # Contamos aprobados y reprobados sobre el promedio total
         total_aprobados_acum = int((df_global["Promedio_Acumulado"] >= 7).sum())
         total_reprobados_acum = int((df_global["Promedio_Acumulado"] < 7).sum())
-        
+
         # Obtenemos la lista de nombres de los reprobados
         lista_reprobados = df_global[df_global["Promedio_Acumulado"] < 7].index.tolist()
-    # -------------------------------------------------------------------------
-
-    # Iteramos cada trimestre para el reporte individual
-    for nombre, df in hojas.items():
-        resumen = {}
-
-        resumen["promedio_general"] = round(df["Nota Trimemestre"].mean(), 2)
-
-        top3 = df.nlargest(3, "Nota Trimemestre")[["APELLIDOS/NOMBRES", "Nota Trimemestre"]]
-        resumen["Buen rendimiento"] = top3.to_dict(orient="records")
-
-        bottom3 = df.nsmallest(3, "Nota Trimemestre")[["APELLIDOS/NOMBRES", "Nota Trimemestre"]]
-        resumen["Bajo rendimiento"] = bottom3.to_dict(orient="records")
-
-        resumen["total_faltas_injustificadas"] = int(df["Falta Injustificada"].fillna(0).sum())
-        resumen["total_faltas_justificadas"] = int(df["Falta Justificada"].fillna(0).sum())
-
-        faltas_detalle = df[["APELLIDOS/NOMBRES", "Falta Injustificada", "Falta Justificada"]].fillna(0)
-        faltas_detalle = faltas_detalle[
-            (faltas_detalle["Falta Injustificada"] > 0) |
-            (faltas_detalle["Falta Justificada"] > 0)
-        ]
-        resumen["faltas_por_estudiante"] = faltas_detalle.to_dict(orient="records")
 
-        mal_comportamiento = df[df["Comportamiento"] == "F"]["APELLIDOS/NOMBRES"].tolist()
-        resumen["estudiantes_mal_comportamiento"] = mal_comportamiento
-        resumen["total_mal_comportamiento"] = len(mal_comportamiento)
+    return {
+        "total_aprobados": total_aprobados_acum,
+        "total_reprobados": total_reprobados_acum,
+        "estudiantes_en_riesgo": lista_reprobados  # Lista de nombres
+    }
 
-        componentes = ["Aporte Individual", "Aporte Grupal", "Proyecto", "Examen"]
-        resumen["componentes_promedio"] = df[componentes].mean().round(2).to_dict()
 
-        reportes[nombre] = resumen
-        promedios_trimestres[nombre] = resumen["promedio_general"]
-        componentes_por_trimestre[nombre] = resumen["componentes_promedio"]
+def _ensamblar_reporte_grupal(orden_trimestres, reportes, estatus):
+    """
+    Agrega el análisis de evolución y las fortalezas/debilidades grupales a
+    los resúmenes trimestrales y arma el diccionario final.
+    """
+    promedios_trimestres = {t: r["promedio_general"] for t, r in reportes.items()}
+    componentes_por_trimestre = {t: r["componentes_promedio"] for t, r in reportes.items()}
 
     # Análisis de evolución
-    orden_trimestres = list(hojas.keys())
     evolucion = {}
 
     valores_prom = [promedios_trimestres[t] for t in orden_trimestres if t in promedios_trimestres]
     if len(valores_prom) >= 2:
         evolucion["promedio_general"] = analizar_evolucion_detallada(valores_prom)
 
-    for comp in ["Aporte Individual", "Aporte Grupal", "Proyecto", "Examen"]:
+    for comp in COMPONENTES_GRUPALES:
         valores = [componentes_por_trimestre[t][comp] for t in orden_trimestres if t in componentes_por_trimestre]
         if len(valores) >= 2:
             evolucion[comp] = analizar_evolucion_detallada(valores)
 
     # Fortalezas/debilidades globales
-    componentes_global = {comp: [] for comp in ["Aporte Individual", "Aporte Grupal", "Proyecto", "Examen"]}
+    componentes_global = {comp: [] for comp in COMPONENTES_GRUPALES}
     for t in componentes_por_trimestre:
         for comp, val in componentes_por_trimestre[t].items():
             componentes_global[comp].append(val)
@@ -220,12 +342,8 @@ def generar_reporte_grupal_completo(hojas):
                 debilidades.append(comp)
 
     return {
-        # ### NUEVO: Agregamos la sección global al principio del reporte
-        "estatus_academico_acumulado": {
-            "total_aprobados": total_aprobados_acum,
-            "total_reprobados": total_reprobados_acum,
-            "estudiantes_en_riesgo": lista_reprobados # Lista de nombres
-        },
+        # Sección global al principio del reporte
+        "estatus_academico_acumulado": estatus,
         "reportes_trimestrales": reportes,
         "analisis_evolucion_grupal": evolucion,
         "fortalezas_debilidades_grupales": {
@@ -234,9 +352,20 @@ def generar_reporte_grupal_completo(hojas):
         }
     }
 
+
 # =============================
 # REPORTE INDIVIDUAL (Se mantiene igual)
 # =============================
+def celda(valor, convertir=None):
+    """
+    Valor de una celda para el JSON del reporte. Las celdas vacías (NaN) son
+    None: el reporte se guarda en un JSONField y NaN no es JSON válido.
+    """
+    if pd.isna(valor):
+        return None
+    return convertir(valor) if convertir else valor
+
+
 def reporte_individual(nombre_estudiante, hojas):
     reporte = {
         "nombre": nombre_estudiante,
@@ -256,29 +385,39 @@ def reporte_individual(nombre_estudiante, hojas):
         fila = fila.iloc[0]
 
         reporte["trimestres"][trimestre] = {
-            "nota_final": float(fila["Nota Trimemestre"]),
-            "cualitativa": fila["Cualitativa"],
+            "nota_final": celda(fila["Nota Trimemestre"], float),
+            "cualitativa": celda(fila["Cualitativa"]),
             "componentes": {
-                "aporte_individual": float(fila["Aporte Individual"]),
-                "aporte_grupal": float(fila["Aporte Grupal"]),
-                "proyecto": float(fila["Proyecto"]),
-                "examen": float(fila["Examen"])
+                "aporte_individual": celda(fila["Aporte Individual"], float),
+                "aporte_grupal": celda(fila["Aporte Grupal"], float),
+                "proyecto": celda(fila["Proyecto"], float),
+                "examen": celda(fila["Examen"], float)
             },
             "faltas": {
                 "injustificadas": int(fila["Falta Injustificada"]) if not pd.isna(fila["Falta Injustificada"]) else 0,
                 "justificadas": int(fila["Falta Justificada"]) if not pd.isna(fila["Falta Justificada"]) else 0
             },
-            "comportamiento": fila["Comportamiento"]
+            "comportamiento": celda(fila["Comportamiento"])
         }
 
+    completar_analisis_individual(reporte, list(hojas.keys()))
+
+    return reporte
+
+
+def completar_analisis_individual(reporte, orden_trimestres):
+    """
+    Agrega al reporte individual el análisis de evolución y las fortalezas/debilidades
+    a partir de los datos ya cargados en reporte["trimestres"].
+    """
     # ANÁLISIS DE EVOLUCIÓN DETALLADA
-    orden_trimestres = list(hojas.keys())
 
     # Evolución de nota final
+    # Las celdas vacías (None) no entran en la evolución
     notas = [
         reporte["trimestres"][t]["nota_final"]
         for t in orden_trimestres
-        if isinstance(reporte["trimestres"][t], dict)
+        if isinstance(reporte["trimestres"][t], dict) and reporte["trimestres"][t]["nota_final"] is not None
     ]
 
     if len(notas) >= 2:
@@ -292,7 +431,8 @@ def reporte_individual(nombre_estudiante, hojas):
     for t in orden_trimestres:
         if isinstance(reporte["trimestres"][t], dict):
             for comp, val in reporte["trimestres"][t]["componentes"].items():
-                componentes_valores[comp].append(val)
+                if val is not None:
+                    componentes_valores[comp].append(val)
 
     for comp, valores in componentes_valores.items():
         if len(valores) >= 2:
@@ -315,4 +455,82 @@ def reporte_individual(nombre_estudiante, hojas):
         "debilidades": debilidades
     }
 
-    return reporte
\ No newline at end of file
+
+# =============================
+# REPORTES INDIVIDUALES EN LOTE
+# =============================
+COLUMNAS_INDIVIDUAL = [
+    "APELLIDOS/NOMBRES", "Nota Trimemestre", "Cualitativa",
+    "Aporte Individual", "Aporte Grupal", "Proyecto", "Examen",
+    "Falta Injustificada", "Falta Justificada", "Comportamiento"
+]
+
+
+def reportes_individuales_batch(hojas, nombres=None):
+    """
+    Genera el reporte individual de todos los estudiantes en una sola pasada.
+
+    Equivale a llamar a reporte_individual(nombre, hojas) para cada nombre, pero
+    en lugar de filtrar cada hoja una vez por estudiante, une todas las hojas en
+    un solo DataFrame largo (con el trimestre como columna) y lo recorre una vez.
+
+    Args:
+        hojas: dict {trimestre: DataFrame}
+        nombres: Lista de estudiantes a incluir (por defecto, todos los de las hojas)
+
+    Returns:
+        dict: {nombre_estudiante: reporte_individual}
+    """
+    orden_trimestres = list(hojas.keys())
+    if not orden_trimestres:
+        return {nombre: reporte_individual(nombre, hojas) for nombre in (nombres or [])}
+
+    largo = pd.concat(
+        [df[COLUMNAS_INDIVIDUAL].assign(_trimestre=pos) for pos, df in enumerate(hojas.values())],
+        ignore_index=True
+    )
+    if nombres is None:
+        nombres = largo["APELLIDOS/NOMBRES"].dropna().unique().tolist()
+    else:
+        largo = largo[largo["APELLIDOS/NOMBRES"].isin(nombres)]
+
+    # reporte_individual usa la primera fila de cada estudiante en cada hoja
+    largo = largo.drop_duplicates(subset=["_trimestre", "APELLIDOS/NOMBRES"], keep="first")
+
+    reportes = {}
+    for nombre in nombres:
+        if nombre in reportes:
+            continue
+        reportes[nombre] = {
+            "nombre": nombre,
+            "trimestres": {t: "No se encontraron datos" for t in orden_trimestres},
+            "analisis_evolucion": {},
+            "fortalezas_debilidades": {}
+        }
+
+    for (nombre, pos, nota, cualitativa, ap_ind, ap_grp, proyecto, examen,
+         falta_inj, falta_just, comportamiento) in zip(
+            largo["APELLIDOS/NOMBRES"], largo["_trimestre"], largo["Nota Trimemestre"],
+            largo["Cualitativa"], largo["Aporte Individual"], largo["Aporte Grupal"],
+            largo["Proyecto"], largo["Examen"], largo["Falta Injustificada"],
+            largo["Falta Justificada"], largo["Comportamiento"]):
+        reportes[nombre]["trimestres"][orden_trimestres[pos]] = {
+            "nota_final": celda(nota, float),
+            "cualitativa": celda(cualitativa),
+            "componentes": {
+                "aporte_individual": celda(ap_ind, float),
+                "aporte_grupal": celda(ap_grp, float),
+                "proyecto": celda(proyecto, float),
+                "examen": celda(examen, float)
+            },
+            "faltas": {
+                "injustificadas": int(falta_inj) if not pd.isna(falta_inj) else 0,
+                "justificadas": int(falta_just) if not pd.isna(falta_just) else 0
+            },
+            "comportamiento": celda(comportamiento)
+        }
+
+    for reporte in reportes.values():
+        completar_analisis_individual(reporte, orden_trimestres)
+
+    return reportes
@@ -0,0 +1,64 @@
+"""
+Versiones por usuario guardadas en el caché de Django.
+
+Cada ámbito (p. ej. 'reportes') tiene un número de versión por usuario que se
+incrementa cuando cambian sus datos. Las vistas lo usan para ETag/Last-Modified
+y como parte de las claves de caché, sin consultar la base de datos.
+
+También están aquí los contadores de aciertos y fallos de los cachés
+(métricas del dashboard y narrativas).
+"""
+
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+
+def _clave(ambito, usuario_id):
+    return f"version:{ambito}:{usuario_id}"
+
+
+def obtener_version(ambito, usuario_id):
+    """
+    Devuelve la versión actual (microsegundos desde epoch). Si no existe
+    (caché vacío o reiniciado) se crea una nueva.
+
+    Returns:
+        int
+    """
+    version = cache.get(_clave(ambito, usuario_id))
+    if version is None:
+        version = time.time_ns() // 1000
+        if not cache.add(_clave(ambito, usuario_id), version, timeout=None):
+            version = cache.get(_clave(ambito, usuario_id), version)
+    return version
+
+
+def incrementar_version(ambito, usuario_id):
+    """
+    Marca los datos del usuario como modificados.
+    """
+    anterior = cache.get(_clave(ambito, usuario_id), 0)
+    # Siempre creciente aunque dos cambios caigan en el mismo microsegundo
+    version = max(time.time_ns() // 1000, anterior + 1)
+    cache.set(_clave(ambito, usuario_id), version, timeout=None)
+    return version
+
+
+def incrementar_contador(contador):
+    """
+    Incrementa un contador en el caché de Django (lo crea si no existe).
+    """
+    cache.add(contador, 0, timeout=None)
+    try:
+        cache.incr(contador)
+    except ValueError:
+        cache.set(contador, 1, timeout=None)
+
+
+def fecha_version(version):
+    """
+    Convierte una versión en la fecha de modificación (para Last-Modified).
+    """
+    return datetime.fromtimestamp(version / 1_000_000, tz=timezone.utc)
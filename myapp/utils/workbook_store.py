@@ -0,0 +1,150 @@
+"""
+Copia columnar (Feather/Arrow) de los libros de notas.
+
+Al subir un archivo se guarda una copia ya parseada de todas sus hojas junto al
+ArchivoNotas. Las lecturas posteriores la cargan con memory-map en lugar de
+volver a parsear el .xlsx con openpyxl. Si la copia no existe (archivos
+antiguos o pyarrow no instalado) o está desactualizada (el .xlsx cambió o la
+copia es de otra versión del formato) se vuelve a leer el Excel.
+"""
+
+import json
+import logging
+import os
+import shutil
+
+from django.conf import settings
+
+from .excel_readers import leer_libro
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_DIR = "columnar"
+INDICE = "indice.json"
+# Cambiar si cambia lo que se guarda (columnas, tipos): las copias anteriores
+# se regeneran desde el Excel
+VERSION_COPIA = 2
+
+
+def ruta_copia_columnar(archivo):
+    """
+    Carpeta donde se guarda la copia columnar de un ArchivoNotas.
+    """
+    return os.path.join(settings.MEDIA_ROOT, COLUMNAR_DIR, str(archivo.pk))
+
+
+def firma_origen(archivo):
+    """
+    Nombre, tamaño y fecha de modificación del .xlsx. Si cambian, la copia
+    columnar ya no corresponde al archivo.
+    """
+    firma = {"nombre": archivo.archivo.name}
+    try:
+        estado = os.stat(archivo.archivo.path)
+    except (OSError, NotImplementedError, ValueError):
+        return firma
+    firma.update({"tamano": estado.st_size, "modificado": estado.st_mtime_ns})
+    return firma
+
+
+def guardar_copia_columnar(archivo, hojas):
+    """
+    Guarda cada hoja como un archivo Feather sin comprimir (para poder leerlo
+    con memory-map) y un índice con el orden original de las hojas.
+
+    Returns:
+        bool: True si se guardó la copia
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import feather
+    except ImportError:
+        logger.warning("pyarrow no está instalado: no se guarda la copia columnar")
+        return False
+
+    carpeta = ruta_copia_columnar(archivo)
+    try:
+        # Sin restos de una copia anterior (p. ej. con más hojas)
+        shutil.rmtree(carpeta, ignore_errors=True)
+        os.makedirs(carpeta)
+
+        indice = []
+        for posicion, (nombre, df) in enumerate(hojas.items()):
+            nombre_archivo = f"hoja_{posicion:03d}.feather"
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(tabla, os.path.join(carpeta, nombre_archivo), compression="uncompressed")
+            indice.append({"hoja": nombre, "archivo": nombre_archivo})
+
+        # El índice se escribe al final: su presencia indica que la copia está completa
+        with open(os.path.join(carpeta, INDICE), "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION_COPIA, "origen": firma_origen(archivo), "hojas": indice}, f, ensure_ascii=False)
+        return True
+    except Exception as e:
+        # Columnas con tipos mezclados, disco lleno, etc.: se seguirá leyendo el Excel
+        logger.warning("No se pudo guardar la copia columnar del archivo %s: %s", archivo.pk, e)
+        shutil.rmtree(carpeta, ignore_errors=True)
+        return False
+
+
+def cargar_copia_columnar(archivo):
+    """
+    Carga la copia columnar de un archivo.
+
+    Returns:
+        dict o None si la copia no existe, está desactualizada o no se pudo leer
+    """
+    ruta_indice = os.path.join(ruta_copia_columnar(archivo), INDICE)
+    if not os.path.exists(ruta_indice):
+        return None
+
+    try:
+        from pyarrow import feather
+
+        with open(ruta_indice, encoding="utf-8") as f:
+            indice = json.load(f)
+
+        if (
+            not isinstance(indice, dict)
+            or indice.get("version") != VERSION_COPIA
+            or indice.get("origen") != firma_origen(archivo)
+        ):
+            logger.info("La copia columnar del archivo %s está desactualizada; se lee el Excel", archivo.pk)
+            return None
+
+        carpeta = ruta_copia_columnar(archivo)
+        return {
+            entrada["hoja"]: feather.read_table(
+                os.path.join(carpeta, entrada["archivo"]), memory_map=True
+            ).to_pandas()
+            for entrada in indice["hojas"]
+        }
+    except Exception as e:
+        logger.warning("No se pudo leer la copia columnar del archivo %s: %s", archivo.pk, e)
+        return None
+
+
+def cargar_hojas(archivo):
+    """
+    Devuelve las hojas del archivo, usando la copia columnar si existe y está
+    al día. Si no, vuelve a parsear el Excel y guarda la copia para la próxima vez.
+
+    Args:
+        archivo: Instancia de ArchivoNotas
+
+    Returns:
+        dict: {nombre_hoja: DataFrame}
+    """
+    hojas = cargar_copia_columnar(archivo)
+    if hojas is not None:
+        return hojas
+
+    hojas = leer_libro(archivo.archivo.path)
+    guardar_copia_columnar(archivo, hojas)
+    return hojas
+
+
+def eliminar_copia_columnar(archivo):
+    """
+    Elimina la copia columnar de un archivo (si existe).
+    """
+    shutil.rmtree(ruta_copia_columnar(archivo), ignore_errors=True)
@@ -1,24 +1,35 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login as auth_login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.base import ContentFile
-import pandas as pd
+from django.views.decorators.http import condition
+from datetime import datetime, timedelta
+import base64
+import hashlib
 import json
-import ollama
-import httpx
+import logging
 import os
-from .models import ArchivoNotas, Estudiante, ReporteGenerado
-from .utils.report_generator import (
-    generar_pdf,
-    generar_reporte_grupal_completo,
-    reporte_individual,
-    OLLAMA_MODEL
-)
-from .prompts import get_prompt_reporte_grupal, get_prompt_reporte_individual
+from .models import ArchivoNotas, LoteReportes, ReporteGenerado, TrabajoReporte
+from .services import ReportService, UploadService
+from .utils.descargas import MAX_ARCHIVOS_ZIP, respuesta_descarga, respuesta_zip
+from .utils.excel_readers import validar_encabezados
+from .utils.paginacion import leer_limite, paginar_keyset
+from .utils.process_pool import ProcesoCaido
+from .utils.versiones import fecha_version, obtener_version
+from .utils.report_generator import reporte_individual
+from .utils.workbook_store import eliminar_copia_columnar
+
+logger = logging.getLogger(__name__)
 
 
 # === Página principal (landing pública) ===
@@ -87,13 +98,12 @@ def get_metricas(request):
     try:
         from .services import MetricsService
         
-        # Obtener archivo activo usando el servicio
-        archivo = MetricsService.get_or_set_active_file(request.user)
-        
-        # Calcular métricas usando el servicio
-        metricas = MetricsService.calculate_dashboard_metrics(archivo, request.user)
+        # Métricas desde el caché (se invalida al subir/activar/eliminar archivos o generar reportes)
+        metricas, desde_cache = MetricsService.get_cached_dashboard_metrics(request.user)
         
-        return JsonResponse(metricas)
+        response = JsonResponse(metricas)
+        response["X-Cache"] = "HIT" if desde_cache else "MISS"
+        return response
         
     except Exception as e:
         return JsonResponse({"error": str(e), "sin_datos": True}, status=500)
@@ -113,33 +123,23 @@ def upload_view(request):
             if not archivo:
                 return JsonResponse({"error": "No se envió ningún archivo."}, status=400)
 
-            # Guardar archivo en la base de datos
-            nuevo_archivo = ArchivoNotas.objects.create(
-                usuario=request.user,
-                nombre=archivo.name,
-                archivo=archivo
-            )
-
-            # Leer el Excel
-            xls = pd.ExcelFile(nuevo_archivo.archivo.path)
-            hojas = {sheet: pd.read_excel(xls, sheet) for sheet in xls.sheet_names}
+            # Validación previa: solo encabezados, antes de parsear o escribir en la BD
+            problemas = validar_encabezados(archivo)
+            if problemas:
+                return JsonResponse({
+                    "error": "El archivo no tiene el formato esperado.",
+                    "detalles": problemas,
+                }, status=400)
 
-            # Siempre calculamos resumen grupal (y lo guardamos)
-            resumen_grupal = generar_reporte_grupal_completo(hojas)
-            nuevo_archivo.resumen_json = resumen_grupal
-            nuevo_archivo.save()
-
-            # Extraer nombres de estudiantes (primera hoja)
-            hoja_principal = pd.read_excel(xls, xls.sheet_names[0])
-            nombres = hoja_principal["APELLIDOS/NOMBRES"].dropna().tolist()
-
-            # Guardar en base de datos
-            for nombre in nombres:
-                Estudiante.objects.create(archivo=nuevo_archivo, nombre=nombre)
+            # Parsear, calcular y guardar archivo + estudiantes en una sola transacción
+            nuevo_archivo, hojas, resultado = UploadService.ingerir(request.user, archivo)
+            resumen_grupal = resultado["resumen_json"]
+            nombres = resultado["nombres"]
+            reportes_individuales = resultado["reportes_individuales"]
 
             # Decidir qué JSON devolver al frontend
             if tipo == "individual" and estudiante:
-                json_data = reporte_individual(estudiante, hojas)
+                json_data = reportes_individuales.get(estudiante) or reporte_individual(estudiante, hojas)
             else:
                 # Por defecto (o si no se seleccionó estudiante) devolvemos el grupal
                 json_data = resumen_grupal
@@ -152,6 +152,11 @@ def upload_view(request):
                 "json_data": json_data,
             })
 
+        except ProcesoCaido:
+            return JsonResponse({
+                "error": "El procesamiento del archivo se interrumpió (¿libro demasiado grande?). "
+                         "No se guardó nada; intente de nuevo."
+            }, status=503)
         except Exception as e:
             return JsonResponse({"error": f"Ocurrió un error al procesar el archivo: {str(e)}"}, status=500)
 
@@ -193,6 +198,7 @@ def procesar_reporte(request):
         tipo = request.POST.get("tipo", "grupal")
         estudiante = request.POST.get("estudiante", "")
         archivo_id = request.POST.get("archivo_id")
+        forzar = request.POST.get("forzar") == "1"
 
         if not archivo_id:
             print("ERROR: No se recibió archivo_id")
@@ -206,23 +212,7 @@ def procesar_reporte(request):
 
         # Si no se proporciona JSON, generarlo desde el archivo guardado
         if not json_data_str:
-            print("INFO: Generando JSON desde archivo guardado")
-            
-            # Leer el Excel
-            xls = pd.ExcelFile(archivo.archivo.path)
-            hojas = {sheet: pd.read_excel(xls, sheet) for sheet in xls.sheet_names}
-            
-            # Generar JSON según el tipo
-            if tipo == "individual" and estudiante:
-                json_data = reporte_individual(estudiante, hojas)
-            else:
-                # Usar el resumen guardado o generarlo
-                if archivo.resumen_json:
-                    json_data = archivo.resumen_json
-                else:
-                    json_data = generar_reporte_grupal_completo(hojas)
-                    archivo.resumen_json = json_data
-                    archivo.save()
+            json_data = ReportService.obtener_json_data(archivo, tipo, estudiante)
         else:
             # Parsear el JSON proporcionado
             try:
@@ -231,141 +221,440 @@ def procesar_reporte(request):
                 return JsonResponse({"error": "El JSON recibido no es válido"}, status=400)
 
         # Definir el título del reporte
-        if tipo == "individual" and estudiante:
-            titulo_reporte = f"Reporte Individual - {estudiante}"
-            descripcion = f"Reporte Individual - {estudiante}"
-            prompt = get_prompt_reporte_individual(json_data, estudiante)
-        else:
-            titulo_reporte = "Reporte Grupal"
-            descripcion = f"Reporte Grupal - {archivo.nombre}"
-            prompt = get_prompt_reporte_grupal(json_data)
+        titulo_reporte, descripcion, prompt = ReportService.construir_prompt(
+            json_data, tipo, estudiante, archivo
+        )
 
-        try:
-            # Primero verificar que Ollama esté disponible
-            ollama.list()
-            
-            # Generar narrativa con el modelo configurado
-            # Configurar cliente con timeout de 30 minutos para modelos grandes
-            from ollama import Client
-            client = Client(timeout=1800.0)  # 30 minutos de timeout
-            
-            respuesta = client.chat(
-                model=OLLAMA_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                options={"temperature": 0.7}
-            )
-            narrativa = respuesta["message"]["content"]
-        except (httpx.ConnectError, ConnectionError) as e:
-            print(f"ERROR de conexión con Ollama: {type(e).__name__}: {str(e)}")
-            narrativa = (
-                "No se pudo conectar con Ollama para generar la narrativa con IA.\n\n"
-                "Por favor, verifica que:\n"
-                "1. Ollama esté instalado y ejecutándose\n"
-                "2. El servicio de Ollama esté activo\n\n"
-                "Puedes iniciar Ollama ejecutando 'ollama serve' en una terminal.\n\n"
-                f"Datos del reporte:\n{json.dumps(json_data, ensure_ascii=False, indent=2)}"
-            )
-        except httpx.ReadTimeout as e:
-            print(f"TIMEOUT al generar narrativa: {str(e)}")
-            narrativa = (
-                "El modelo de IA está tardando demasiado en generar la narrativa.\n\n"
-                "Esto puede ocurrir con modelos grandes. Considera:\n"
-                "1. Usar un modelo más pequeño (cambia OLLAMA_MODEL en report_generator.py)\n"
-                "2. Esperar más tiempo o intentar nuevamente\n\n"
-                f"Datos del reporte:\n{json.dumps(json_data, ensure_ascii=False, indent=2)}"
-            )
-        except Exception as e:
-            print(f"ERROR inesperado al generar narrativa: {type(e).__name__}: {str(e)}")
-            narrativa = (
-                f"Error al generar narrativa con IA: {type(e).__name__}: {str(e)}\n\n"
-                f"Datos del reporte:\n{json.dumps(json_data, ensure_ascii=False, indent=2)}"
+        # Modo streaming: enviar la narrativa al navegador a medida que se genera
+        if request.POST.get("stream") == "1":
+            eventos = _eventos_reporte_stream(
+                request.user, archivo, tipo, estudiante,
+                titulo_reporte, descripcion, json_data, prompt, forzar
             )
+            response = StreamingHttpResponse(eventos, content_type="text/event-stream")
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"
+            return response
+
+        # Generar narrativa con el modelo configurado
+        narrativa = ReportService.generar_narrativa(prompt, json_data, forzar=forzar)
+
+        # PDF (directo al almacenamiento) + registro del reporte
+        reporte = ReportService.guardar_reporte(
+            request.user, archivo, tipo, estudiante,
+            titulo_reporte, descripcion, json_data, narrativa
+        )
 
-        # PDF
-        pdf_buffer = generar_pdf(titulo_reporte, narrativa)
-        pdf_bytes = pdf_buffer.read()
+        # Respuesta completa anterior (JSON + narrativa + PDF en base64), solo si se pide
+        if request.POST.get("formato") == "completo":
+            with reporte.pdf_file.open("rb") as pdf_file:
+                pdf_base64 = base64.b64encode(pdf_file.read()).decode("utf-8")
+            return JsonResponse({
+                "ok": True,
+                "json": json_data,
+                "narrativa": narrativa,
+                "pdf": pdf_base64,
+                "reporte_id": reporte.id
+            })
 
-        # Guardar el reporte en la base de datos
-        import base64
-        from datetime import datetime
-        
-        # Crear nombre de archivo único
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        if tipo == "individual" and estudiante:
-            pdf_filename = f"reporte_individual_{estudiante.replace(' ', '_')}_{timestamp}.pdf"
-        else:
-            pdf_filename = f"reporte_grupal_{timestamp}.pdf"
+        # Respuesta ligera: el PDF se descarga aparte con url_descarga
+        respuesta = {
+            "ok": True,
+            "reporte_id": reporte.id,
+            "url_descarga": reverse("descargar_reporte", args=[reporte.id]),
+        }
+        if request.POST.get("incluir_narrativa") == "1":
+            respuesta["narrativa"] = narrativa
+        return JsonResponse(respuesta)
+
+    except Exception as e:
+        print(f"ERROR en procesar_reporte: {type(e).__name__}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def _evento_sse(evento, datos):
+    """
+    Formatea un evento Server-Sent Events con datos JSON.
+    """
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+def _eventos_reporte_stream(usuario, archivo, tipo, estudiante, titulo_reporte, descripcion, json_data, prompt, forzar):
+    """
+    Reenvía los fragmentos de la narrativa como eventos SSE y, al terminar el
+    stream, guarda el ReporteGenerado y renderiza el PDF.
+    """
+    partes = []
+    try:
+        for fragmento in ReportService.generar_narrativa_stream(prompt, json_data, forzar=forzar):
+            partes.append(fragmento)
+            yield _evento_sse("fragmento", {"texto": fragmento})
+
+        yield _evento_sse("estado", {"estado": "renderizando_pdf"})
+        reporte = ReportService.guardar_reporte(
+            usuario, archivo, tipo, estudiante,
+            titulo_reporte, descripcion, json_data, "".join(partes)
+        )
+        yield _evento_sse("fin", {
+            "ok": True,
+            "reporte_id": reporte.id,
+            "url_descarga": reverse("descargar_reporte", args=[reporte.id]),
+        })
+    except Exception as e:
+        logger.error("Error en procesar_reporte (stream): %s: %s", type(e).__name__, e)
+        yield _evento_sse("error", {"error": str(e)})
+
+
+# === Encolar reporte (se procesa con el comando procesar_trabajos) ===
+@csrf_exempt
+@login_required
+def encolar_reporte(request):
+    """
+    Registra un TrabajoReporte y devuelve su ID de inmediato.
+    El worker local genera la narrativa y el PDF fuera de la petición.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    try:
+        json_data_str = request.POST.get("json_data")
+        tipo = request.POST.get("tipo", "grupal")
+        estudiante = request.POST.get("estudiante", "")
+        archivo_id = request.POST.get("archivo_id")
+
+        if not archivo_id:
+            return JsonResponse({"error": "No se recibió el ID del archivo"}, status=400)
+
+        try:
+            archivo = ArchivoNotas.objects.get(id=archivo_id, usuario=request.user)
+        except ArchivoNotas.DoesNotExist:
+            return JsonResponse({"error": "Archivo no encontrado"}, status=404)
+
+        json_data = None
+        if json_data_str:
+            try:
+                json_data = json.loads(json_data_str)
+            except json.JSONDecodeError:
+                return JsonResponse({"error": "El JSON recibido no es válido"}, status=400)
 
-        # Crear el registro del reporte
-        reporte = ReporteGenerado.objects.create(
+        trabajo = TrabajoReporte.objects.create(
             usuario=request.user,
             archivo=archivo,
             tipo=tipo,
-            estudiante=estudiante if tipo == "individual" else None,
-            descripcion=descripcion,
+            estudiante=estudiante or None,
             json_data=json_data,
-            narrativa=narrativa
+            forzar_regeneracion=request.POST.get("forzar") == "1"
         )
-        
-        # Guardar el archivo PDF
-        reporte.pdf_file.save(pdf_filename, ContentFile(pdf_bytes), save=True)
 
-        pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
+        return JsonResponse({
+            "trabajo_id": trabajo.id,
+            "estado": trabajo.estado,
+        }, status=202)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
 
+# === Consultar estado de un reporte encolado ===
+@login_required
+def estado_reporte(request, trabajo_id):
+    """
+    Devuelve el progreso de un TrabajoReporte y el ID del reporte al terminar.
+    """
+    try:
+        trabajo = TrabajoReporte.objects.get(id=trabajo_id, usuario=request.user)
         return JsonResponse({
-            "ok": True,
-            "json": json_data,
-            "narrativa": narrativa,
-            "pdf": pdf_base64,
-            "reporte_id": reporte.id
+            "trabajo_id": trabajo.id,
+            "estado": trabajo.estado,
+            "estado_display": trabajo.get_estado_display(),
+            "terminado": trabajo.estado in (TrabajoReporte.ESTADO_COMPLETADO, TrabajoReporte.ESTADO_ERROR),
+            "reporte_id": trabajo.reporte_id,
+            "error": trabajo.error or None,
         })
+    except TrabajoReporte.DoesNotExist:
+        return JsonResponse({"error": "Trabajo no encontrado"}, status=404)
+
+
+# === Reportes individuales de toda la clase (lote) ===
+@csrf_exempt
+@login_required
+def generar_reportes_lote(request):
+    """
+    Encola los reportes individuales de los estudiantes indicados
+    (estudiantes=Ana&estudiantes=Luis...) o, si no se indica ninguno, de todos
+    los del archivo. El worker los genera con procesar_trabajos.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    archivo_id = request.POST.get("archivo_id")
+    if not archivo_id:
+        return JsonResponse({"error": "No se recibió el ID del archivo"}, status=400)
+
+    try:
+        archivo = ArchivoNotas.objects.get(id=archivo_id, usuario=request.user)
+    except (ArchivoNotas.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Archivo no encontrado"}, status=404)
+
+    estudiantes = list(dict.fromkeys(archivo.estudiantes.order_by("id").values_list("nombre", flat=True)))
+    pedidos = request.POST.getlist("estudiantes")
+    if pedidos:
+        desconocidos = set(pedidos) - set(estudiantes)
+        if desconocidos:
+            return JsonResponse({"error": f"Estudiantes no encontrados en el archivo: {', '.join(sorted(desconocidos))}"}, status=400)
+        estudiantes = list(dict.fromkeys(pedidos))
+
+    if not estudiantes:
+        return JsonResponse({"error": "El archivo no tiene estudiantes."}, status=400)
+    max_estudiantes = getattr(settings, "LOTE_MAX_ESTUDIANTES", 200)
+    if len(estudiantes) > max_estudiantes:
+        return JsonResponse({"error": f"Se pueden generar como máximo {max_estudiantes} reportes por lote."}, status=400)
+
+    forzar = request.POST.get("forzar") == "1"
+    with transaction.atomic():
+        lote = LoteReportes.objects.create(usuario=request.user, archivo=archivo, forzar_regeneracion=forzar)
+        TrabajoReporte.objects.bulk_create([
+            TrabajoReporte(
+                usuario=request.user,
+                archivo=archivo,
+                lote=lote,
+                tipo="individual",
+                estudiante=estudiante,
+                forzar_regeneracion=forzar
+            )
+            for estudiante in estudiantes
+        ])
+
+    return JsonResponse({
+        "lote_id": lote.id,
+        "estado": lote.estado,
+        "total": len(estudiantes),
+        "url_estado": reverse("estado_lote", args=[lote.id]),
+        "url_zip": reverse("descargar_lote_zip", args=[lote.id]),
+    }, status=202)
+
+
+# === Progreso de un lote ===
+@login_required
+def estado_lote(request, lote_id):
+    """
+    Devuelve el progreso del lote y los reportes ya generados (una consulta
+    sobre los trabajos del lote).
+    """
+    try:
+        lote = LoteReportes.objects.get(id=lote_id, usuario=request.user)
+    except LoteReportes.DoesNotExist:
+        return JsonResponse({"error": "Lote no encontrado"}, status=404)
+
+    trabajos = lote.trabajos.order_by("id").values_list("estudiante", "estado", "reporte_id", "error")
+    total, reportes, errores = 0, [], []
+    for estudiante, estado, reporte_id, error in trabajos:
+        total += 1
+        if estado == TrabajoReporte.ESTADO_COMPLETADO:
+            reportes.append({"estudiante": estudiante, "reporte_id": reporte_id})
+        elif estado == TrabajoReporte.ESTADO_ERROR:
+            errores.append({"estudiante": estudiante, "error": error})
+
+    return JsonResponse({
+        "lote_id": lote.id,
+        "estado": lote.estado,
+        "estado_display": lote.get_estado_display(),
+        "terminado": lote.estado in (LoteReportes.ESTADO_COMPLETADO, LoteReportes.ESTADO_ERROR),
+        "total": total,
+        "completados": len(reportes),
+        "errores": len(errores),
+        "pendientes": total - len(reportes) - len(errores),
+        "reportes": reportes,
+        "detalle_errores": errores,
+        "error": lote.error or None,
+    })
+
+
+# === Descargar los reportes de un lote en un ZIP ===
+@login_required
+def descargar_lote_zip(request, lote_id):
+    """
+    ZIP (generado mientras se envía) con los PDF ya generados del lote. Se
+    puede pedir antes de que termine: incluye los que estén listos.
+    """
+    try:
+        lote = LoteReportes.objects.get(id=lote_id, usuario=request.user)
+    except LoteReportes.DoesNotExist:
+        return JsonResponse({"error": "Lote no encontrado"}, status=404)
+
+    reportes = (
+        ReporteGenerado.objects
+        .filter(trabajos__lote=lote, trabajos__estado=TrabajoReporte.ESTADO_COMPLETADO)
+        .order_by("id")
+        .only("id", "pdf_file")
+    )
+    entradas = []
+    for reporte in reportes:
+        if not reporte.pdf_file or not reporte.pdf_file.storage.exists(reporte.pdf_file.name):
+            logger.warning("Reporte %s sin PDF en disco: se omite del ZIP", reporte.id)
+            continue
+        entradas.append((f"{reporte.id}_{os.path.basename(reporte.pdf_file.name)}", reporte.pdf_file.path))
+
+    if not entradas:
+        return JsonResponse({"error": "El lote todavía no tiene reportes generados."}, status=404)
+
+    return respuesta_zip(entradas, f"reportes_lote_{lote.id}.zip")
+
 
-    except Exception as e:
-        print(f"ERROR en procesar_reporte: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return JsonResponse({"error": str(e)}, status=500)
 # === Historial de reportes (SPA parcial) ===
+def _filtrar_reportes(request):
+    """
+    Reportes del usuario con los filtros opcionales de la petición:
+    tipo, archivo (id), estudiante y rango de fechas desde/hasta (AAAA-MM-DD).
+
+    Raises:
+        ValueError: Si algún filtro no es válido
+    """
+    reportes = ReporteGenerado.objects.filter(usuario=request.user).only(
+        "id", "tipo", "estudiante", "descripcion", "fecha_generacion", "pdf_file"
+    )
+
+    tipo = request.GET.get("tipo")
+    if tipo:
+        if tipo not in dict(ReporteGenerado.TIPO_CHOICES):
+            raise ValueError(f"Tipo de reporte inválido: {tipo}")
+        reportes = reportes.filter(tipo=tipo)
+
+    archivo_id = request.GET.get("archivo")
+    if archivo_id:
+        reportes = reportes.filter(archivo_id=int(archivo_id))
+
+    estudiante = request.GET.get("estudiante", "").strip()
+    if estudiante:
+        reportes = reportes.filter(estudiante=estudiante)
+
+    for parametro, lookup in [("desde", "gte"), ("hasta", "lt")]:
+        valor = request.GET.get(parametro)
+        if not valor:
+            continue
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise ValueError(f"Fecha inválida en '{parametro}': {valor}")
+        if parametro == "hasta":
+            # 'hasta' incluye todo ese día
+            fecha += timedelta(days=1)
+        inicio_dia = timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+        reportes = reportes.filter(**{f"fecha_generacion__{lookup}": inicio_dia})
+
+    return reportes
+
+
+def _pagina_reportes(request):
+    """
+    Página de reportes según los filtros y el cursor de la petición.
+
+    Returns:
+        tuple: (lista de ReporteGenerado, next_cursor)
+    """
+    return paginar_keyset(
+        _filtrar_reportes(request), "fecha_generacion",
+        request.GET.get("cursor"), leer_limite(request.GET.get("limite"))
+    )
+
+
+def _usa_validacion_http(request):
+    """
+    El historial usa ETag/Last-Modified en la API y en el parcial SPA. La página
+    completa no, porque incluye el token CSRF.
+    """
+    if not request.user.is_authenticated:
+        return False
+    if request.resolver_match.url_name == "history":
+        return request.headers.get("x-requested-with") == "XMLHttpRequest"
+    return True
+
+
+def _etag_reportes(request):
+    """
+    ETag del historial: versión de los reportes del usuario + parámetros.
+    Se calcula sin consultar la base de datos.
+    """
+    if not _usa_validacion_http(request):
+        return None
+    version = obtener_version("reportes", request.user.id)
+    contenido = f"{request.user.id}:{version}:{request.resolver_match.url_name}:{request.GET.urlencode()}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+
+def _ultima_modificacion_reportes(request):
+    if not _usa_validacion_http(request):
+        return None
+    return fecha_version(obtener_version("reportes", request.user.id))
+
+
+def _revalidar(response):
+    # El navegador puede guardar la respuesta, pero debe revalidarla siempre
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @login_required
+@condition(etag_func=_etag_reportes, last_modified_func=_ultima_modificacion_reportes)
 def history_view(request):
-    reportes = ReporteGenerado.objects.filter(usuario=request.user)
-    
-    if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        return render(request, "Dashboard/partials/history.html", {"reportes": reportes})
-    return render(request, "Dashboard/base.html", {"reportes": reportes})
+    # La página completa carga el parcial por AJAX (spa.js)
+    if request.headers.get("x-requested-with") != "XMLHttpRequest":
+        return render(request, "Dashboard/base.html")
+
+    try:
+        reportes, next_cursor = _pagina_reportes(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Filtros de la página para pedir las siguientes (el cursor no los guarda)
+    filtros = request.GET.copy()
+    filtros.pop("cursor", None)
+
+    response = _revalidar(render(request, "Dashboard/partials/history.html", {
+        "reportes": reportes,
+        "next_cursor": next_cursor,
+        "filtros": filtros.urlencode(),
+    }))
+    patch_vary_headers(response, ["X-Requested-With"])
+    return response
+
+
+def _serializar_reporte(reporte):
+    return {
+        "id": reporte.id,
+        "tipo": reporte.tipo,
+        "estudiante": reporte.estudiante,
+        "descripcion": reporte.descripcion,
+        "fecha_generacion": reporte.fecha_generacion.strftime('%d/%m/%Y'),
+        "pdf_file": reporte.pdf_file.name,
+    }
 
 
 # === Obtener reportes para API ===
 @login_required
+@condition(etag_func=_etag_reportes, last_modified_func=_ultima_modificacion_reportes)
 def get_reportes(request):
-    reportes = ReporteGenerado.objects.filter(usuario=request.user).values(
-        'id', 'tipo', 'estudiante', 'descripcion', 'fecha_generacion', 'pdf_file'
-    )
-    reportes_list = list(reportes)
-    for reporte in reportes_list:
-        reporte['fecha_generacion'] = reporte['fecha_generacion'].strftime('%d/%m/%Y')
-    return JsonResponse({"reportes": reportes_list})
+    try:
+        reportes, next_cursor = _pagina_reportes(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    reportes_list = [_serializar_reporte(reporte) for reporte in reportes]
+    return _revalidar(JsonResponse({"reportes": reportes_list, "next_cursor": next_cursor}))
 
 
 # === Descargar reporte ===
 @login_required
 def descargar_reporte(request, reporte_id):
     try:
-        reporte = ReporteGenerado.objects.get(id=reporte_id, usuario=request.user)
+        reporte = ReporteGenerado.objects.only("id", "usuario_id", "pdf_file").get(id=reporte_id, usuario=request.user)
         
-        if not reporte.pdf_file:
+        if not reporte.pdf_file or not reporte.pdf_file.storage.exists(reporte.pdf_file.name):
             return HttpResponse("Archivo no encontrado", status=404)
         
-        # Leer el archivo PDF
-        pdf_file = reporte.pdf_file.open('rb')
-        response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-        
-        # Generar nombre de archivo para la descarga
-        filename = os.path.basename(reporte.pdf_file.name)
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        pdf_file.close()
-        return response
+        # Se envía por bloques (o lo envía el proxy), con soporte de Range y ETag.
+        # ?inline=1 lo muestra en el navegador (previsualización)
+        return respuesta_descarga(request, reporte.pdf_file, en_linea=request.GET.get("inline") == "1")
         
     except ReporteGenerado.DoesNotExist:
         return HttpResponse("Reporte no encontrado", status=404)
@@ -373,6 +662,38 @@ def descargar_reporte(request, reporte_id):
         return HttpResponse(f"Error al descargar el archivo: {str(e)}", status=500)
 
 
+# === Descargar varios reportes en un ZIP ===
+@login_required
+def descargar_reportes_zip(request):
+    """
+    Descarga los reportes seleccionados (?ids=1&ids=2...) en un ZIP que se
+    genera mientras se envía.
+    """
+    try:
+        ids = [int(i) for i in request.GET.getlist("ids")]
+    except ValueError:
+        return JsonResponse({"error": "Los ids de reportes deben ser números."}, status=400)
+
+    if not ids:
+        return JsonResponse({"error": "No se seleccionó ningún reporte."}, status=400)
+    if len(ids) > MAX_ARCHIVOS_ZIP:
+        return JsonResponse({"error": f"Se pueden descargar como máximo {MAX_ARCHIVOS_ZIP} reportes a la vez."}, status=400)
+
+    reportes = ReporteGenerado.objects.filter(usuario=request.user, id__in=ids).only("id", "pdf_file")
+    entradas = []
+    for reporte in reportes:
+        if not reporte.pdf_file or not reporte.pdf_file.storage.exists(reporte.pdf_file.name):
+            logger.warning("Reporte %s sin PDF en disco: se omite del ZIP", reporte.id)
+            continue
+        # El id evita nombres repetidos dentro del ZIP
+        entradas.append((f"{reporte.id}_{os.path.basename(reporte.pdf_file.name)}", reporte.pdf_file.path))
+
+    if not entradas:
+        return JsonResponse({"error": "No se encontraron los reportes seleccionados."}, status=404)
+
+    return respuesta_zip(entradas, "reportes.zip")
+
+
 # ========================================
 # NUEVAS VISTAS PARA ARCHIVOS PERSISTENTES
 # ========================================
@@ -382,18 +703,15 @@ def descargar_reporte(request, reporte_id):
 def get_archivo_activo(request):
     """
     Devuelve el archivo activo del usuario con sus datos procesados.
-    Si no hay archivo activo, devuelve el más reciente.
+    Si no hay archivo activo, devuelve el más reciente (sin activarlo).
     """
     try:
-        # Buscar archivo activo
-        archivo = ArchivoNotas.objects.filter(usuario=request.user, activo=True).first()
-        
-        # Si no hay activo, tomar el más reciente
-        if not archivo:
-            archivo = ArchivoNotas.objects.filter(usuario=request.user).first()
-            if archivo:
-                archivo.activo = True
-                archivo.save()
+        archivo = (
+            _archivos_por_prioridad(request.user)
+            .defer("resumen_json")
+            .annotate(tiene_datos=ExpressionWrapper(Q(resumen_json__isnull=False), output_field=BooleanField()))
+            .first()
+        )
         
         if not archivo:
             return JsonResponse({"archivo": None, "message": "No hay archivos cargados"})
@@ -402,39 +720,103 @@ def get_archivo_activo(request):
         estudiantes = list(archivo.estudiantes.values_list("nombre", flat=True))
         
         return JsonResponse({
-            "archivo": {
-                "id": archivo.id,
-                "nombre": archivo.nombre,
-                "fecha_subida": archivo.fecha_subida.strftime('%d/%m/%Y'),
-                "estudiantes": estudiantes,
-                "tiene_datos": archivo.resumen_json is not None
-            }
+            "archivo": _serializar_archivo(archivo, estudiantes, archivo.tiene_datos)
         })
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 
+def _archivos_por_prioridad(usuario):
+    # El activo primero y, si no hay (p. ej. datos anteriores), el más reciente
+    return ArchivoNotas.objects.filter(usuario=usuario).order_by("-activo", "-fecha_subida", "-id")
+
+
+def _serializar_archivo(archivo, estudiantes, tiene_datos):
+    return {
+        "id": archivo.id,
+        "nombre": archivo.nombre,
+        "fecha_subida": archivo.fecha_subida.strftime('%d/%m/%Y'),
+        "estudiantes": estudiantes,
+        "tiene_datos": tiene_datos
+    }
+
+
+# === Carga inicial del dashboard en una sola petición ===
+@login_required
+def bootstrap(request):
+    """
+    Devuelve en una sola respuesta lo que el SPA necesita al cargar: el archivo
+    activo, sus estudiantes y las métricas. El historial no se incluye: su
+    página llega renderizada con la primera página de reportes.
+
+    Usa un número fijo de consultas (además de sesión y usuario): archivo con
+    su resumen, estudiantes y, si las métricas no están en caché, la fecha del
+    último reporte grupal. No escribe en la base de datos: si no hay archivo
+    activo se usa el más reciente sin activarlo.
+    """
+    from .services import MetricsService
+
+    try:
+        archivo = (
+            _archivos_por_prioridad(request.user)
+            .select_related("dashboard_summary")
+            .defer("resumen_json")
+            .annotate(tiene_datos=ExpressionWrapper(Q(resumen_json__isnull=False), output_field=BooleanField()))
+            .first()
+        )
+
+        datos_archivo = None
+        if archivo:
+            estudiantes = list(archivo.estudiantes.values_list("nombre", flat=True))
+            datos_archivo = _serializar_archivo(archivo, estudiantes, archivo.tiene_datos)
+
+        metricas, desde_cache = MetricsService.get_cached_dashboard_metrics(request.user, archivo)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    response = JsonResponse({
+        "archivo": datos_archivo,
+        "metricas": metricas,
+    })
+    response["X-Cache"] = "HIT" if desde_cache else "MISS"
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
 # === Listar todos los archivos del usuario ===
 @login_required
 def listar_archivos(request):
     """
-    Devuelve todos los archivos del usuario con información básica.
+    Devuelve los archivos del usuario con información básica, paginados por
+    cursor (parámetros opcionales 'cursor' y 'limite').
     """
     try:
-        archivos = ArchivoNotas.objects.filter(usuario=request.user)
-        archivos_list = []
-        
-        for archivo in archivos:
-            archivos_list.append({
+        limite = leer_limite(request.GET.get("limite"))
+        archivos = (
+            ArchivoNotas.objects.filter(usuario=request.user)
+            .only("id", "nombre", "fecha_subida", "activo")
+            .annotate(
+                num_estudiantes=Count("estudiantes", distinct=True),
+                num_reportes=Count("reportes", distinct=True),
+            )
+        )
+        archivos, next_cursor = paginar_keyset(archivos, "fecha_subida", request.GET.get("cursor"), limite)
+
+        archivos_list = [
+            {
                 "id": archivo.id,
                 "nombre": archivo.nombre,
                 "fecha_subida": archivo.fecha_subida.strftime('%d/%m/%Y'),
                 "activo": archivo.activo,
-                "num_estudiantes": archivo.estudiantes.count(),
-                "num_reportes": archivo.reportes.count()
-            })
-        
-        return JsonResponse({"archivos": archivos_list})
+                "num_estudiantes": archivo.num_estudiantes,
+                "num_reportes": archivo.num_reportes
+            }
+            for archivo in archivos
+        ]
+
+        return JsonResponse({"archivos": archivos_list, "next_cursor": next_cursor})
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
@@ -446,9 +828,8 @@ def activar_archivo(request, archivo_id):
     Marca un archivo como activo y desactiva los demás.
     """
     try:
-        archivo = ArchivoNotas.objects.get(id=archivo_id, usuario=request.user)
-        archivo.activo = True
-        archivo.save()  # El método save() del modelo se encarga de desactivar los demás
+        archivo = ArchivoNotas.objects.only("id", "usuario_id", "nombre", "activo").get(id=archivo_id, usuario=request.user)
+        archivo.activar()
         
         return JsonResponse({
             "message": f"Archivo '{archivo.nombre}' activado correctamente",
@@ -470,12 +851,20 @@ def eliminar_archivo(request, archivo_id):
         archivo = ArchivoNotas.objects.get(id=archivo_id, usuario=request.user)
         nombre = archivo.nombre
         
-        # Eliminar archivo físico
+        # Eliminar archivo físico y su copia columnar
         if archivo.archivo:
             archivo.archivo.delete()
+        eliminar_copia_columnar(archivo)
         
         # Eliminar registro (CASCADE eliminará estudiantes y reportes)
+        era_activo = archivo.activo
         archivo.delete()
+
+        # Si era el activo, se activa el más reciente de los que quedan
+        if era_activo:
+            siguiente = ArchivoNotas.objects.filter(usuario=request.user).only("id", "usuario_id", "activo").first()
+            if siguiente:
+                siguiente.activar()
         
         return JsonResponse({"message": f"Archivo '{nombre}' eliminado correctamente"})
     except ArchivoNotas.DoesNotExist: